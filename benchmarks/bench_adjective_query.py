@@ -0,0 +1,145 @@
+"""
+Builds an adjective query index of synthetic collateral adjectives groups, measures its in-process lookup latency
+from the memory-mapped index file, and load-tests AdjectiveQueryServer with concurrent keep-alive connections.
+Reports the index, lookup and load test results as JSON lines.
+
+Usage: python -m benchmarks.bench_adjective_query [--adjectives 5000] [--animals 50000] [--connections 20]
+                                                  [--duration 5] [--cache-size 4096]
+"""
+import json
+import logging
+import random
+from argparse import ArgumentParser
+from asyncio import gather, open_connection, run
+from pathlib import Path
+from tempfile import TemporaryDirectory
+from time import perf_counter
+from urllib.parse import quote
+
+from benchmarks.bench_e2e import _percentiles
+from src.handlers.adjective_query_server import AdjectiveQueryServer
+from src.processors.adjective_query_index import AdjectiveQueryIndex, write_index
+
+
+def synthetic_groups(adjectives: int, animals: int, seed: int = 0) -> dict[str, list[str]]:
+    """Groups of adjectives and animal names, each animal in one to three groups."""
+    rng = random.Random(seed)
+    adjective_names = [f"adj{i}ine" for i in range(adjectives)]
+    groups: dict[str, list[str]] = {}
+    for i in range(animals):
+        for adjective in rng.sample(adjective_names, rng.randint(1, 3)):
+            groups.setdefault(adjective, []).append(f"Animal {i}")
+    return groups
+
+
+def request_targets(groups: dict[str, list[str]], count: int, seed: int = 1) -> list[str]:
+    """A mix of adjective, animal and prefix requests, skewed towards popular terms like real lookups."""
+    rng = random.Random(seed)
+    adjectives = list(groups)
+    animals = sorted({animal for names in groups.values() for animal in names})
+    targets = []
+    for _ in range(count):
+        kind = rng.random()
+        if kind < 0.4:
+            targets.append(f"/adjectives/{quote(adjectives[int(rng.paretovariate(1.2)) % len(adjectives)])}")
+        elif kind < 0.8:
+            targets.append(f"/animals/{quote(animals[int(rng.paretovariate(1.2)) % len(animals)])}")
+        else:
+            targets.append(f"/search?prefix={quote(rng.choice(adjectives)[:rng.randint(1, 5)])}&limit=10")
+    return targets
+
+
+def bench_lookups(index: AdjectiveQueryIndex, groups: dict[str, list[str]], count: int) -> dict:
+    rng = random.Random(2)
+    adjectives = list(groups)
+    animals = [animal for names in groups.values() for animal in names]
+    samples: dict[str, list[float]] = {"animals": [], "adjectives": [], "search": []}
+    for _ in range(count):
+        for kind, lookup in (
+            ("animals", lambda: index.animals(rng.choice(adjectives))),
+            ("adjectives", lambda: index.adjectives(rng.choice(animals))),
+            ("search", lambda: index.search_adjectives(rng.choice(adjectives)[:3])),
+        ):
+            start = perf_counter()
+            lookup()
+            samples[kind].append(perf_counter() - start)
+    return {kind: _percentiles(kind_samples) for kind, kind_samples in samples.items()}
+
+
+async def load_test(server: AdjectiveQueryServer, targets: list[str], connections: int, duration: float) -> dict:
+    latencies: list[float] = []
+    errors = 0
+
+    async def connection_loop(connection_id: int):
+        nonlocal errors
+        reader, writer = await open_connection(server.host, server.port)
+        i = connection_id
+        deadline = perf_counter() + duration
+        while perf_counter() < deadline:
+            start = perf_counter()
+            writer.write(f"GET {targets[i % len(targets)]} HTTP/1.1\r\nHost: bench\r\n\r\n".encode())
+            status_line = await reader.readline()
+            content_length = 0
+            while (header := await reader.readline()) not in (b"\r\n", b""):
+                if header.lower().startswith(b"content-length:"):
+                    content_length = int(header.split(b":")[1])
+            await reader.readexactly(content_length)
+            latencies.append(perf_counter() - start)
+            if b" 200 " not in status_line and b" 404 " not in status_line:
+                errors += 1
+            i += connections
+        writer.close()
+
+    start = perf_counter()
+    await gather(*(connection_loop(connection_id) for connection_id in range(connections)))
+    elapsed = perf_counter() - start
+    cache_info = server.reply.cache_info()
+    return {
+        "connections": connections,
+        "requests": len(latencies),
+        "requests_per_second": round(len(latencies) / elapsed, 1),
+        "errors": errors,
+        "latency": _percentiles(latencies),
+        "cache_hit_ratio": round(cache_info.hits / max(1, cache_info.hits + cache_info.misses), 3),
+    }
+
+
+async def bench_server(index: AdjectiveQueryIndex, targets: list[str], connections: int, duration: float,
+                       cache_size: int) -> dict:
+    async with AdjectiveQueryServer(index, port=0, cache_size=cache_size) as server:
+        return await load_test(server, targets, connections, duration)
+
+
+def main():
+    arg_parser = ArgumentParser(description=__doc__)
+    arg_parser.add_argument("--adjectives", type=int, default=5_000)
+    arg_parser.add_argument("--animals", type=int, default=50_000)
+    arg_parser.add_argument("--lookups", type=int, default=10_000)
+    arg_parser.add_argument("--connections", type=int, default=20)
+    arg_parser.add_argument("--duration", type=float, default=5.0, help="Seconds of the load test")
+    arg_parser.add_argument("--cache-size", type=int, default=4096, help="LRU cache size, 0 disables the cache")
+    args = arg_parser.parse_args()
+
+    logging.disable(logging.CRITICAL)
+    groups = synthetic_groups(args.adjectives, args.animals)
+    with TemporaryDirectory() as index_dir:
+        index_path = Path(index_dir, "adjectives.idx")
+        start = perf_counter()
+        write_index(index_path, groups)
+        print(json.dumps({
+            "stage": "build",
+            "adjectives": args.adjectives,
+            "animals": args.animals,
+            "seconds": round(perf_counter() - start, 3),
+            "index_mb": round(index_path.stat().st_size / 1024 / 1024, 2),
+        }))
+
+        with AdjectiveQueryIndex.load(index_path) as index:
+            print(json.dumps({"stage": "lookups", **bench_lookups(index, groups, args.lookups)}))
+            targets = request_targets(groups, 100_000)
+            report = run(bench_server(index, targets, args.connections, args.duration, args.cache_size))
+            print(json.dumps({"stage": "load_test", "cache_size": args.cache_size, **report}))
+
+
+if __name__ == "__main__":
+    main()
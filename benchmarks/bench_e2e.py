@@ -0,0 +1,233 @@
+"""
+Runs AnimalsPageProcessor end to end against a local fake Wikipedia server and reports, as a JSON line,
+the throughput, the p50/p99 service time of each stage, the peak RSS and the event-loop lag.
+
+Usage: python -m benchmarks.bench_e2e [--rows 1000] [--mode head] [--latency 0.01] [--bandwidth 5000000]
+                                      [--error-rate 0.01] [--throttle-rate 0.01] [--stream-list-page] [--metrics]
+                                      [--durable-queues] [--shards 4] [--byte-budget-mb 64] [--trace trace.json]
+"""
+import json
+import logging
+import resource
+from argparse import ArgumentParser
+from asyncio import run
+from contextlib import nullcontext
+from functools import wraps
+from pathlib import Path
+from statistics import quantiles
+from tempfile import TemporaryDirectory
+from time import perf_counter
+from typing import Any, Callable, Optional
+
+from benchmarks.fake_wikipedia import FakeWikipediaProfile, FakeWikipediaServer
+from benchmarks.loop_lag import LoopLagMonitor
+from src.handlers.async_http_client import HTTPXClient
+from src.handlers.byte_budget import ByteBudget
+from src.handlers.durable_queue import SQLiteQueueBackend
+from src.handlers.http_archive import HTTPArchive
+from src.handlers.image_downloader import ImageDownloader
+from src.handlers.metrics import PipelineMetrics
+from src.handlers.output_sinks import IMAGES_TABLE
+from src.handlers.retry_policy import RetryPolicy
+from src.handlers.tracing import EventLoopBlockMonitor, Tracer
+from src.handlers.transport_profile import TransportProfile
+from src.processors.animals_page_processor import AnimalsPageProcessor
+from src.processors.parse_executor import ParseExecutor, ParseMode
+from src.processors.sharded_crawl import CollectedRows, ShardedCrawl, ShardSettings
+from src.processors.html_parsers.constants import ParserBackend
+
+PAGE_MODES = ("pages", "head", "api")
+
+
+def _timed(obj: Any, method_name: str, samples: list[float]) -> None:
+    """Record the service time of each call of the object's async method."""
+    method: Callable = getattr(obj, method_name)
+
+    @wraps(method)
+    async def timed_method(*args, **kwargs):
+        start = perf_counter()
+        try:
+            return await method(*args, **kwargs)
+        finally:
+            samples.append(perf_counter() - start)
+
+    setattr(obj, method_name, timed_method)
+
+
+def _percentiles(samples: list[float]) -> dict[str, float]:
+    """Service time percentiles in milliseconds."""
+    if len(samples) < 2:
+        return {"count": len(samples), "p50_ms": round(sum(samples) * 1000, 3), "p99_ms": round(sum(samples) * 1000, 3)}
+    percentiles = quantiles(samples, n=100, method="inclusive")
+    return {
+        "count": len(samples),
+        "p50_ms": round(percentiles[49] * 1000, 3),
+        "p99_ms": round(percentiles[98] * 1000, 3),
+    }
+
+
+async def bench_e2e(server: FakeWikipediaServer, mode: str, concurrency: int, parse_mode: ParseMode,
+                    parser_backend: ParserBackend, stream_list_page: bool,
+                    metrics: Optional[PipelineMetrics] = None, durable_queues: bool = False,
+                    transport_profile: Optional[TransportProfile] = None,
+                    byte_budget: Optional[ByteBudget] = None, http_archive: Optional[HTTPArchive] = None,
+                    tracer: Optional[Tracer] = None) -> dict:
+    retry_policy = RetryPolicy(max_attempts=4, base_delay=0.05, max_delay=1.0)
+    stage_samples: dict[str, list[float]] = {"list": [], "page": [], "image": []}
+    with TemporaryDirectory() as destination_dir:
+        async with HTTPXClient(retry_policy=retry_policy, metrics=metrics,
+                               transport_profile=transport_profile, http_archive=http_archive,
+                               tracer=tracer) as client, \
+                ParseExecutor(mode=parse_mode, parser_backend=parser_backend) as parse_executor:
+            image_downloader = ImageDownloader(client, Path(destination_dir), metrics=metrics,
+                                               byte_budget=byte_budget, tracer=tracer)
+            queue_backend = (
+                SQLiteQueueBackend(Path(destination_dir, "queues.sqlite"), metrics=metrics) if durable_queues else None
+            )
+            start = perf_counter()
+            animals_processor = await AnimalsPageProcessor.create(
+                client=client,
+                concurrency=concurrency,
+                image_downloader=image_downloader,
+                parse_executor=parse_executor,
+                head_only_pages=mode == "head",
+                page_images_api_url=server.api_url if mode == "api" else None,
+                stream_list_page=stream_list_page,
+                resource_url=server.list_page_url,
+                metrics=metrics,
+                queue_backend=queue_backend,
+                byte_budget=byte_budget,
+                tracer=tracer,
+            )
+            page_method_name = "resolve_image_urls" if mode == "api" else "extract_image_url"
+            _timed(animals_processor.animal_page_processor, page_method_name, stage_samples["page"])
+            _timed(image_downloader, "download_image", stage_samples["image"])
+            _timed(animals_processor, "_process_animals_wiki_page", stage_samples["list"])
+            block_monitor = EventLoopBlockMonitor(tracer) if tracer else nullcontext()
+            async with LoopLagMonitor() as lag_monitor, block_monitor:
+                await animals_processor.run()
+            elapsed = perf_counter() - start
+            if queue_backend:
+                queue_backend.close()
+
+    group_entries = sum(len(names) for names in animals_processor.collateral_adjectives_groups.values())
+    images = len(stage_samples["image"]) - len(image_downloader.dead_letters)
+    return {
+        "mode": mode,
+        "rows": server.profile.rows,
+        "stream_list_page": stream_list_page,
+        "durable_queues": durable_queues,
+        "profile": server.profile.model_dump(),
+        "seconds": round(elapsed, 3),
+        "images_per_second": round(images / elapsed, 1),
+        "adjective_group_entries": group_entries,
+        "images": images,
+        "dead_letters": len(animals_processor.dead_letters),
+        "stages": {stage: _percentiles(samples) for stage, samples in stage_samples.items()},
+        # ru_maxrss is in kilobytes on Linux.
+        "peak_rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+        "loop_lag": lag_monitor.summary(),
+        "byte_budget": byte_budget.stats().model_dump() if byte_budget else None,
+        "metrics": metrics.summary() if metrics else None,
+        "trace": {
+            "events": len(tracer.events), "loop_blocks": len(block_monitor.blocks),
+        } if tracer else None,
+    }
+
+
+async def bench_sharded(server: FakeWikipediaServer, mode: str, concurrency: int, parser_backend: ParserBackend,
+                        shards: int, metrics: Optional[PipelineMetrics] = None) -> dict:
+    """The same crawl split between shards worker processes, see ShardedCrawl."""
+    retry_policy = RetryPolicy(max_attempts=4, base_delay=0.05, max_delay=1.0)
+    with TemporaryDirectory() as destination_dir:
+        settings = ShardSettings(
+            concurrency=concurrency,
+            destination_dir=Path(destination_dir),
+            head_only_pages=mode == "head",
+            page_images_api_url=server.api_url if mode == "api" else None,
+            parser_backend=parser_backend,
+            retry_policy=retry_policy,
+        )
+        # Without metrics the saved images are counted from the shards' image rows.
+        sharded_crawl = ShardedCrawl(settings, shards, metrics=metrics, output_sink=CollectedRows())
+        async with HTTPXClient(retry_policy=retry_policy) as client, \
+                ParseExecutor(parser_backend=parser_backend) as parse_executor:
+            start = perf_counter()
+            async with LoopLagMonitor() as lag_monitor:
+                await sharded_crawl.run(client, parse_executor, server.list_page_url)
+            elapsed = perf_counter() - start
+
+    group_entries = sum(len(names) for names in sharded_crawl.collateral_adjectives_groups.values())
+    images = len(sharded_crawl.output_sink.rows.get(IMAGES_TABLE, []))
+    return {
+        "mode": mode,
+        "rows": server.profile.rows,
+        "shards": shards,
+        "profile": server.profile.model_dump(),
+        "seconds": round(elapsed, 3),
+        "images_per_second": round(images / elapsed, 1),
+        "adjective_group_entries": group_entries,
+        "images": images,
+        "dead_letters": len(sharded_crawl.dead_letters),
+        "peak_rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+        # Peak RSS of the largest shard worker.
+        "peak_shard_rss_mb": round(resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss / 1024, 1),
+        "loop_lag": lag_monitor.summary(),
+        "metrics": metrics.summary() if metrics else None,
+    }
+
+
+def main():
+    arg_parser = ArgumentParser(description=__doc__)
+    arg_parser.add_argument("--rows", type=int, default=1_000)
+    arg_parser.add_argument("--mode", choices=PAGE_MODES, default="head")
+    arg_parser.add_argument("--concurrency", type=int, default=10)
+    arg_parser.add_argument("--parse-mode", type=ParseMode, default=ParseMode.INLINE)
+    arg_parser.add_argument("--parser-backend", type=ParserBackend, default=ParserBackend.LXML)
+    arg_parser.add_argument("--stream-list-page", action="store_true")
+    arg_parser.add_argument("--metrics", action="store_true", help="Collect and report the pipeline metrics")
+    arg_parser.add_argument("--durable-queues", action="store_true", help="Use the SQLite durable queues")
+    arg_parser.add_argument("--byte-budget-mb", type=float, default=None,
+                            help="Memory budget of the pages and images in flight")
+    arg_parser.add_argument("--shards", type=int, default=1, help="Crawl in this many worker processes")
+    arg_parser.add_argument("--page-size", type=int, default=50_000)
+    arg_parser.add_argument("--image-size", type=int, default=20_000)
+    arg_parser.add_argument("--latency", type=float, default=0.0, help="Seconds before each response")
+    arg_parser.add_argument("--bandwidth", type=float, default=None, help="Bytes per second of each response")
+    arg_parser.add_argument("--error-rate", type=float, default=0.0)
+    arg_parser.add_argument("--throttle-rate", type=float, default=0.0)
+    arg_parser.add_argument("--port", type=int, default=8765)
+    arg_parser.add_argument("--trace", type=Path, default=None,
+                            help="Write a Chrome trace (Perfetto) JSON timeline of the run to this file")
+    args = arg_parser.parse_args()
+
+    # The injected failures are expected, keep the output to the JSON report.
+    logging.disable(logging.CRITICAL)
+    profile = FakeWikipediaProfile(
+        rows=args.rows,
+        page_size=args.page_size,
+        image_size=args.image_size,
+        latency=args.latency,
+        bandwidth=args.bandwidth,
+        error_rate=args.error_rate,
+        throttle_rate=args.throttle_rate,
+    )
+    metrics = PipelineMetrics() if args.metrics else None
+    with FakeWikipediaServer(profile, port=args.port) as server:
+        if args.shards > 1:
+            report = run(bench_sharded(server, args.mode, args.concurrency, args.parser_backend, args.shards, metrics))
+        else:
+            byte_budget = ByteBudget(int(args.byte_budget_mb * 1024 * 1024), metrics) if args.byte_budget_mb else None
+            tracer = Tracer() if args.trace else None
+            try:
+                report = run(bench_e2e(server, args.mode, args.concurrency, args.parse_mode, args.parser_backend,
+                                       args.stream_list_page, metrics, args.durable_queues, byte_budget=byte_budget,
+                                       tracer=tracer))
+            finally:
+                if tracer:
+                    tracer.export(args.trace)
+    print(json.dumps(report))
+
+
+if __name__ == "__main__":
+    main()
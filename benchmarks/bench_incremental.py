@@ -0,0 +1,81 @@
+"""
+Runs the pipeline twice against the local fake Wikipedia server with an incremental snapshot: a cold run that
+fetches every animal, then a steady-state run whose pages did not change, and optionally a run after every page
+revision moved. Reports the seconds and the number of HTTP requests of each run as JSON lines.
+
+Usage: python -m benchmarks.bench_incremental [--rows 1000] [--mode head] [--latency 0.005]
+"""
+import json
+import logging
+from argparse import ArgumentParser
+from asyncio import run
+from pathlib import Path
+from tempfile import TemporaryDirectory
+from time import perf_counter
+
+from benchmarks.bench_e2e import PAGE_MODES
+from benchmarks.fake_wikipedia import FakeWikipediaProfile, FakeWikipediaServer
+from src.handlers.async_http_client import HTTPXClient
+from src.handlers.image_downloader import ImageDownloader
+from src.handlers.metrics import PipelineMetrics
+from src.handlers.output_sinks import CompositeOutputSink, CSVOutputSink
+from src.handlers.retry_policy import RetryPolicy
+from src.processors.animals_page_processor import AnimalsPageProcessor
+from src.processors.html_parsers.constants import ParserBackend
+from src.processors.incremental_snapshot import IncrementalSnapshot
+from src.processors.parse_executor import ParseExecutor
+
+
+async def bench_run(server: FakeWikipediaServer, mode: str, concurrency: int, output_dir: Path, label: str) -> dict:
+    metrics = PipelineMetrics()
+    client = HTTPXClient(retry_policy=RetryPolicy(max_attempts=4, base_delay=0.05, max_delay=1.0), metrics=metrics)
+    incremental_snapshot = IncrementalSnapshot(client, output_dir, api_url=server.api_url)
+    start = perf_counter()
+    async with client, CompositeOutputSink([CSVOutputSink(output_dir), incremental_snapshot]) as output_sink:
+        image_downloader = ImageDownloader(client, output_dir, output_sink=output_sink)
+        animals_processor = await AnimalsPageProcessor.create(
+            client=client,
+            concurrency=concurrency,
+            image_downloader=image_downloader,
+            parse_executor=ParseExecutor(parser_backend=ParserBackend.LXML),
+            head_only_pages=mode == "head",
+            page_images_api_url=server.api_url if mode == "api" else None,
+            stream_list_page=True,
+            resource_url=server.list_page_url,
+            output_sink=output_sink,
+            incremental_snapshot=incremental_snapshot,
+        )
+        await animals_processor.run()
+    return {
+        "run": label,
+        "rows": server.profile.rows,
+        "seconds": round(perf_counter() - start, 3),
+        "http_requests": sum(metrics.counters["http_requests_total"].values()),
+        "reused_animals": incremental_snapshot.reused_animals,
+        "dead_letters": len(animals_processor.dead_letters),
+    }
+
+
+def main():
+    arg_parser = ArgumentParser(description=__doc__)
+    arg_parser.add_argument("--rows", type=int, default=1_000)
+    arg_parser.add_argument("--mode", choices=PAGE_MODES, default="head")
+    arg_parser.add_argument("--concurrency", type=int, default=10)
+    arg_parser.add_argument("--latency", type=float, default=0.005, help="Seconds before each response")
+    arg_parser.add_argument("--revised-run", action="store_true", help="Add a run after every page was revised")
+    arg_parser.add_argument("--port", type=int, default=8765)
+    args = arg_parser.parse_args()
+
+    logging.disable(logging.CRITICAL)
+    profile = FakeWikipediaProfile(rows=args.rows, latency=args.latency)
+    runs = [("cold", profile), ("steady_state", profile)]
+    if args.revised_run:
+        runs.append(("revised", profile.model_copy(update={"revision": profile.revision + 1})))
+    with TemporaryDirectory() as output_dir:
+        for label, run_profile in runs:
+            with FakeWikipediaServer(run_profile, port=args.port) as server:
+                print(json.dumps(run(bench_run(server, args.mode, args.concurrency, Path(output_dir), label))))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,61 @@
+"""
+Compares the parse executor modes by throughput and event-loop lag.
+
+Usage: python -m benchmarks.bench_parse_executor [--pages 200] [--page-size 200000] [--concurrency 10]
+"""
+import json
+from argparse import ArgumentParser
+from asyncio import Queue, create_task, gather, run, sleep
+from time import perf_counter
+
+from benchmarks.loop_lag import LoopLagMonitor
+from benchmarks.synthetic import animal_page_html
+from src.processors.parse_executor import ParseExecutor, ParseMode, extract_image_url
+
+
+async def _parse_pages(parse_executor: ParseExecutor, pages: list[bytes], concurrency: int) -> float:
+    queue: Queue[bytes] = Queue()
+    for page in pages:
+        queue.put_nowait(page)
+
+    async def consumer():
+        while not queue.empty():
+            page = queue.get_nowait()
+            await parse_executor.run(extract_image_url, page, "https://en.wikipedia.org/wiki/Animal")
+            # Stands in for the network await of a real consumer, letting the loop run other callbacks.
+            await sleep(0)
+
+    start = perf_counter()
+    await gather(*(create_task(consumer()) for _ in range(concurrency)))
+    return perf_counter() - start
+
+
+async def bench_mode(mode: ParseMode, pages: list[bytes], concurrency: int) -> dict:
+    async with ParseExecutor(mode=mode) as parse_executor:
+        # Warm up the pool workers so their start-up cost is not measured.
+        await _parse_pages(parse_executor, pages[:concurrency], concurrency)
+        async with LoopLagMonitor() as lag_monitor:
+            elapsed = await _parse_pages(parse_executor, pages, concurrency)
+    return {
+        "mode": mode.value,
+        "pages": len(pages),
+        "seconds": round(elapsed, 3),
+        "pages_per_second": round(len(pages) / elapsed, 1),
+        "loop_lag": lag_monitor.summary(),
+    }
+
+
+async def main():
+    arg_parser = ArgumentParser(description=__doc__)
+    arg_parser.add_argument("--pages", type=int, default=200)
+    arg_parser.add_argument("--page-size", type=int, default=200_000)
+    arg_parser.add_argument("--concurrency", type=int, default=10)
+    args = arg_parser.parse_args()
+
+    pages = [animal_page_html(index, body_size=args.page_size).encode() for index in range(args.pages)]
+    for mode in ParseMode:
+        print(json.dumps(await bench_mode(mode, pages, args.concurrency)))
+
+
+if __name__ == "__main__":
+    run(main())
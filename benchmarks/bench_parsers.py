@@ -0,0 +1,83 @@
+"""
+Compares the BeautifulSoup and lxml parser backends on a large synthetic animals table, and the single-pass
+extraction of the animals and animal terms tables with parsing the page once per table.
+
+Usage: python -m benchmarks.bench_parsers [--rows 20000] [--repeat 3]
+"""
+import json
+import logging
+from argparse import ArgumentParser
+from time import perf_counter
+
+from benchmarks.synthetic import animals_list_html
+from src.processors.html_parsers.animals_html_parser import AnimalsHTMLParser
+from src.processors.html_parsers.constants import ParserBackend
+from src.processors.html_parsers.table_specs import ANIMAL_TERMS_TABLE_SPEC, ANIMALS_TABLE_SPEC
+from src.processors.parse_executor import parse_animal_table
+
+RESOURCE_URL = "https://en.wikipedia.org/wiki/List_of_animal_names"
+
+
+def bench_backend(backend: ParserBackend, html_content: bytes, repeat: int) -> tuple[dict, list]:
+    timings = []
+    rows = []
+    for _ in range(repeat):
+        start = perf_counter()
+        rows = parse_animal_table(html_content, RESOURCE_URL, backend)
+        timings.append(perf_counter() - start)
+    best = min(timings)
+    return {
+        "backend": backend.value,
+        "rows": len(rows),
+        "best_seconds": round(best, 3),
+        "rows_per_second": round(len(rows) / best),
+    }, rows
+
+
+def bench_table_specs(backend: ParserBackend, html_content: bytes, repeat: int) -> dict:
+    table_specs = [ANIMALS_TABLE_SPEC, ANIMAL_TERMS_TABLE_SPEC]
+
+    def single_pass() -> int:
+        parser = AnimalsHTMLParser.create(html_content=html_content, resource_url=RESOURCE_URL, backend=backend)
+        return len(list(parser.parse_tables(table_specs)))
+
+    def pass_per_table() -> int:
+        return sum(
+            len(list(AnimalsHTMLParser.create(
+                html_content=html_content, resource_url=RESOURCE_URL, backend=backend
+            ).parse_tables([table_spec])))
+            for table_spec in table_specs
+        )
+
+    result = {"backend": backend.value, "tables": len(table_specs)}
+    for name, parse in (("single_pass", single_pass), ("pass_per_table", pass_per_table)):
+        timings = []
+        for _ in range(repeat):
+            start = perf_counter()
+            result["rows"] = parse()
+            timings.append(perf_counter() - start)
+        result[f"{name}_best_seconds"] = round(min(timings), 3)
+    return result
+
+
+def main():
+    arg_parser = ArgumentParser(description=__doc__)
+    arg_parser.add_argument("--rows", type=int, default=20_000)
+    arg_parser.add_argument("--repeat", type=int, default=3)
+    args = arg_parser.parse_args()
+    # The synthetic table has rows without collateral adjectives, which the parsers log as errors.
+    logging.getLogger("src.processors.html_parsers").setLevel(logging.CRITICAL)
+
+    html_content = animals_list_html(args.rows).encode()
+    results = [bench_backend(backend, html_content, args.repeat) for backend in ParserBackend]
+    rows_by_backend = [rows for _, rows in results]
+    if any(rows != rows_by_backend[0] for rows in rows_by_backend):
+        raise AssertionError("The parser backends returned different rows")
+    for result, _ in results:
+        print(json.dumps(result))
+    for backend in ParserBackend:
+        print(json.dumps(bench_table_specs(backend, html_content, args.repeat)))
+
+
+if __name__ == "__main__":
+    main()
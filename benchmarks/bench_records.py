@@ -0,0 +1,108 @@
+"""
+Compares keeping the animals table as pydantic models grouped in lists of names, with keeping it as compact
+slotted records grouped in the array-backed AdjectiveIndex: retained and peak memory, build time and pickled size
+(what a process pool worker sends back to the event loop).
+Each representation also builds the page queue item of every row, as the pipeline does, and its rows throughput
+covers the whole per-row path: the pydantic one validates the row and its queue item, the records one checks the
+row once as it leaves the parser and queues slotted items.
+
+Usage: python -m benchmarks.bench_records [--rows 100000]
+"""
+import json
+import pickle
+import tracemalloc
+from argparse import ArgumentParser
+from collections import defaultdict
+from time import perf_counter
+from typing import Callable
+
+from pydantic import BaseModel
+
+from benchmarks.synthetic import animal_name
+from src.common.schemas import PageQueueItem
+from src.processors.adjective_index import AdjectiveIndex
+from src.processors.html_parsers.schemas import AnimalRecord, ParsedAnimalData
+
+
+class PydanticPageQueueItem(BaseModel):
+    """The validated page queue item the pipeline used to build per row."""
+    page_url: str
+    page_name: str
+
+
+def _raw_rows(rows_count: int) -> list[tuple[str, list[str], str]]:
+    """Freshly built (not shared) strings, like the ones a parser returns."""
+    return [
+        (
+            animal_name(index),
+            ["lupine", "canine"] if index % 3 == 0 else [f"adjective{index % 50}"],
+            f"https://en.wikipedia.org/wiki/{animal_name(index)}",
+        )
+        for index in range(rows_count)
+    ]
+
+
+def build_models(raw_rows: list) -> tuple[list, dict, list]:
+    rows = [
+        ParsedAnimalData(name=name, collateral_adjectives=adjectives, page_url=page_url)
+        for name, adjectives, page_url in raw_rows
+    ]
+    groups = defaultdict(list)
+    for row in rows:
+        for collateral_adjective in row.collateral_adjectives:
+            groups[collateral_adjective].append(row.name)
+    page_items = [PydanticPageQueueItem(page_url=row.page_url, page_name=row.name) for row in rows]
+    return rows, groups, page_items
+
+
+def build_records(raw_rows: list) -> tuple[list, AdjectiveIndex, list]:
+    # The parser checks the row values once and builds the records directly.
+    rows = [AnimalRecord.from_cells(name, adjectives, page_url) for name, adjectives, page_url in raw_rows]
+    groups = AdjectiveIndex()
+    for row in rows:
+        for collateral_adjective in row.collateral_adjectives:
+            groups.add(collateral_adjective, row.name)
+    page_items = [PageQueueItem(page_url=row.page_url, page_name=row.name) for row in rows]
+    return rows, groups, page_items
+
+
+def bench(label: str, build: Callable, raw_rows: list) -> dict:
+    start = perf_counter()
+    build(raw_rows)
+    elapsed = perf_counter() - start
+
+    # Measured apart from the timing, tracing slows the allocations down.
+    tracemalloc.start()
+    rows, groups, page_items = build(raw_rows)
+    retained_bytes, peak_bytes = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    start = perf_counter()
+    pickled = pickle.dumps(rows, protocol=pickle.HIGHEST_PROTOCOL)
+    pickle.loads(pickled)
+    pickle_seconds = perf_counter() - start
+    return {
+        "representation": label,
+        "rows": len(rows),
+        "groups": len(groups),
+        "page_items": len(page_items),
+        "build_seconds": round(elapsed, 3),
+        "rows_per_second": round(len(rows) / elapsed),
+        "retained_memory_mb": round(retained_bytes / 1024 / 1024, 2),
+        "peak_memory_mb": round(peak_bytes / 1024 / 1024, 2),
+        "pickled_rows_mb": round(len(pickled) / 1024 / 1024, 2),
+        "pickle_round_trip_seconds": round(pickle_seconds, 3),
+    }
+
+
+def main():
+    arg_parser = ArgumentParser(description=__doc__)
+    arg_parser.add_argument("--rows", type=int, default=100_000)
+    args = arg_parser.parse_args()
+
+    for label, build in (("pydantic", build_models), ("records", build_records)):
+        print(json.dumps(bench(label, build, _raw_rows(args.rows))))
+
+
+if __name__ == "__main__":
+    main()
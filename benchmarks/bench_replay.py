@@ -0,0 +1,69 @@
+"""
+Records an end-to-end run against the local fake Wikipedia server in an HTTP archive, then replays it with the
+server stopped, so the replayed runs measure the parsing and pipeline throughput without any network I/O.
+Reports the recorded run and each replayed run as JSON lines.
+
+Usage: python -m benchmarks.bench_replay [--rows 1000] [--mode head] [--latency 0.005] [--replays 3]
+                                         [--replay-latency 0.0]
+"""
+import json
+import logging
+from argparse import ArgumentParser
+from asyncio import run
+from pathlib import Path
+from tempfile import TemporaryDirectory
+
+from benchmarks.bench_e2e import PAGE_MODES, bench_e2e
+from benchmarks.fake_wikipedia import FakeWikipediaProfile, FakeWikipediaServer
+from src.handlers.http_archive import ArchiveMode, HTTPArchive
+from src.processors.html_parsers.constants import ParserBackend
+from src.processors.parse_executor import ParseMode
+
+
+def _summary(label: str, report: dict, archive_path: Path) -> dict:
+    return {
+        "run": label,
+        "rows": report["rows"],
+        "seconds": report["seconds"],
+        "images_per_second": report["images_per_second"],
+        "images": report["images"],
+        "dead_letters": report["dead_letters"],
+        "archive_mb": round(archive_path.stat().st_size / 1024 / 1024, 1),
+        "stages": report["stages"],
+        "loop_lag": report["loop_lag"],
+    }
+
+
+def main():
+    arg_parser = ArgumentParser(description=__doc__)
+    arg_parser.add_argument("--rows", type=int, default=1_000)
+    arg_parser.add_argument("--mode", choices=PAGE_MODES, default="head")
+    arg_parser.add_argument("--concurrency", type=int, default=10)
+    arg_parser.add_argument("--parse-mode", type=ParseMode, default=ParseMode.INLINE)
+    arg_parser.add_argument("--latency", type=float, default=0.005, help="Seconds before each recorded response")
+    arg_parser.add_argument("--replays", type=int, default=3)
+    arg_parser.add_argument("--replay-latency", type=float, default=0.0, help="Seconds before each replayed response")
+    arg_parser.add_argument("--port", type=int, default=8765)
+    args = arg_parser.parse_args()
+
+    logging.disable(logging.CRITICAL)
+    profile = FakeWikipediaProfile(rows=args.rows, latency=args.latency)
+
+    def bench(server: FakeWikipediaServer, http_archive: HTTPArchive) -> dict:
+        return run(bench_e2e(server, args.mode, args.concurrency, args.parse_mode, ParserBackend.LXML,
+                             stream_list_page=True, http_archive=http_archive))
+
+    with TemporaryDirectory() as archive_dir:
+        archive_path = Path(archive_dir, "http_archive.bin")
+        with FakeWikipediaServer(profile, port=args.port) as server:
+            report = bench(server, HTTPArchive(path=archive_path, mode=ArchiveMode.RECORD))
+        print(json.dumps(_summary("recorded", report, archive_path)))
+
+        replay_archive = HTTPArchive(path=archive_path, mode=ArchiveMode.REPLAY, latency=args.replay_latency)
+        for replay in range(args.replays):
+            report = bench(server, replay_archive)
+            print(json.dumps(_summary(f"replay_{replay + 1}", report, archive_path)))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+"""
+Runs the end-to-end benchmark once per transport profile against the same fake Wikipedia server, and reports
+the throughput and the bytes on the wire of each profile as JSON lines.
+Profiles that need a missing optional package (h2 for HTTP/2, brotli for br) are reported as skipped.
+
+Usage: python -m benchmarks.bench_transport [--rows 1000] [--mode pages] [--latency 0.005] [--bandwidth 5000000]
+"""
+import json
+import logging
+from argparse import ArgumentParser
+from asyncio import run
+
+from benchmarks.bench_e2e import PAGE_MODES, bench_e2e
+from benchmarks.fake_wikipedia import FakeWikipediaProfile, FakeWikipediaServer
+from src.handlers.metrics import PipelineMetrics
+from src.handlers.transport_profile import TransportProfile
+from src.processors.html_parsers.constants import ParserBackend
+from src.processors.parse_executor import ParseMode
+
+
+def transport_profiles(concurrency: int) -> dict[str, TransportProfile]:
+    # The page and image consumers each hold a connection, so a matched pool keeps one per consumer alive.
+    consumers = 2 * concurrency
+    return {
+        "no_keepalive_identity": TransportProfile(max_keepalive_connections=0, accept_encoding="identity"),
+        "httpx_defaults_identity": TransportProfile(accept_encoding="identity"),
+        "httpx_defaults_gzip": TransportProfile(accept_encoding="gzip"),
+        "matched_pool_gzip": TransportProfile(
+            max_connections=consumers, max_keepalive_connections=consumers, keepalive_expiry=30.0,
+            connect_timeout=2.0, pool_timeout=30.0, accept_encoding="gzip",
+        ),
+        "http2_gzip_br": TransportProfile(
+            http2=True, max_connections=consumers, max_keepalive_connections=consumers, keepalive_expiry=30.0,
+            accept_encoding="gzip, br",
+        ),
+    }
+
+
+def main():
+    arg_parser = ArgumentParser(description=__doc__)
+    arg_parser.add_argument("--rows", type=int, default=1_000)
+    arg_parser.add_argument("--mode", choices=PAGE_MODES, default="pages")
+    arg_parser.add_argument("--concurrency", type=int, default=10)
+    arg_parser.add_argument("--page-size", type=int, default=50_000)
+    arg_parser.add_argument("--image-size", type=int, default=20_000)
+    arg_parser.add_argument("--latency", type=float, default=0.005, help="Seconds before each response")
+    arg_parser.add_argument("--bandwidth", type=float, default=None, help="Bytes per second of each response")
+    arg_parser.add_argument("--port", type=int, default=8765)
+    args = arg_parser.parse_args()
+
+    logging.disable(logging.CRITICAL)
+    profile = FakeWikipediaProfile(
+        rows=args.rows, page_size=args.page_size, image_size=args.image_size, latency=args.latency,
+        bandwidth=args.bandwidth,
+    )
+    with FakeWikipediaServer(profile, port=args.port) as server:
+        for name, transport_profile in transport_profiles(args.concurrency).items():
+            try:
+                transport_profile.client_kwargs()
+            except ImportError as e:
+                print(json.dumps({"transport_profile": name, "skipped": str(e)}))
+                continue
+            metrics = PipelineMetrics()
+            report = run(bench_e2e(server, args.mode, args.concurrency, ParseMode.INLINE, ParserBackend.LXML,
+                                   stream_list_page=False, metrics=metrics, transport_profile=transport_profile))
+            print(json.dumps({
+                "transport_profile": name,
+                "seconds": report["seconds"],
+                "images_per_second": report["images_per_second"],
+                "dead_letters": report["dead_letters"],
+                "response_mb": round(sum(metrics.counters["http_response_bytes_total"].values()) / 1024 / 1024, 2),
+                "page_stage": report["stages"]["page"],
+            }))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,194 @@
+"""
+A local fake Wikipedia server for the end-to-end benchmarks.
+It serves a synthetic animals list page, animal pages, image blobs and the MediaWiki "prop=pageimages" and
+"prop=info" API queries, with injectable latency, bandwidth, error rate and throttled (429) responses.
+"""
+import gzip
+import json
+from functools import lru_cache
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from multiprocessing import Event, Process
+from random import Random
+from time import sleep
+from typing import Final, Optional
+from urllib.parse import parse_qs, unquote, urlsplit
+
+from pydantic import BaseModel
+
+from benchmarks.synthetic import animal_page_html, animals_list_html
+
+LIST_PAGE_PATH: Final[str] = "/wiki/List_of_animal_names"
+API_PATH: Final[str] = "/w/api.php"
+WRITE_CHUNK_SIZE: Final[int] = 16 * 1024
+COMPRESSED_CONTENT_TYPES: Final[tuple[str, ...]] = ("text/html", "application/json")
+GZIP_LEVEL: Final[int] = 5
+
+
+class FakeWikipediaProfile(BaseModel):
+    """
+    The synthetic content and the network conditions of the fake server.
+
+    :param rows: Number of rows of the animals list table.
+    :param page_size: Approximate body size in bytes of each animal page.
+    :param image_size: Size in bytes of each image blob.
+    :param latency: Seconds each response waits before its headers are sent.
+    :param bandwidth: Bytes per second of each response body, unlimited when None.
+    :param error_rate: Probability of a 500 response, the list page never fails.
+    :param throttle_rate: Probability of a 429 response, the list page is never throttled.
+    :param retry_after: Retry-After header value of the throttled responses.
+    :param seed: Seed of the injected failures, so runs are repeatable.
+    :param compress: Gzip the HTML and JSON bodies of the requests that accept it.
+    :param revision: Revision ID of every animal page, as returned by the API "prop=info" query.
+    """
+    rows: int = 1_000
+    page_size: int = 50_000
+    image_size: int = 20_000
+    latency: float = 0.0
+    bandwidth: Optional[float] = None
+    error_rate: float = 0.0
+    throttle_rate: float = 0.0
+    retry_after: str = "0"
+    seed: int = 0
+    compress: bool = True
+    revision: int = 1
+
+
+@lru_cache(maxsize=1)
+def _list_page(rows: int) -> bytes:
+    return animals_list_html(rows).encode()
+
+
+class FakeWikipediaHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    profile: FakeWikipediaProfile = FakeWikipediaProfile()
+    random: Random = Random(0)
+
+    def do_GET(self):
+        url = urlsplit(self.path)
+        if self.profile.latency:
+            sleep(self.profile.latency)
+        if url.path == LIST_PAGE_PATH:
+            return self._send(200, _list_page(self.profile.rows), "text/html; charset=UTF-8")
+        if self._send_injected_failure():
+            return
+        if url.path == API_PATH:
+            return self._send(200, self._query_pages(parse_qs(url.query)), "application/json")
+        index = self._animal_index(url.path)
+        if index is None:
+            return self._send(404, b"Not found", "text/plain")
+        if url.path.startswith("/wiki/"):
+            page = animal_page_html(index, body_size=self.profile.page_size, image_base_url=self._base_url())
+            return self._send(200, page.encode(), "text/html; charset=UTF-8")
+        if url.path.startswith("/images/"):
+            return self._send(200, index.to_bytes(8, "big") * (self.profile.image_size // 8), "image/jpeg")
+        return self._send(404, b"Not found", "text/plain")
+
+    def _send_injected_failure(self) -> bool:
+        draw = self.random.random()
+        if draw < self.profile.error_rate:
+            self._send(500, b"Injected error", "text/plain")
+            return True
+        if draw < self.profile.error_rate + self.profile.throttle_rate:
+            self._send(429, b"Injected throttling", "text/plain", {"Retry-After": self.profile.retry_after})
+            return True
+        return False
+
+    def _query_pages(self, query: dict[str, list[str]]) -> bytes:
+        """The "prop=pageimages" and "prop=info" queries."""
+        prop = query.get("prop", [""])[0].split("|")
+        pages = []
+        for title in query.get("titles", [""])[0].split("|"):
+            index = self._animal_index(f"/wiki/{title}")
+            page = {"title": title}
+            if index is None:
+                page["missing"] = True
+            else:
+                if "pageimages" in prop:
+                    page["original"] = {"source": f"{self._base_url()}/images/Animal{index}.jpg"}
+                if "info" in prop:
+                    page["lastrevid"] = self.profile.revision
+            pages.append(page)
+        return json.dumps({"query": {"pages": pages}}).encode()
+
+    def _send(self, status: int, body: bytes, content_type: str, headers: Optional[dict[str, str]] = None):
+        headers = dict(headers or {})
+        if (
+            self.profile.compress
+            and content_type.startswith(COMPRESSED_CONTENT_TYPES)
+            and "gzip" in self.headers.get("Accept-Encoding", "")
+        ):
+            body = gzip.compress(body, compresslevel=GZIP_LEVEL)
+            headers["Content-Encoding"] = "gzip"
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.end_headers()
+        if not self.profile.bandwidth:
+            self.wfile.write(body)
+            return
+        for start in range(0, len(body), WRITE_CHUNK_SIZE):
+            chunk = body[start:start + WRITE_CHUNK_SIZE]
+            self.wfile.write(chunk)
+            sleep(len(chunk) / self.profile.bandwidth)
+
+    def _base_url(self) -> str:
+        host, port = self.server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    @staticmethod
+    def _animal_index(path: str) -> Optional[int]:
+        name = unquote(path).rsplit("/", 1)[-1].split(".", 1)[0]
+        if not name.startswith("Animal") or not name[len("Animal"):].isdigit():
+            return None
+        return int(name[len("Animal"):])
+
+    def log_message(self, format, *args):
+        pass
+
+
+def _serve(profile: FakeWikipediaProfile, port: int, ready: Event):
+    FakeWikipediaHandler.profile = profile
+    FakeWikipediaHandler.random = Random(profile.seed)
+    _list_page(profile.rows)
+    server = ThreadingHTTPServer(("127.0.0.1", port), FakeWikipediaHandler)
+    server.daemon_threads = True
+    ready.set()
+    server.serve_forever()
+
+
+class FakeWikipediaServer:
+    """
+    Runs the fake server in a child process, so serving does not compete with the measured event loop.
+    """
+
+    def __init__(self, profile: FakeWikipediaProfile, port: int = 8765):
+        self.profile = profile
+        self.port = port
+        self._process: Optional[Process] = None
+
+    @property
+    def base_url(self) -> str:
+        return f"http://127.0.0.1:{self.port}"
+
+    @property
+    def list_page_url(self) -> str:
+        return f"{self.base_url}{LIST_PAGE_PATH}"
+
+    @property
+    def api_url(self) -> str:
+        return f"{self.base_url}{API_PATH}"
+
+    def __enter__(self):
+        ready = Event()
+        self._process = Process(target=_serve, args=(self.profile, self.port, ready), daemon=True)
+        self._process.start()
+        if not ready.wait(timeout=60):
+            self._process.terminate()
+            raise RuntimeError("The fake Wikipedia server did not start")
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self._process.terminate()
+        self._process.join()
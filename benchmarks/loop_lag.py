@@ -0,0 +1,45 @@
+"""Event-loop lag sampling shared by the benchmarks."""
+from asyncio import CancelledError, Task, create_task, get_running_loop, sleep
+from statistics import quantiles
+from typing import Optional
+
+
+class LoopLagMonitor:
+    """
+    Samples how late the event loop wakes up a periodic sleeper.
+    The lag is how long other callbacks (e.g. inline HTML parsing) blocked the loop.
+    """
+
+    def __init__(self, interval: float = 0.005):
+        self.interval = interval
+        self.lags: list[float] = []
+        self._task: Optional[Task] = None
+
+    async def __aenter__(self):
+        self._task = create_task(self._sample())
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        self._task.cancel()
+        try:
+            await self._task
+        except CancelledError:
+            pass
+
+    async def _sample(self):
+        loop = get_running_loop()
+        while True:
+            scheduled_at = loop.time()
+            await sleep(self.interval)
+            self.lags.append(max(0.0, loop.time() - scheduled_at - self.interval))
+
+    def summary(self) -> dict[str, float]:
+        """Lag percentiles in milliseconds."""
+        if len(self.lags) < 2:
+            return {"p50_ms": 0.0, "p99_ms": 0.0, "max_ms": round(max(self.lags, default=0.0) * 1000, 3)}
+        percentiles = quantiles(self.lags, n=100, method="inclusive")
+        return {
+            "p50_ms": round(percentiles[49] * 1000, 3),
+            "p99_ms": round(percentiles[98] * 1000, 3),
+            "max_ms": round(max(self.lags) * 1000, 3),
+        }
@@ -0,0 +1,61 @@
+"""Synthetic Wikipedia-like HTML documents used by the benchmarks."""
+from typing import Final
+
+FILLER_PARAGRAPH: Final[str] = (
+    "<p>The animal is a member of its taxon and is found in many regions of the world. "
+    '<a href="/wiki/Habitat" title="Habitat">Habitat</a> and '
+    '<a href="/wiki/Diet" title="Diet">diet</a> vary between populations.<sup>[1]</sup></p>\n'
+)
+
+
+def animal_name(index: int) -> str:
+    return f"Animal{index}"
+
+
+def image_path(index: int) -> str:
+    return f"/images/{animal_name(index)}.jpg"
+
+
+def animal_page_html(index: int, body_size: int = 200_000, image_base_url: str = "") -> str:
+    """An animal article with the og:image meta tag in its head and a body of about body_size bytes."""
+    paragraphs = FILLER_PARAGRAPH * max(1, body_size // len(FILLER_PARAGRAPH))
+    return (
+        "<!DOCTYPE html><html><head>"
+        f"<title>{animal_name(index)} - Wikipedia</title>"
+        '<meta charset="UTF-8">'
+        f'<meta property="og:image" content="{image_base_url}{image_path(index)}">'
+        f'<meta property="og:title" content="{animal_name(index)}">'
+        "</head><body>"
+        f'<h1 id="firstHeading">{animal_name(index)}</h1>'
+        f"{paragraphs}"
+        "</body></html>"
+    )
+
+
+def animals_table_row(index: int) -> str:
+    adjectives = ["lupine", "canine"] if index % 3 == 0 else [f"adjective{index % 50}"]
+    adjectives_cell = "<br>".join(adjectives) + "<sup>[2]</sup>" if index % 7 else "—"
+    return (
+        "<tr>"
+        f'<td><a href="/wiki/{animal_name(index)}" title="{animal_name(index)}">{animal_name(index)}</a></td>'
+        f"<td>{animal_name(index)}s</td>"
+        f"<td>{animal_name(index)}ling</td>"
+        f"<td>{adjectives_cell}</td>"
+        "</tr>\n"
+    )
+
+
+def animals_list_html(rows_count: int) -> str:
+    """A List_of_animal_names like page with a terms table of rows_count rows."""
+    rows = "".join(animals_table_row(index) for index in range(rows_count))
+    return (
+        "<!DOCTYPE html><html><head><title>List of animal names - Wikipedia</title></head><body>"
+        f"{FILLER_PARAGRAPH * 20}"
+        '<h2><span class="mw-headline" id="Terms_by_species_or_taxon">Terms by species or taxon</span></h2>'
+        '<table class="wikitable sortable" style="text-align:left;"><tbody>'
+        "<tr><th>Animal</th><th>Young</th><th>Female</th><th>Collateral adjective</th></tr>\n"
+        f"{rows}"
+        "</tbody></table>"
+        f"{FILLER_PARAGRAPH * 20}"
+        "</body></html>"
+    )
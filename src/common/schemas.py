@@ -1,17 +1,31 @@
+from dataclasses import dataclass
+
 from pydantic import BaseModel
 
 
-class PageQueueItem(BaseModel):
+@dataclass(frozen=True, slots=True)
+class PageQueueItem:
     """
-    Pydantic schema for items in the page_queue.
+    Item of the page_queue, built by the pipeline from rows that were already checked, so it is not validated again.
     """
     page_url: str
     page_name: str
 
 
-class ImageQueueItem(BaseModel):
+@dataclass(frozen=True, slots=True)
+class ImageQueueItem:
     """
-    Pydantic schema for items in the image_queue.
+    Item of the image_queue, built by the pipeline from rows that were already checked, so it is not validated again.
     """
     image_url: str
     image_name: str
+
+
+class DeadLetterItem(BaseModel):
+    """
+    Pydantic schema for pipeline items that failed and were dropped.
+    """
+    stage: str
+    item_name: str
+    url: str
+    error: str
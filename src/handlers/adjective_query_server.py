@@ -0,0 +1,161 @@
+"""
+Serves an adjective query index file over HTTP.
+
+Usage: python -m src.handlers.adjective_query_server [--index src/output/adjectives.idx] [--port 9200]
+"""
+import json
+import logging
+from argparse import ArgumentParser
+from asyncio import AbstractServer, StreamReader, StreamWriter, run, start_server
+from functools import lru_cache
+from logging import getLogger
+from pathlib import Path
+from typing import Final, Optional
+from urllib.parse import parse_qs, unquote, urlsplit
+
+from src.processors.adjective_query_index import ADJECTIVES_SIDE, ANIMALS_SIDE, AdjectiveQueryIndex
+
+logger = getLogger(__name__)
+
+Reply = tuple[str, bytes]
+
+
+class AdjectiveQueryServer:
+    """
+    Serves the lookups of an adjective query index as JSON over HTTP/1.1 keep-alive connections:
+    "/adjectives/<adjective>" returns the adjective's animals, "/animals/<animal>" the animal's adjectives,
+    and "/search?prefix=<prefix>&limit=<limit>" the adjectives and animals starting with the prefix.
+    The encoded responses of the most recent distinct requests are kept in an LRU cache.
+    """
+    MAX_SEARCH_LIMIT: Final[int] = 100
+    # Headers of a request with a body, which is not read: only GET requests are served.
+    BODY_HEADERS: Final[frozenset[bytes]] = frozenset({b"content-length", b"transfer-encoding"})
+
+    def __init__(self, index: AdjectiveQueryIndex, host: str = "127.0.0.1", port: int = 9200,
+                 cache_size: int = 4096):
+        """
+        :param index: The served index.
+        :param host: Host of the server.
+        :param port: Port of the server, 0 for any free port, which is set once the server is started.
+        :param cache_size: Number of cached responses.
+        """
+        self.index = index
+        self.host = host
+        self.port = port
+        self.reply = lru_cache(maxsize=cache_size)(self._route)
+        self._server: Optional[AbstractServer] = None
+
+    async def __aenter__(self):
+        self._server = await start_server(self._handle, self.host, self.port)
+        self.port = self._server.sockets[0].getsockname()[1]
+        logger.info(f"Serving the adjective query index at http://{self.host}:{self.port}/")
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        self._server.close()
+        await self._server.wait_closed()
+
+    async def serve_forever(self):
+        await self._server.serve_forever()
+
+    async def _handle(self, reader: StreamReader, writer: StreamWriter):
+        try:
+            while True:
+                try:
+                    request_line = await reader.readline()
+                except ValueError:
+                    # The request line is longer than the reader's limit.
+                    await self._respond(writer, self._json("414 URI Too Long", {"error": "request line too long"}))
+                    break
+                if not request_line:
+                    break
+                keep_alive = not request_line.rstrip().endswith(b"HTTP/1.0")
+                try:
+                    while (header := await reader.readline()) not in (b"\r\n", b"\n", b""):
+                        name, _, value = header.lower().partition(b":")
+                        if name == b"connection":
+                            keep_alive = b"close" not in value
+                        elif name in self.BODY_HEADERS and value.strip() != b"0":
+                            # Request bodies are not read, the connection cannot be reused after one.
+                            keep_alive = False
+                except ValueError:
+                    await self._respond(writer, self._json("400 Bad Request", {"error": "header line too long"}))
+                    break
+                parts = request_line.split(b" ")
+                if len(parts) >= 3 and parts[0] != b"GET":
+                    await self._respond(writer, self._json("405 Method Not Allowed", {"error": "only GET is allowed"}),
+                                        headers={"Allow": "GET"})
+                    break
+                target = parts[1].decode("latin-1") if len(parts) >= 3 else ""
+                await self._respond(writer, self.reply(target), keep_alive)
+                if not keep_alive:
+                    break
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+    @staticmethod
+    async def _respond(writer: StreamWriter, reply: Reply, keep_alive: bool = False,
+                       headers: Optional[dict[str, str]] = None):
+        status, payload = reply
+        extra_headers = "".join(f"{name}: {value}\r\n" for name, value in (headers or {}).items())
+        writer.write(
+            f"HTTP/1.1 {status}\r\nContent-Type: application/json\r\nContent-Length: {len(payload)}\r\n"
+            f"{extra_headers}Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n".encode() + payload
+        )
+        await writer.drain()
+
+    def _route(self, target: str) -> Reply:
+        """Returns the status and JSON body of a request target."""
+        url = urlsplit(target)
+        resource, _, term = url.path.lstrip("/").partition("/")
+        term = unquote(term)
+        if resource == "adjectives" and term:
+            animals = self.index.animals(term)
+            if animals is not None:
+                return self._json("200 OK", {"adjective": self.index.label(ADJECTIVES_SIDE, term), "animals": animals})
+        elif resource == "animals" and term:
+            adjectives = self.index.adjectives(term)
+            if adjectives is not None:
+                return self._json("200 OK", {"animal": self.index.label(ANIMALS_SIDE, term), "adjectives": adjectives})
+        elif resource == "search" and not term:
+            query = parse_qs(url.query)
+            prefix = query.get("prefix", [""])[0]
+            try:
+                limit = min(int(query.get("limit", ["10"])[0]), self.MAX_SEARCH_LIMIT)
+            except ValueError:
+                return self._json("400 Bad Request", {"error": "limit must be an integer"})
+            return self._json("200 OK", {
+                "prefix": prefix,
+                "adjectives": self.index.search_adjectives(prefix, limit),
+                "animals": self.index.search_animals(prefix, limit),
+            })
+        return self._json("404 Not Found", {"error": "not found"})
+
+    @staticmethod
+    def _json(status: str, body: dict) -> Reply:
+        return status, json.dumps(body).encode()
+
+
+async def serve(index_path: Path, host: str, port: int, cache_size: int):
+    with AdjectiveQueryIndex.load(index_path) as index:
+        logger.info(f"Loaded {index.adjectives_count} adjectives and {index.animals_count} animals")
+        async with AdjectiveQueryServer(index, host, port, cache_size) as server:
+            await server.serve_forever()
+
+
+def main():
+    arg_parser = ArgumentParser(description=__doc__)
+    arg_parser.add_argument("--index", type=Path, default=Path(__file__).parents[1] / "output" / "adjectives.idx")
+    arg_parser.add_argument("--host", default="127.0.0.1")
+    arg_parser.add_argument("--port", type=int, default=9200)
+    arg_parser.add_argument("--cache-size", type=int, default=4096)
+    args = arg_parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    run(serve(args.index, args.host, args.port, args.cache_size))
+
+
+if __name__ == "__main__":
+    main()
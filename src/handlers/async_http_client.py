@@ -1,13 +1,112 @@
-from httpx import AsyncClient, HTTPError, RequestError, TimeoutException
+from asyncio import Task, create_task, shield, sleep
+from contextlib import asynccontextmanager
+from time import perf_counter
+from typing import AsyncIterator, Callable, Final, Optional
+
+from httpx import AsyncClient, HTTPError, Headers, RequestError, Response, TimeoutException, TransportError, codes
+
+from src.handlers.circuit_breaker import CircuitBreaker, HostCircuitBreaker
+from src.handlers.http_archive import HTTPArchive
+from src.handlers.http_cache import CacheWriter, HTTPCache
+from src.handlers.metrics import PipelineMetrics, host_of
+from src.handlers.rate_limiter import HostRateLimiter
+from src.handlers.retry_policy import RetryPolicy
+from src.handlers.tracing import Tracer
+from src.handlers.transport_profile import TransportProfile
+
+
+class StreamedResponse:
+    """
+    A streamed response whose body is read in chunks.
+    When the response is cacheable, the body is cached once it has been read in full.
+    """
+
+    def __init__(self, response: Response, cache_writer: Optional[CacheWriter] = None):
+        self.response = response
+        self.cache_writer = cache_writer
+
+    @property
+    def status_code(self) -> int:
+        return self.response.status_code
+
+    @property
+    def headers(self) -> Headers:
+        return self.response.headers
+
+    @property
+    def num_bytes_downloaded(self) -> int:
+        return self.response.num_bytes_downloaded
+
+    async def aiter_bytes(self, chunk_size: Optional[int] = None) -> AsyncIterator[bytes]:
+        async for chunk in self.response.aiter_bytes(chunk_size):
+            if self.cache_writer:
+                await self.cache_writer.write(chunk)
+            yield chunk
+        if self.cache_writer:
+            await self.cache_writer.commit()
+            self.cache_writer = None
+
+    async def aclose(self):
+        if self.cache_writer:
+            await self.cache_writer.abort()
+            self.cache_writer = None
+        await self.response.aclose()
 
 
 class HTTPXClient:
     """
     A wrapper class for httpx AsyncClient to handle http requests.
     """
+    THROTTLE_STATUS_CODES: Final[frozenset[int]] = frozenset({codes.TOO_MANY_REQUESTS, codes.SERVICE_UNAVAILABLE})
 
-    async def __aenter__(self, **kwargs):
-        self.client = AsyncClient(**kwargs)
+    def __init__(self, cache: Optional[HTTPCache] = None, rate_limiter: Optional[HostRateLimiter] = None,
+                 retry_policy: Optional[RetryPolicy] = None, circuit_breaker: Optional[HostCircuitBreaker] = None,
+                 single_flight: bool = True, metrics: Optional[PipelineMetrics] = None,
+                 transport_profile: Optional[TransportProfile] = None, http_archive: Optional[HTTPArchive] = None,
+                 tracer: Optional[Tracer] = None, **client_kwargs):
+        """
+        Initializes the client settings, the underlying AsyncClient is created on enter.
+
+        :param cache: Optional on-disk response cache used for conditional GET requests.
+        :param rate_limiter: Optional per-host rate limiter applied to every request.
+                             Throttled (429, or 503 with Retry-After) requests are re-sent after the host's pause.
+        :param retry_policy: Retries and per-attempt timeouts of transient failures, RetryPolicy() by default.
+        :param circuit_breaker: Optional per-host circuit breaker that fails requests fast while a host is unhealthy.
+        :param single_flight: Concurrent GET requests of the same URL share a single request and its response.
+        :param metrics: Optional metrics of the requests by host: count by status, latency, bytes and errors.
+        :param transport_profile: Optional protocol, connection pool, timeouts and encodings of the requests.
+        :param http_archive: Optional archive that every response is recorded in, or that the responses are
+                             replayed from without sending any request. The response cache is then not used,
+                             so full responses are recorded rather than 304 revalidations of cached ones.
+        :param tracer: Optional tracer of each request and its phases: DNS and connect, TLS, time to first byte
+                       and body, through httpx event hooks.
+        :param client_kwargs: Keyword arguments passed to httpx AsyncClient, they take precedence over the profile.
+        """
+        self.cache = None if http_archive else cache
+        self.rate_limiter = rate_limiter
+        self.retry_policy = retry_policy or RetryPolicy()
+        self.circuit_breaker = circuit_breaker
+        self.single_flight = single_flight
+        self.metrics = metrics
+        self.transport_profile = transport_profile
+        self.http_archive = http_archive
+        self.tracer = tracer
+        self.coalesced_requests = 0
+        self._in_flight: dict[str, Task[Response]] = {}
+        self.client_kwargs = client_kwargs
+        self.client: Optional[AsyncClient] = None
+
+    async def __aenter__(self):
+        profile_kwargs = self.transport_profile.client_kwargs() if self.transport_profile else {}
+        client_kwargs = {**profile_kwargs, **self.client_kwargs}
+        if self.http_archive:
+            client_kwargs["transport"] = self.http_archive.transport(client_kwargs)
+        if self.tracer:
+            event_hooks = client_kwargs.get("event_hooks") or {}
+            client_kwargs["event_hooks"] = {
+                event: [*event_hooks.get(event, []), *hooks] for event, hooks in self.tracer.http_event_hooks().items()
+            }
+        self.client = AsyncClient(**client_kwargs)
         return self
 
     async def __aexit__(self, exc_type, exc_val, exc_tb):
@@ -15,9 +114,177 @@ class HTTPXClient:
             await self.client.aclose()
 
     async def get(self, url):
+        if not self.single_flight:
+            return await self._get(url)
+        in_flight_request = self._in_flight.get(url)
+        if in_flight_request:
+            self.coalesced_requests += 1
+        else:
+            in_flight_request = create_task(self._get(url))
+            self._in_flight[url] = in_flight_request
+            in_flight_request.add_done_callback(lambda _: self._in_flight.pop(url, None))
+        # Shielded so that a cancelled caller does not cancel the request shared with the others.
+        return await shield(in_flight_request)
+
+    async def _get(self, url: str) -> Response:
         try:
-            response = await self.client.get(url=url)
+            if self.cache:
+                return await self._cached_get(url)
+            response = await self._send(url)
             response.raise_for_status()
+            if self.metrics:
+                self._record_response_bytes(url, response)
             return response
         except (HTTPError, RequestError, TimeoutException) as e:
             raise ConnectionError(e) from e
+
+    @asynccontextmanager
+    async def stream(self, url: str, use_cache: bool = True) -> AsyncIterator[StreamedResponse]:
+        """
+        Sends a GET request and yields the response without reading its body.
+        With a response cache, the request is conditional and a not modified body is streamed from disk.
+
+        :param url: The requested URL.
+        :param use_cache: Whether the response cache is used, callers that keep the body themselves may skip it.
+        """
+        try:
+            streamed_response = await self._open_stream(url, self.cache if use_cache else None)
+            try:
+                yield streamed_response
+            finally:
+                await streamed_response.aclose()
+                if self.metrics:
+                    self.metrics.increment(
+                        "http_response_bytes_total", streamed_response.num_bytes_downloaded, host=host_of(url)
+                    )
+        except (HTTPError, RequestError, TimeoutException) as e:
+            raise ConnectionError(e) from e
+
+    async def stream_until(self, url: str, consumer: Callable[[bytes], bool]) -> Response:
+        """
+        Streams the response body into the consumer and closes the stream as soon as the consumer is done.
+
+        :param url: The requested URL.
+        :param consumer: Called with each body chunk, returns True when it does not need more content.
+        :return: The response, its body is not available.
+        """
+        async with self.stream(url) as streamed_response:
+            async for chunk in streamed_response.aiter_bytes():
+                if consumer(chunk):
+                    break
+        return streamed_response.response
+
+    async def _open_stream(self, url: str, cache: Optional[HTTPCache]) -> StreamedResponse:
+        """Send a (conditional) streamed GET request and wrap its response."""
+        entry = await cache.load(url) if cache else None
+        response = await self._send(url, headers=entry.conditional_headers() if entry else None, stream=True)
+        if entry and response.status_code == codes.NOT_MODIFIED:
+            await response.aclose()
+            try:
+                entry = await cache.refresh(entry, response)
+                return StreamedResponse(cache.to_streaming_response(entry, response.request))
+            except OSError:
+                # The cached body is gone, fall back to a full request.
+                response = await self._send(url, stream=True)
+        try:
+            response.raise_for_status()
+        except HTTPError:
+            await response.aclose()
+            raise
+        return StreamedResponse(response, cache.writer(url, response) if cache else None)
+
+    async def _cached_get(self, url: str) -> Response:
+        """Revalidate the cached response of the URL with a conditional GET, or fetch and cache it."""
+        entry = await self.cache.load(url)
+        headers = entry.conditional_headers() if entry else None
+        response = await self._send(url, headers=headers)
+        if entry and response.status_code == codes.NOT_MODIFIED:
+            try:
+                entry = await self.cache.refresh(entry, response)
+                return await self.cache.to_response(entry, response.request)
+            except OSError:
+                # The cached body is gone, fall back to a full request.
+                response = await self._send(url)
+        response.raise_for_status()
+        await self.cache.store(url, response)
+        if self.metrics:
+            self._record_response_bytes(url, response)
+        return response
+
+    async def _send(self, url: str, headers: Optional[dict[str, str]] = None, stream: bool = False,
+                    method: str = "GET") -> Response:
+        """
+        Send a request within the host's rate limit and circuit breaker,
+        re-sending it on transient failures according to the retry policy.
+        """
+        breaker = self.circuit_breaker.get(url) if self.circuit_breaker else None
+        timeout = self.retry_policy.timeout(method)
+        if self.transport_profile:
+            timeout = self.transport_profile.timeout(timeout)
+        request = self.client.build_request(method, url, headers=headers, timeout=timeout)
+        attempt = 0
+        while True:
+            if breaker:
+                breaker.before_request()
+            if self.rate_limiter:
+                await self.rate_limiter.acquire(url)
+            sent_at = perf_counter()
+            try:
+                response = await self.client.send(request, stream=stream)
+            except TransportError as e:
+                if self.metrics:
+                    self._record_request_metrics(url, sent_at, error=e)
+                if breaker:
+                    breaker.record_failure()
+                if self.retry_policy.is_last_attempt(attempt) or not self.retry_policy.should_retry_error(method, e):
+                    raise
+                await sleep(self.retry_policy.backoff(attempt))
+            else:
+                if self.metrics:
+                    self._record_request_metrics(url, sent_at, status_code=response.status_code)
+                if breaker:
+                    self._record_response_health(breaker, response)
+                if (
+                    self.retry_policy.is_last_attempt(attempt)
+                    or not self.retry_policy.should_retry_status(method, response.status_code)
+                ):
+                    return response
+                await response.aclose()
+                if self.rate_limiter and self._is_throttled(response):
+                    self.rate_limiter.throttle(url, response.headers.get("Retry-After"))
+                else:
+                    await sleep(self.retry_policy.backoff(attempt))
+            attempt += 1
+
+    def _record_request_metrics(self, url: str, sent_at: float, status_code: Optional[int] = None,
+                                error: Optional[Exception] = None):
+        """Record an attempt's time to the response headers, its status or its transport error class."""
+        host = host_of(url)
+        self.metrics.observe("http_request_seconds", perf_counter() - sent_at, host=host)
+        if error:
+            self.metrics.increment("http_errors_total", host=host, error=type(error).__name__)
+        else:
+            self.metrics.increment("http_requests_total", host=host, status=str(status_code))
+
+    def _record_response_bytes(self, url: str, response: Response):
+        """Record the body bytes as received, before their content decoding, of a read response."""
+        # Responses built in memory, e.g. by a mock transport, have no downloaded bytes count.
+        received_bytes = response.num_bytes_downloaded or len(response.content)
+        self.metrics.increment("http_response_bytes_total", received_bytes, host=host_of(url))
+
+    @classmethod
+    def _is_throttled(cls, response: Response) -> bool:
+        """A 429, or a 503 with a Retry-After pause; a bare 503 is a host that is down."""
+        if response.status_code == codes.SERVICE_UNAVAILABLE:
+            return "Retry-After" in response.headers
+        return response.status_code in cls.THROTTLE_STATUS_CODES
+
+    @classmethod
+    def _record_response_health(cls, breaker: CircuitBreaker, response: Response):
+        """Server errors count as host failures, throttling is left to the rate limiter."""
+        if cls._is_throttled(response):
+            breaker.record_throttled()
+        elif response.is_server_error:
+            breaker.record_failure()
+        else:
+            breaker.record_success()
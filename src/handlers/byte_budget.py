@@ -0,0 +1,136 @@
+from asyncio import Future, get_running_loop
+from collections import deque
+from contextlib import asynccontextmanager
+from time import perf_counter
+from typing import AsyncIterator, Optional
+
+from pydantic import BaseModel
+
+from src.handlers.metrics import PipelineMetrics
+
+
+class ByteBudgetStats(BaseModel):
+    """
+    Pydantic schema for the usage statistics of a byte budget.
+    """
+    max_bytes: int
+    used_bytes: int = 0
+    peak_bytes: int = 0
+    reservations: int = 0
+    waited_reservations: int = 0
+    waited_seconds: float = 0.0
+
+
+class Reservation:
+    """
+    Bytes reserved in a ByteBudget, released when the reserved() context exits.
+    """
+
+    def __init__(self, budget: "ByteBudget", size: int):
+        self.budget = budget
+        self.size = size
+
+    def resize(self, size: int):
+        """
+        Replaces the estimated size with the actual one, once it is known.
+        Growing never waits, so the budget may be exceeded until the reservation is released,
+        and no other reservation is granted meanwhile.
+        """
+        self.budget._adjust(size - self.size)
+        self.size = size
+
+
+class ByteBudget:
+    """
+    A memory budget shared by the pipeline stages, bounding the bytes that their items hold rather than their count.
+    Consumers reserve the bytes they expect to hold (a Content-Length, or an estimate) before reading a body,
+    and release them once it has been written or parsed. Reservations are granted in FIFO order and wait
+    while the budget is used up. A reservation larger than the whole budget is granted once the budget is unused.
+    """
+
+    def __init__(self, max_bytes: int, metrics: Optional[PipelineMetrics] = None):
+        """
+        :param max_bytes: Total bytes the reservations may hold.
+        :param metrics: Optional metrics of the budget: used bytes and reservation wait times.
+        """
+        self.max_bytes = max_bytes
+        self.metrics = metrics
+        self._stats = ByteBudgetStats(max_bytes=max_bytes)
+        self._waiters: deque[tuple[int, Future]] = deque()
+
+    @property
+    def used_bytes(self) -> int:
+        return self._stats.used_bytes
+
+    @asynccontextmanager
+    async def reserved(self, size: int) -> AsyncIterator[Reservation]:
+        """
+        Reserves the bytes for the duration of the context, waiting for them to be available.
+
+        :param size: Expected number of bytes.
+        """
+        reservation = Reservation(self, await self.reserve(size))
+        try:
+            yield reservation
+        finally:
+            self.release(reservation.size)
+
+    async def reserve(self, size: int) -> int:
+        """
+        Reserves the bytes, waiting for them to be available.
+
+        :param size: Expected number of bytes.
+        :return: The reserved number of bytes, to release later.
+        """
+        size = max(0, size)
+        self._stats.reservations += 1
+        if not self._waiters and self._fits(size):
+            self._adjust(size)
+            return size
+
+        waiter = get_running_loop().create_future()
+        self._waiters.append((size, waiter))
+        self._stats.waited_reservations += 1
+        started_at = perf_counter()
+        try:
+            await waiter
+        except BaseException:
+            if waiter.done() and not waiter.cancelled():
+                # Granted while being cancelled.
+                self.release(size)
+            else:
+                if (size, waiter) in self._waiters:
+                    self._waiters.remove((size, waiter))
+                self._grant_waiters()
+            raise
+        finally:
+            waited_seconds = perf_counter() - started_at
+            self._stats.waited_seconds += waited_seconds
+            if self.metrics:
+                self.metrics.observe("byte_budget_wait_seconds", waited_seconds)
+        return size
+
+    def release(self, size: int):
+        """Releases reserved bytes, granting the waiting reservations that now fit."""
+        self._adjust(-size)
+        self._grant_waiters()
+
+    def stats(self) -> ByteBudgetStats:
+        return self._stats.model_copy()
+
+    def _fits(self, size: int) -> bool:
+        return self._stats.used_bytes + size <= self.max_bytes or self._stats.used_bytes == 0
+
+    def _grant_waiters(self):
+        while self._waiters and self._fits(self._waiters[0][0]):
+            size, waiter = self._waiters.popleft()
+            if waiter.cancelled():
+                continue
+            self._adjust(size)
+            waiter.set_result(None)
+
+    def _adjust(self, delta: int):
+        self._stats.used_bytes += delta
+        self._stats.peak_bytes = max(self._stats.peak_bytes, self._stats.used_bytes)
+        if self.metrics:
+            self.metrics.set_gauge("byte_budget_used_bytes", self._stats.used_bytes)
@@ -0,0 +1,103 @@
+import logging
+from enum import Enum
+from time import monotonic
+from typing import Optional
+from urllib.parse import urlsplit
+
+logger = logging.getLogger(__name__)
+
+
+class CircuitState(str, Enum):
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+
+class CircuitOpenError(ConnectionError):
+    """Raised when a request is rejected because its host's circuit is open."""
+
+
+class CircuitBreaker:
+    """
+    A circuit breaker of a single host.
+    After failure_threshold consecutive failures the circuit opens and requests fail fast.
+    Once recovery_timeout passed, a single trial request is let through (half open):
+    its success closes the circuit and its failure opens it again.
+    A trial request that never reports back is given up after another recovery_timeout.
+    A throttled trial request leaves the circuit half open, and lets the next request through as the trial.
+    """
+
+    def __init__(self, host: str, failure_threshold: int, recovery_timeout: float):
+        self.host = host
+        self.failure_threshold = failure_threshold
+        self.recovery_timeout = recovery_timeout
+        self.state = CircuitState.CLOSED
+        self._consecutive_failures = 0
+        self._opened_at = 0.0
+        self._trial_started_at: Optional[float] = None
+
+    def before_request(self):
+        """
+        Checks that a request may be sent to the host.
+
+        :raises CircuitOpenError: If the circuit is open or its trial request is in flight.
+        """
+        now = monotonic()
+        if self.state == CircuitState.OPEN and now - self._opened_at >= self.recovery_timeout:
+            self.state = CircuitState.HALF_OPEN
+            self._trial_started_at = None
+
+        if self.state == CircuitState.HALF_OPEN and self._trial_started_at is not None:
+            if now - self._trial_started_at < self.recovery_timeout:
+                raise CircuitOpenError(f"Circuit of host {self.host} is half open, waiting for its trial request")
+
+        if self.state == CircuitState.OPEN:
+            raise CircuitOpenError(f"Circuit of host {self.host} is open")
+
+        if self.state == CircuitState.HALF_OPEN:
+            self._trial_started_at = now
+
+    def record_success(self):
+        if self.state != CircuitState.CLOSED:
+            logger.info(f"Circuit of host {self.host} is closed")
+        self.state = CircuitState.CLOSED
+        self._consecutive_failures = 0
+        self._trial_started_at = None
+
+    def record_throttled(self):
+        """The host answered but asked to slow down, which says nothing of its health."""
+        self._trial_started_at = None
+
+    def record_failure(self):
+        self._consecutive_failures += 1
+        if self.state == CircuitState.HALF_OPEN or self._consecutive_failures >= self.failure_threshold:
+            if self.state != CircuitState.OPEN:
+                logger.warning(f"Circuit of host {self.host} is open for {self.recovery_timeout}s")
+            self.state = CircuitState.OPEN
+            self._opened_at = monotonic()
+            self._trial_started_at = None
+
+
+class HostCircuitBreaker:
+    """
+    Keeps a circuit breaker per host, so an unhealthy host does not hold up requests to the others.
+    """
+
+    def __init__(self, failure_threshold: int = 5, recovery_timeout: float = 30.0):
+        """
+        :param failure_threshold: Consecutive failures that open a host's circuit.
+        :param recovery_timeout: Seconds an open circuit waits before letting a trial request through.
+        """
+        self.failure_threshold = failure_threshold
+        self.recovery_timeout = recovery_timeout
+        self._breakers: dict[str, CircuitBreaker] = {}
+
+    def get(self, url: str) -> CircuitBreaker:
+        """Returns the circuit breaker of the URL's host."""
+        host = urlsplit(url).hostname or ""
+        if host not in self._breakers:
+            self._breakers[host] = CircuitBreaker(host, self.failure_threshold, self.recovery_timeout)
+        return self._breakers[host]
+
+    def states(self) -> dict[str, CircuitState]:
+        return {host: breaker.state for host, breaker in self._breakers.items()}
@@ -0,0 +1,82 @@
+import re
+from typing import Final, Optional
+
+# upload.wikimedia.org paths of an original, ".../commons/a/ab/File.jpg",
+# or of a thumbnail, ".../commons/thumb/a/ab/File.jpg/1200px-File.jpg".
+COMMONS_IMAGE_URL: Final[re.Pattern] = re.compile(
+    r"^(?P<prefix>https?://upload\.wikimedia\.org/[^/]+/[^/]+/)(?P<thumb>thumb/)?"
+    r"(?P<hash_path>[0-9a-f]/[0-9a-f]{2}/)(?P<file_name>[^/]+)(?:/(?P<thumb_name>[^/]+))?$"
+)
+THUMB_WIDTH: Final[re.Pattern] = re.compile(r"^(\d+)px-")
+
+# Formats that Commons renders as thumbnails of the same format, and formats rendered as PNG.
+SAME_FORMAT_THUMBNAILS: Final[frozenset[str]] = frozenset({"jpg", "jpeg", "png", "gif", "webp"})
+PNG_THUMBNAILS: Final[frozenset[str]] = frozenset({"svg"})
+
+CONTENT_TYPE_FORMATS: Final[dict[str, str]] = {
+    "image/jpeg": "jpg",
+    "image/png": "png",
+    "image/gif": "gif",
+    "image/webp": "webp",
+    "image/svg+xml": "svg",
+    "image/tiff": "tif",
+    "image/avif": "avif",
+}
+MAGIC_BYTES_FORMATS: Final[tuple[tuple[bytes, str], ...]] = (
+    (b"\xff\xd8\xff", "jpg"),
+    (b"\x89PNG\r\n\x1a\n", "png"),
+    (b"GIF87a", "gif"),
+    (b"GIF89a", "gif"),
+    (b"II*\x00", "tif"),
+    (b"MM\x00*", "tif"),
+)
+
+
+def commons_thumbnail_url(image_url: str, width: int) -> Optional[str]:
+    """
+    Rewrites a Wikimedia Commons image URL to its thumbnail of the given width.
+
+    :param image_url: URL of an original image or of one of its thumbnails.
+    :param width: Width in pixels of the thumbnail.
+    :return: The thumbnail URL, the URL itself when it is already a thumbnail at most that wide,
+             or None when the URL is not a Commons image or its format has no thumbnail rendition.
+    """
+    match = COMMONS_IMAGE_URL.match(image_url)
+    if match is None or bool(match["thumb"]) != bool(match["thumb_name"]):
+        return None
+    if match["thumb_name"]:
+        thumb_width = THUMB_WIDTH.match(match["thumb_name"])
+        if thumb_width and int(thumb_width[1]) <= width:
+            return image_url
+    file_name = match["file_name"]
+    image_format = file_name.rsplit(".", 1)[-1].lower()
+    if image_format in SAME_FORMAT_THUMBNAILS:
+        thumb_name = f"{width}px-{file_name}"
+    elif image_format in PNG_THUMBNAILS:
+        thumb_name = f"{width}px-{file_name}.png"
+    else:
+        return None
+    return f"{match['prefix']}thumb/{match['hash_path']}{file_name}/{thumb_name}"
+
+
+def detect_image_format(content_type: Optional[str], head: bytes, image_url: str) -> str:
+    """
+    Returns the file extension of an image, from its content type, else from its first bytes,
+    else from its URL.
+
+    :param content_type: The Content-Type header of the image response.
+    :param head: The first bytes of the image.
+    :param image_url: URL of the image.
+    """
+    if content_type:
+        image_format = CONTENT_TYPE_FORMATS.get(content_type.split(";", 1)[0].strip().lower())
+        if image_format:
+            return image_format
+    for magic_bytes, image_format in MAGIC_BYTES_FORMATS:
+        if head.startswith(magic_bytes):
+            return image_format
+    if head[:4] == b"RIFF" and head[8:12] == b"WEBP":
+        return "webp"
+    if head.lstrip()[:5] in (b"<?xml", b"<svg ") and b"<svg" in head:
+        return "svg"
+    return image_url.rsplit("/", 1)[-1].rsplit(".", 1)[-1].lower()
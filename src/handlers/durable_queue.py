@@ -0,0 +1,411 @@
+import json
+import os
+import socket
+import sqlite3
+from abc import ABC, abstractmethod
+from dataclasses import asdict
+from enum import Enum
+from logging import getLogger
+from pathlib import Path
+from time import time
+from typing import Any, NamedTuple, Optional
+from uuid import uuid4
+
+from src.handlers.metrics import MeteredQueue, PipelineMetrics
+
+logger = getLogger(__name__)
+
+
+class ItemState(str, Enum):
+    PENDING = "pending"
+    IN_FLIGHT = "in_flight"
+    DONE = "done"
+    FAILED = "failed"
+
+
+class SQLiteQueueStore:
+    """
+    The items of the durable queues, in a SQLite database in WAL mode shared by the queues of every process.
+    Each unfinished item is leased by the process that holds it. Items whose lease expired, or whose process
+    on this host is gone, are reclaimed on resume, and items already taken max_attempts times are marked failed.
+    Done items keep their result, e.g. the output row of a saved image, so a resumed run outputs them again
+    without processing them.
+    Writes are committed in batches of commit_batch_size operations or every commit_interval seconds,
+    so a crash may process the last uncommitted items again (at-least-once delivery).
+    """
+
+    def __init__(self, db_path: Path, lease_seconds: float = 300.0, max_attempts: int = 3,
+                 commit_batch_size: int = 100, commit_interval: float = 1.0):
+        """
+        :param db_path: Path of the SQLite database file.
+        :param lease_seconds: Seconds a process holds its unfinished items, renewed on every commit.
+        :param max_attempts: Number of times an item may be taken before it is marked failed.
+        :param commit_batch_size: Number of queue operations per commit.
+        :param commit_interval: Maximum seconds between the commits of pending operations.
+        """
+        self.db_path = db_path
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        self.commit_batch_size = commit_batch_size
+        self.commit_interval = commit_interval
+        self.owner = f"{socket.gethostname()}:{os.getpid()}:{uuid4().hex[:8]}"
+        self._uncommitted_operations = 0
+        self._transaction_started_at = 0.0
+        self._connection = sqlite3.connect(db_path, isolation_level=None, timeout=30.0, check_same_thread=False)
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.execute("PRAGMA synchronous=NORMAL")
+        self._connection.execute(
+            "CREATE TABLE IF NOT EXISTS queue_items ("
+            "id INTEGER PRIMARY KEY, queue TEXT NOT NULL, payload TEXT NOT NULL, state TEXT NOT NULL, "
+            "lease_owner TEXT, lease_expires REAL, attempts INTEGER NOT NULL DEFAULT 0, result TEXT, "
+            "UNIQUE (queue, payload))"
+        )
+        columns = {column for _, column, *_ in self._connection.execute("PRAGMA table_info(queue_items)")}
+        if "result" not in columns:
+            # A database of a version without the items' results.
+            self._connection.execute("ALTER TABLE queue_items ADD COLUMN result TEXT")
+        self._connection.execute("CREATE INDEX IF NOT EXISTS queue_items_state ON queue_items (queue, state)")
+
+    def add(self, queue: str, payload: str) -> Optional[int]:
+        """
+        Adds a pending item leased by this process.
+
+        :return: The item id, or None if the queue already has the item, unfinished, done or failed.
+        """
+        cursor = self._execute(
+            "INSERT OR IGNORE INTO queue_items (queue, payload, state, lease_owner, lease_expires) "
+            "VALUES (?, ?, ?, ?, ?)",
+            (queue, payload, ItemState.PENDING.value, self.owner, time() + self.lease_seconds),
+        )
+        return cursor.lastrowid if cursor.rowcount else None
+
+    def state(self, queue: str, payload: str) -> Optional[ItemState]:
+        row = self._connection.execute(
+            "SELECT state FROM queue_items WHERE queue = ? AND payload = ?", (queue, payload)
+        ).fetchone()
+        return ItemState(row[0]) if row else None
+
+    def set_state(self, item_id: int, state: ItemState, result: Optional[str] = None):
+        """
+        :param result: Optional result of a done item, returned by claim_results() to a resumed run.
+        """
+        attempts_increment = 1 if state == ItemState.IN_FLIGHT else 0
+        self._execute(
+            "UPDATE queue_items SET state = ?, attempts = attempts + ?, result = ? WHERE id = ?",
+            (state.value, attempts_increment, result, item_id),
+        )
+
+    def claim_results(self, queue: str) -> list[str]:
+        """
+        Takes over the queue's done items of processes on this host that are no longer running,
+        e.g. of an interrupted run, so they are cleared with this process's items.
+
+        :return: The results of the claimed items, in the order they were added.
+        """
+        self.commit()
+        self._connection.execute("BEGIN IMMEDIATE")
+        try:
+            done_items = self._connection.execute(
+                "SELECT id, lease_owner, result FROM queue_items WHERE queue = ? AND state = ? AND lease_owner != ?",
+                (queue, ItemState.DONE.value, self.owner),
+            ).fetchall()
+            owners = {owner for _, owner, _ in done_items}
+            gone_owners = {owner for owner in owners if self._is_owner_gone(owner)}
+            claimed_items = sorted(
+                (item_id, result) for item_id, owner, result in done_items if owner in gone_owners
+            )
+            self._connection.executemany(
+                "UPDATE queue_items SET lease_owner = ? WHERE id = ?",
+                [(self.owner, item_id) for item_id, _ in claimed_items],
+            )
+            self._connection.execute("COMMIT")
+        except BaseException:
+            self._connection.execute("ROLLBACK")
+            raise
+        return [result for _, result in claimed_items if result is not None]
+
+    def reclaim(self, queue: str) -> list[tuple[int, str]]:
+        """
+        Leases the queue's unfinished items that no live process holds, and marks failed the exhausted ones.
+
+        :return: The ids and payloads of the reclaimed items.
+        """
+        self.commit()
+        now = time()
+        self._connection.execute("BEGIN IMMEDIATE")
+        try:
+            gone_owners = self._gone_owners(queue)
+            unleased = (
+                "queue = ? AND state IN (?, ?) AND (lease_owner IS NULL OR lease_expires < ? "
+                f"OR lease_owner IN ({', '.join('?' * len(gone_owners))}))"
+            )
+            unleased_args = (queue, ItemState.PENDING.value, ItemState.IN_FLIGHT.value, now, *gone_owners)
+            self._connection.execute(
+                f"UPDATE queue_items SET state = ? WHERE {unleased} AND attempts >= ?",
+                (ItemState.FAILED.value, *unleased_args, self.max_attempts),
+            )
+            reclaimed_items = self._connection.execute(
+                f"UPDATE queue_items SET state = ?, lease_owner = ?, lease_expires = ? WHERE {unleased} "
+                "RETURNING id, payload",
+                (ItemState.PENDING.value, self.owner, now + self.lease_seconds, *unleased_args),
+            ).fetchall()
+            self._connection.execute("COMMIT")
+        except BaseException:
+            self._connection.execute("ROLLBACK")
+            raise
+        return sorted(reclaimed_items)
+
+    def _gone_owners(self, queue: str) -> list[str]:
+        """The lease owners of unfinished items whose process on this host is no longer running."""
+        owners = self._connection.execute(
+            "SELECT DISTINCT lease_owner FROM queue_items WHERE queue = ? AND state IN (?, ?) AND lease_owner != ?",
+            (queue, ItemState.PENDING.value, ItemState.IN_FLIGHT.value, self.owner),
+        ).fetchall()
+        return [owner for (owner,) in owners if self._is_owner_gone(owner)]
+
+    def _is_owner_gone(self, owner: Optional[str]) -> bool:
+        """Whether the owner's process on this host is no longer running."""
+        if owner is None:
+            return True
+        hostname, pid, _ = owner.rsplit(":", 2)
+        return hostname == socket.gethostname() and not self._is_process_running(int(pid))
+
+    @staticmethod
+    def _is_process_running(pid: int) -> bool:
+        try:
+            os.kill(pid, 0)
+        except ProcessLookupError:
+            return False
+        except PermissionError:
+            pass
+        return True
+
+    def counts(self, queue: str) -> dict[str, int]:
+        """Returns the number of the queue's items by state."""
+        return dict(self._connection.execute(
+            "SELECT state, COUNT(*) FROM queue_items WHERE queue = ? GROUP BY state", (queue,)
+        ).fetchall())
+
+    def clear(self):
+        """
+        Deletes the finished items of this process once its run has completed, and every item once no queue
+        has unfinished items, so the other processes sharing the database keep their pending and leased items.
+        """
+        self.commit()
+        finished_states = (ItemState.DONE.value, ItemState.FAILED.value)
+        self._connection.execute("BEGIN IMMEDIATE")
+        try:
+            self._connection.execute(
+                "DELETE FROM queue_items WHERE lease_owner = ? AND state IN (?, ?)", (self.owner, *finished_states)
+            )
+            self._connection.execute(
+                "DELETE FROM queue_items WHERE NOT EXISTS "
+                "(SELECT 1 FROM queue_items WHERE state NOT IN (?, ?))", finished_states
+            )
+            self._connection.execute("COMMIT")
+        except BaseException:
+            self._connection.execute("ROLLBACK")
+            raise
+
+    def commit(self):
+        """Commits the pending operations and renews the leases of this process's unfinished items."""
+        if not self._connection.in_transaction:
+            return
+        self._connection.execute(
+            "UPDATE queue_items SET lease_expires = ? WHERE lease_owner = ? AND state IN (?, ?)",
+            (time() + self.lease_seconds, self.owner, ItemState.PENDING.value, ItemState.IN_FLIGHT.value),
+        )
+        self._connection.execute("COMMIT")
+        self._uncommitted_operations = 0
+
+    def close(self):
+        self.commit()
+        self._connection.close()
+
+    def _execute(self, sql: str, parameters: tuple) -> sqlite3.Cursor:
+        if not self._connection.in_transaction:
+            self._connection.execute("BEGIN IMMEDIATE")
+            self._transaction_started_at = time()
+        cursor = self._connection.execute(sql, parameters)
+        self._uncommitted_operations += 1
+        if (
+            self._uncommitted_operations >= self.commit_batch_size
+            or time() - self._transaction_started_at >= self.commit_interval
+        ):
+            self.commit()
+        return cursor
+
+
+def item_payload(item) -> str:
+    """The compact JSON of a queue item dataclass, that identifies the item in a SQLiteQueueStore."""
+    return json.dumps(asdict(item), separators=(",", ":"))
+
+
+class QueuedItem(NamedTuple):
+    """An item taken from a PipelineQueue, with the id that completes it, None for in-memory queues."""
+    item_id: Optional[int]
+    item: Any
+
+
+class PipelineQueue(MeteredQueue):
+    """
+    An in-memory pipeline queue, metered when it has metrics.
+    Its get() returns a QueuedItem, and task_done() takes the item's id and optional result, e.g. the output row
+    of a saved image, so that a DurableQueue completes exactly the item that was processed.
+    """
+
+    def put_nowait(self, item):
+        queued_item = item if isinstance(item, QueuedItem) else self._queued_item(item)
+        if queued_item is not None:
+            super().put_nowait(queued_item)
+
+    def task_done(self, item_id: Optional[int] = None, result: Optional[dict[str, Any]] = None):
+        super().task_done()
+
+    def _queued_item(self, item) -> Optional[QueuedItem]:
+        """The queued item of a put item, None to skip it."""
+        return QueuedItem(None, item)
+
+
+class DurableQueue(PipelineQueue):
+    """
+    A PipelineQueue whose items are persisted in a SQLiteQueueStore, so an interrupted run can resume them.
+    Items keep the in-memory queue semantics (maxsize, join), while their states follow them in the store:
+    pending when put, in flight when taken, and done, with their result, on task_done() of their id.
+    Items that the queue already has, e.g. unfinished ones to be resumed or done ones, are not queued again.
+    Items that failed max_attempts times are skipped too, and kept in exhausted_items for the caller to report.
+    """
+
+    def __init__(self, store: SQLiteQueueStore, name: str, item_type: type, maxsize: int = 0,
+                 metrics: Optional[PipelineMetrics] = None):
+        """
+        :param store: The store of the queue items.
+        :param name: Name of the queue in the store, and its label in the metrics.
+        :param item_type: The dataclass of the items, used to load them on resume.
+        :param maxsize: Maximum number of items in memory, as in asyncio.Queue.
+        :param metrics: Optional metrics of the queue depth and wait time, as of a MeteredQueue.
+        """
+        super().__init__(maxsize, name, metrics)
+        self.store = store
+        self.item_type = item_type
+        self.exhausted_items: list[Any] = []
+
+    async def put(self, item):
+        if self.full():
+            # Do not keep the store's write lock while waiting.
+            self.store.commit()
+        await super().put(item)
+
+    def _queued_item(self, item) -> Optional[QueuedItem]:
+        payload = item_payload(item)
+        item_id = self.store.add(self.name, payload)
+        if item_id is None:
+            if self.store.state(self.name, payload) == ItemState.FAILED:
+                logger.warning(f"Skipping {payload} of the {self.name} queue, it failed in previous runs")
+                self.exhausted_items.append(item)
+            return None
+        return QueuedItem(item_id, item)
+
+    def pop_exhausted_items(self) -> list[Any]:
+        """Returns, and forgets, the items that were put but skipped as they failed max_attempts times."""
+        exhausted_items, self.exhausted_items = self.exhausted_items, []
+        return exhausted_items
+
+    async def get(self) -> QueuedItem:
+        if self.empty():
+            # Do not keep the store's write lock while waiting.
+            self.store.commit()
+        return await super().get()
+
+    def get_nowait(self) -> QueuedItem:
+        queued_item = super().get_nowait()
+        self.store.set_state(queued_item.item_id, ItemState.IN_FLIGHT)
+        return queued_item
+
+    def task_done(self, item_id: Optional[int] = None, result: Optional[dict[str, Any]] = None):
+        """
+        Marks the taken item of the id done, with its optional result.
+
+        :raises ValueError: Without an item id.
+        """
+        if item_id is None:
+            raise ValueError(f"task_done() of the {self.name} durable queue requires the id of the taken item")
+        super().task_done()
+        self.store.set_state(item_id, ItemState.DONE, json.dumps(result) if result is not None else None)
+
+    async def join(self):
+        await super().join()
+        self.store.commit()
+
+    async def resume(self) -> int:
+        """
+        Queues again the unfinished items of previous runs, waiting for free slots like put().
+
+        :return: The number of resumed items.
+        """
+        reclaimed_items = self.store.reclaim(self.name)
+        if reclaimed_items:
+            logger.info(f"Resuming {len(reclaimed_items)} unfinished items of the {self.name} queue")
+        for item_id, payload in reclaimed_items:
+            await self.put(QueuedItem(item_id, self.item_type(**json.loads(payload))))
+        return len(reclaimed_items)
+
+    def finished_results(self) -> list[dict[str, Any]]:
+        """Returns the results of the items that interrupted runs finished, see SQLiteQueueStore.claim_results."""
+        results = [json.loads(result) for result in self.store.claim_results(self.name)]
+        if results:
+            logger.info(f"Replaying {len(results)} results of items of the {self.name} queue done by previous runs")
+        return results
+
+
+class QueueBackend(ABC):
+    """
+    Creates the pipeline queues.
+    """
+
+    @abstractmethod
+    def queue(self, name: str, item_type: type, maxsize: int) -> PipelineQueue:
+        pass
+
+    def clear(self):
+        """Forgets the items of a completed run."""
+        pass
+
+    def close(self):
+        pass
+
+
+class MemoryQueueBackend(QueueBackend):
+    """
+    In-memory pipeline queues, metered when metrics are given.
+    """
+
+    def __init__(self, metrics: Optional[PipelineMetrics] = None):
+        self.metrics = metrics
+
+    def queue(self, name: str, item_type: type, maxsize: int) -> PipelineQueue:
+        return PipelineQueue(maxsize, name, self.metrics)
+
+
+class SQLiteQueueBackend(QueueBackend):
+    """
+    Durable queues in a SQLite database, see SQLiteQueueStore, metered when metrics are given.
+    """
+
+    def __init__(self, db_path: Path, metrics: Optional[PipelineMetrics] = None, **store_kwargs):
+        """
+        :param db_path: Path of the SQLite database file.
+        :param metrics: Optional metrics of the queues.
+        :param store_kwargs: Keyword arguments passed to SQLiteQueueStore.
+        """
+        self.store = SQLiteQueueStore(db_path, **store_kwargs)
+        self.metrics = metrics
+
+    def queue(self, name: str, item_type: type, maxsize: int) -> DurableQueue:
+        return DurableQueue(self.store, name, item_type, maxsize, self.metrics)
+
+    def clear(self):
+        self.store.clear()
+
+    def close(self):
+        self.store.close()
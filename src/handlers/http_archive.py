@@ -0,0 +1,266 @@
+import json
+import mmap
+import struct
+from asyncio import sleep
+from enum import Enum
+from logging import getLogger
+from pathlib import Path
+from typing import Any, AsyncIterator, Callable, Final, NamedTuple, Optional
+
+from httpx import AsyncBaseTransport, AsyncByteStream, AsyncHTTPTransport, Limits, Request, Response
+from pydantic import BaseModel
+
+logger = getLogger(__name__)
+
+# Archive layout: MAGIC, then records of (RECORD_HEADER, metadata JSON, body),
+# then the index JSON and the FOOTER (index offset, FOOTER_MAGIC) once the archive is closed.
+MAGIC: Final[bytes] = b"WAHARC1\n"
+FOOTER_MAGIC: Final[bytes] = b"WAHIDX1\n"
+RECORD_HEADER: Final[struct.Struct] = struct.Struct(">IQ")
+FOOTER: Final[struct.Struct] = struct.Struct(">Q8s")
+
+
+class ArchiveMode(str, Enum):
+    RECORD = "record"
+    REPLAY = "replay"
+
+
+class HTTPArchive(BaseModel):
+    """
+    Pydantic schema for the HTTP archive settings of HTTPXClient.
+    In record mode every response is appended to the archive file, in replay mode the responses are served
+    from it and no request leaves the process.
+    """
+    path: Path
+    mode: ArchiveMode = ArchiveMode.REPLAY
+    latency: float = 0.0
+
+    def transport(self, client_kwargs: dict[str, Any]) -> AsyncBaseTransport:
+        """
+        Returns the transport of the archive mode.
+
+        :param client_kwargs: The keyword arguments of httpx AsyncClient, whose transport (or transport settings)
+                              is the one recorded.
+        """
+        if self.mode == ArchiveMode.REPLAY:
+            return ReplayTransport(self.path, latency=self.latency)
+        transport = client_kwargs.get("transport") or AsyncHTTPTransport(
+            http2=client_kwargs.get("http2", False), limits=client_kwargs.get("limits", Limits()),
+        )
+        return RecordingTransport(transport, HTTPArchiveWriter(self.path))
+
+
+class ArchiveEntry(NamedTuple):
+    status_code: int
+    headers: list[tuple[str, str]]
+    body_start: int
+    body_end: int
+
+
+def _archive_key(method: str, url: str) -> str:
+    return f"{method} {url}"
+
+
+class HTTPArchiveWriter:
+    """
+    Appends responses to an archive file, and writes its index on close.
+    An existing archive is extended, a later response of a URL replaces an earlier one unless it is an error
+    and the earlier one is not.
+    """
+
+    def __init__(self, path: Path):
+        self.path = path
+        index = {}
+        if path.exists() and path.stat().st_size:
+            with HTTPArchiveReader(path) as reader:
+                index, end_offset = reader.index, reader.records_end
+            self._file = open(path, "r+b")
+            self._file.truncate(end_offset)
+            self._file.seek(end_offset)
+        else:
+            self._file = open(path, "wb")
+            self._file.write(MAGIC)
+        self.index: dict[str, list[int]] = index
+
+    def append(self, method: str, url: str, status_code: int, headers: list[tuple[str, str]], body: bytes):
+        key = _archive_key(method, url)
+        previous_entry = self.index.get(key)
+        if previous_entry and previous_entry[1] < 400 <= status_code:
+            return
+        metadata = json.dumps({"method": method, "url": url, "status": status_code, "headers": headers}).encode()
+        offset = self._file.tell()
+        self._file.write(RECORD_HEADER.pack(len(metadata), len(body)))
+        self._file.write(metadata)
+        self._file.write(body)
+        self.index[key] = [offset, status_code]
+
+    def close(self):
+        index_offset = self._file.tell()
+        self._file.write(json.dumps(self.index).encode())
+        self._file.write(FOOTER.pack(index_offset, FOOTER_MAGIC))
+        self._file.close()
+        logger.info(f"Recorded {len(self.index)} responses in {self.path}")
+
+
+class HTTPArchiveReader:
+    """
+    Reads an archive file through a read-only memory map, so only the bodies that are served are paged in.
+    An archive without an index, e.g. of an interrupted recording, is indexed by scanning its records.
+    """
+
+    def __init__(self, path: Path):
+        self.path = path
+        self._file = open(path, "rb")
+        self.mmap = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        if self.mmap[:len(MAGIC)] != MAGIC:
+            self.close()
+            raise ValueError(f"{path} is not an HTTP archive")
+        self.index, self.records_end = self._load_index()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def find(self, method: str, url: str) -> Optional[ArchiveEntry]:
+        """Returns the archived response of the request, if any."""
+        index_entry = self.index.get(_archive_key(method, url))
+        if index_entry is None:
+            return None
+        offset = index_entry[0]
+        metadata_size, body_size = RECORD_HEADER.unpack_from(self.mmap, offset)
+        metadata_start = offset + RECORD_HEADER.size
+        metadata = json.loads(self.mmap[metadata_start:metadata_start + metadata_size])
+        body_start = metadata_start + metadata_size
+        return ArchiveEntry(metadata["status"], metadata["headers"], body_start, body_start + body_size)
+
+    def close(self):
+        self.mmap.close()
+        self._file.close()
+
+    def _load_index(self) -> tuple[dict[str, list[int]], int]:
+        size = len(self.mmap)
+        if size >= len(MAGIC) + FOOTER.size:
+            index_offset, footer_magic = FOOTER.unpack_from(self.mmap, size - FOOTER.size)
+            if footer_magic == FOOTER_MAGIC:
+                return json.loads(self.mmap[index_offset:size - FOOTER.size]), index_offset
+        return self._scan_records(size)
+
+    def _scan_records(self, size: int) -> tuple[dict[str, list[int]], int]:
+        logger.warning(f"The HTTP archive {self.path} has no index, scanning its records")
+        index, offset = {}, len(MAGIC)
+        while offset + RECORD_HEADER.size <= size:
+            metadata_size, body_size = RECORD_HEADER.unpack_from(self.mmap, offset)
+            record_end = offset + RECORD_HEADER.size + metadata_size + body_size
+            if record_end > size:
+                # A record cut short by the interruption.
+                break
+            metadata_start = offset + RECORD_HEADER.size
+            metadata = json.loads(self.mmap[metadata_start:metadata_start + metadata_size])
+            index[_archive_key(metadata["method"], metadata["url"])] = [offset, metadata["status"]]
+            offset = record_end
+        return index, offset
+
+
+class _RecordingStream(AsyncByteStream):
+    """Passes the raw body chunks through, and archives the response once the stream is closed."""
+
+    def __init__(self, stream: AsyncByteStream, on_close: Callable[[bytes, bool], None]):
+        self.stream = stream
+        self.on_close = on_close
+        self._chunks: list[bytes] = []
+        self._complete = False
+
+    async def __aiter__(self) -> AsyncIterator[bytes]:
+        async for chunk in self.stream:
+            self._chunks.append(chunk)
+            yield chunk
+        self._complete = True
+
+    async def aclose(self):
+        await self.stream.aclose()
+        self.on_close(b"".join(self._chunks), self._complete)
+
+
+class RecordingTransport(AsyncBaseTransport):
+    """
+    Sends the requests with the wrapped transport, and appends their raw (still content-encoded) responses
+    to an archive. Bodies that were not read to their end, e.g. of head-only page fetches, are archived
+    as far as they were read, without their Content-Length.
+    """
+
+    def __init__(self, transport: AsyncBaseTransport, writer: HTTPArchiveWriter):
+        self.transport = transport
+        self.writer = writer
+
+    async def handle_async_request(self, request: Request) -> Response:
+        response = await self.transport.handle_async_request(request)
+
+        def archive(body: bytes, complete: bool):
+            headers = [
+                (name, value) for name, value in response.headers.multi_items()
+                if complete or name.lower() != "content-length"
+            ]
+            self.writer.append(request.method, str(request.url), response.status_code, headers, body)
+
+        return Response(
+            status_code=response.status_code,
+            headers=response.headers,
+            stream=_RecordingStream(response.stream, archive),
+            extensions=response.extensions,
+        )
+
+    async def aclose(self):
+        await self.transport.aclose()
+        self.writer.close()
+
+
+class _ArchivedBodyStream(AsyncByteStream):
+    """Serves a body as chunks sliced from the archive memory map."""
+
+    def __init__(self, archive: mmap.mmap, start: int, end: int, chunk_size: int):
+        self.archive = archive
+        self.start = start
+        self.end = end
+        self.chunk_size = chunk_size
+
+    async def __aiter__(self) -> AsyncIterator[bytes]:
+        for chunk_start in range(self.start, self.end, self.chunk_size):
+            yield self.archive[chunk_start:min(chunk_start + self.chunk_size, self.end)]
+
+
+class ReplayTransport(AsyncBaseTransport):
+    """
+    Serves the requests from an archive, with an optional simulated latency before each response.
+    Requests that are not in the archive get a 404 response.
+    """
+
+    def __init__(self, path: Path, latency: float = 0.0, chunk_size: int = 64 * 1024):
+        """
+        :param path: Path of the archive file.
+        :param latency: Seconds before each response.
+        :param chunk_size: Size in bytes of the served body chunks.
+        """
+        self.reader = HTTPArchiveReader(path)
+        self.latency = latency
+        self.chunk_size = chunk_size
+        self.missed_requests = 0
+
+    async def handle_async_request(self, request: Request) -> Response:
+        if self.latency:
+            await sleep(self.latency)
+        entry = self.reader.find(request.method, str(request.url))
+        if entry is None:
+            self.missed_requests += 1
+            return Response(404, headers={"Content-Type": "text/plain"}, content=b"Not in the HTTP archive")
+        return Response(
+            status_code=entry.status_code,
+            headers=entry.headers,
+            stream=_ArchivedBodyStream(self.reader.mmap, entry.body_start, entry.body_end, self.chunk_size),
+        )
+
+    async def aclose(self):
+        if self.missed_requests:
+            logger.warning(f"{self.missed_requests} requests were not in the HTTP archive {self.reader.path}")
+        self.reader.close()
@@ -0,0 +1,289 @@
+import logging
+import os
+from collections import OrderedDict
+from hashlib import sha256
+from pathlib import Path
+from typing import AsyncIterator, Final, Optional
+from uuid import uuid4
+
+import aiofiles
+from httpx import AsyncByteStream, Request, Response
+from pydantic import BaseModel, ValidationError
+
+logger = logging.getLogger(__name__)
+
+
+class CacheEntry(BaseModel):
+    """
+    Pydantic schema for the metadata stored next to each cached response body.
+    """
+    url: str
+    headers: dict[str, str]
+    etag: Optional[str] = None
+    last_modified: Optional[str] = None
+
+    def conditional_headers(self) -> dict[str, str]:
+        """Build the validation headers for a conditional GET of this entry."""
+        headers = {}
+        if self.etag:
+            headers["If-None-Match"] = self.etag
+        if self.last_modified:
+            headers["If-Modified-Since"] = self.last_modified
+        return headers
+
+
+class CachedBodyStream(AsyncByteStream):
+    """
+    Streams a cached response body from disk in chunks.
+    """
+
+    def __init__(self, body_path: Path, chunk_size: int = 64 * 1024):
+        self.body_path = body_path
+        self.chunk_size = chunk_size
+
+    async def __aiter__(self) -> AsyncIterator[bytes]:
+        async with aiofiles.open(self.body_path, mode="rb") as file:
+            while chunk := await file.read(self.chunk_size):
+                yield chunk
+
+
+class CacheWriter:
+    """
+    Writes a streamed response body into the cache, the entry is only added once the whole body was written.
+    Each writer has a temporary file of its own, so concurrent writers of a URL, in this process or in others
+    sharing the cache directory, do not write into each other's body and the last commit wins.
+    """
+
+    def __init__(self, cache: "HTTPCache", entry: CacheEntry):
+        self.cache = cache
+        self.entry = entry
+        self._key = cache._key(entry.url)
+        self._tmp_path = cache._body_path(self._key).with_name(f"{self._key}{cache.BODY_SUFFIX}.{uuid4().hex}.part")
+        self._file = None
+
+    async def write(self, chunk: bytes):
+        if self._file is None:
+            self._file = await aiofiles.open(self._tmp_path, mode="wb")
+        await self._file.write(chunk)
+
+    async def commit(self):
+        """Adds the written body to the cache."""
+        if self._file is None:
+            await self.write(b"")
+        await self._file.close()
+        os.replace(self._tmp_path, self.cache._body_path(self._key))
+        await self.cache._write_atomic(self.cache._meta_path(self._key), self.entry.model_dump_json(), mode="w")
+        self.cache._account(self._key)
+        self.cache._evict()
+
+    async def abort(self):
+        """Drops a partially written body."""
+        if self._file is not None:
+            await self._file.close()
+        self._tmp_path.unlink(missing_ok=True)
+
+
+class HTTPCache:
+    """
+    An on-disk HTTP response cache keyed by URL.
+    Responses are stored with their ETag and Last-Modified validators so that later runs can
+    revalidate them with a conditional GET and serve the body from disk on "304 Not Modified".
+    The cache is bounded by a size budget and evicts the least recently used entries.
+    """
+    META_SUFFIX: Final[str] = ".json"
+    BODY_SUFFIX: Final[str] = ".body"
+    # The body stored on disk is already decoded, so these headers no longer describe it.
+    DROPPED_HEADERS: Final[frozenset[str]] = frozenset({"content-encoding", "content-length", "transfer-encoding"})
+
+    def __init__(self, cache_dir: Path, max_size_bytes: int = 512 * 1024 * 1024):
+        """
+        Initializes the cache and indexes the entries already present in the cache directory.
+
+        :param cache_dir: Directory where cached responses are kept.
+        :param max_size_bytes: Size budget of the cache; least recently used entries are evicted above it.
+        """
+        self.cache_dir = cache_dir
+        self.max_size_bytes = max_size_bytes
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        self._entries_sizes: OrderedDict[str, int] = OrderedDict()
+        self._total_size = 0
+        self._load_index()
+
+    @property
+    def total_size(self) -> int:
+        return self._total_size
+
+    async def load(self, url: str) -> Optional[CacheEntry]:
+        """
+        Returns the cached entry metadata of the URL, if any.
+
+        :param url: The requested URL.
+        """
+        key = self._key(url)
+        if key not in self._entries_sizes:
+            return None
+        try:
+            async with aiofiles.open(self._meta_path(key), mode="r") as file:
+                entry = CacheEntry.model_validate_json(await file.read())
+        except (OSError, ValidationError) as e:
+            logger.warning(f"Dropping unreadable cache entry of {url}: {e}")
+            self._remove(key)
+            return None
+        return entry if entry.url == url else None
+
+    async def to_response(self, entry: CacheEntry, request: Request) -> Response:
+        """
+        Builds a response out of a revalidated cache entry.
+
+        :param entry: The cache entry that the server reported as not modified.
+        :param request: The request of the conditional GET.
+        """
+        key = self._key(entry.url)
+        async with aiofiles.open(self._body_path(key), mode="rb") as file:
+            content = await file.read()
+        self._touch(key)
+        return Response(status_code=200, headers=entry.headers, content=content, request=request)
+
+    async def refresh(self, entry: CacheEntry, not_modified_response: Response) -> CacheEntry:
+        """
+        Updates the stored metadata of a revalidated entry with the headers of its 304 response,
+        e.g. a new ETag, Last-Modified or Date, so the next revalidation sends the current validators.
+
+        :param entry: The cache entry that the server reported as not modified.
+        :param not_modified_response: The 304 response of the conditional GET.
+        :return: The updated entry.
+        """
+        headers = self._stored_headers(not_modified_response)
+        if not headers:
+            return entry
+        entry = CacheEntry(
+            url=entry.url,
+            headers={**entry.headers, **headers},
+            etag=headers.get("etag", entry.etag),
+            last_modified=headers.get("last-modified", entry.last_modified),
+        )
+        key = self._key(entry.url)
+        if key in self._entries_sizes:
+            await self._write_atomic(self._meta_path(key), entry.model_dump_json(), mode="w")
+            self._account(key)
+        return entry
+
+    def to_streaming_response(self, entry: CacheEntry, request: Request) -> Response:
+        """
+        Builds a response out of a revalidated cache entry whose body is streamed from disk.
+
+        :param entry: The cache entry that the server reported as not modified.
+        :param request: The request of the conditional GET.
+        """
+        key = self._key(entry.url)
+        body_path = self._body_path(key)
+        headers = {**entry.headers, "Content-Length": str(body_path.stat().st_size)}
+        self._touch(key)
+        return Response(status_code=200, headers=headers, stream=CachedBodyStream(body_path), request=request)
+
+    def writer(self, url: str, response: Response) -> Optional[CacheWriter]:
+        """
+        Returns a writer that caches the body of a streamed response,
+        or None if the response cannot be revalidated or must not be stored.
+
+        :param url: The requested URL.
+        :param response: The streamed response.
+        """
+        entry = self._create_entry(url, response)
+        return CacheWriter(self, entry) if entry else None
+
+    async def store(self, url: str, response: Response):
+        """
+        Stores a successful response if it carries an ETag or Last-Modified validator,
+        and its Cache-Control does not forbid storing it.
+
+        :param url: The requested URL.
+        :param response: The response to cache, its content must be already read.
+        """
+        entry = self._create_entry(url, response)
+        if entry is None:
+            return
+        key = self._key(entry.url)
+        await self._write_atomic(self._body_path(key), response.content, mode="wb")
+        await self._write_atomic(self._meta_path(key), entry.model_dump_json(), mode="w")
+        self._account(key)
+        self._evict()
+
+    def _create_entry(self, url: str, response: Response) -> Optional[CacheEntry]:
+        """
+        Create cache entry metadata for a response,
+        or None if the response cannot be revalidated or its Cache-Control has no-store.
+        """
+        etag, last_modified = response.headers.get("ETag"), response.headers.get("Last-Modified")
+        if not etag and not last_modified:
+            return None
+        if self._is_no_store(response):
+            # A cached response of the URL must not be served in its place either.
+            key = self._key(url)
+            if key in self._entries_sizes:
+                self._remove(key)
+            return None
+        return CacheEntry(url=url, headers=self._stored_headers(response), etag=etag, last_modified=last_modified)
+
+    @classmethod
+    def _stored_headers(cls, response: Response) -> dict[str, str]:
+        return {name: value for name, value in response.headers.items() if name.lower() not in cls.DROPPED_HEADERS}
+
+    @staticmethod
+    def _is_no_store(response: Response) -> bool:
+        directives = response.headers.get("Cache-Control", "").split(",")
+        return any(directive.split("=")[0].strip().lower() == "no-store" for directive in directives)
+
+    @staticmethod
+    async def _write_atomic(path: Path, data, mode: str):
+        tmp_path = path.with_name(f"{path.name}.{uuid4().hex}.tmp")
+        async with aiofiles.open(tmp_path, mode=mode) as file:
+            await file.write(data)
+        os.replace(tmp_path, path)
+
+    def _load_index(self):
+        """Index the stored entries from the least to the most recently used one."""
+        entries = []
+        for meta_path in self.cache_dir.glob(f"*{self.META_SUFFIX}"):
+            key = meta_path.stem
+            try:
+                body_stat = self._body_path(key).stat()
+                entries.append((body_stat.st_mtime, key, body_stat.st_size + meta_path.stat().st_size))
+            except FileNotFoundError:
+                meta_path.unlink(missing_ok=True)
+        for _, key, size in sorted(entries):
+            self._entries_sizes[key] = size
+            self._total_size += size
+
+    def _account(self, key: str):
+        size = self._body_path(key).stat().st_size + self._meta_path(key).stat().st_size
+        self._total_size += size - self._entries_sizes.pop(key, 0)
+        self._entries_sizes[key] = size
+
+    def _touch(self, key: str):
+        """Mark the entry as most recently used, also on disk so the order survives restarts."""
+        self._entries_sizes.move_to_end(key)
+        try:
+            os.utime(self._body_path(key))
+        except FileNotFoundError:
+            self._remove(key)
+
+    def _evict(self):
+        while self._total_size > self.max_size_bytes and self._entries_sizes:
+            oldest_key = next(iter(self._entries_sizes))
+            self._remove(oldest_key)
+
+    def _remove(self, key: str):
+        self._total_size -= self._entries_sizes.pop(key, 0)
+        self._meta_path(key).unlink(missing_ok=True)
+        self._body_path(key).unlink(missing_ok=True)
+
+    @staticmethod
+    def _key(url: str) -> str:
+        return sha256(url.encode()).hexdigest()
+
+    def _meta_path(self, key: str) -> Path:
+        return self.cache_dir / f"{key}{self.META_SUFFIX}"
+
+    def _body_path(self, key: str) -> Path:
+        return self.cache_dir / f"{key}{self.BODY_SUFFIX}"
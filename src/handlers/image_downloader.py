@@ -1,65 +1,299 @@
-from asyncio import Queue
+import os
+import shutil
+from asyncio import Task, create_task, shield, to_thread
+from contextlib import nullcontext
+from enum import Enum
+from functools import partial
+from hashlib import sha256
 from logging import getLogger
 from pathlib import Path
-from typing import Tuple
+from time import perf_counter
+from typing import AsyncIterator, Callable, Final, Optional
+from uuid import uuid4
 
 from aiofiles import open as aio_open
+from httpx import HTTPStatusError, codes
+
 from src.handlers.async_http_client import HTTPXClient
-from src.common.schemas import ImageQueueItem
+from src.handlers.byte_budget import ByteBudget
+from src.handlers.commons_images import commons_thumbnail_url, detect_image_format
+from src.handlers.durable_queue import PipelineQueue
+from src.handlers.image_store import ContentAddressedImageStore
+from src.handlers.metrics import PipelineMetrics
+from src.handlers.output_sinks import IMAGES_TABLE, Row, RowSink
+from src.handlers.tracing import Tracer
+from src.common.schemas import DeadLetterItem
 
 logger = getLogger(__name__)
 
 
+class FsyncPolicy(str, Enum):
+    NEVER = "never"
+    FILE = "file"
+    FILE_AND_DIRECTORY = "file_and_directory"
+
+
+class ImageSizeError(ValueError):
+    """Raised when an image is larger than allowed or does not match its Content-Length."""
+
+
 class ImageDownloader:
     """
     A class responsible for downloading images asynchronously.
+    Images are streamed in chunks into a temporary file that is renamed into place once complete,
+    so memory use does not depend on the image size and no partial images are left behind.
+    Each image URL is downloaded once per run, other animals with the same image get a link to the first file.
+    A failed download is forgotten once it is done, so its waiters share its error and a later animal retries it.
+    With an image store, each distinct image is downloaded once and linked to every animal that uses it.
+    With a thumbnail width, Wikimedia Commons images are downloaded as thumbnails of that width when available.
     """
+    ESTIMATED_IMAGE_SIZE: Final[int] = 1024 * 1024
+    # Statuses of a thumbnail that does not exist, e.g. wider than its original, throttling and server errors are not.
+    MISSING_THUMBNAIL_STATUS_CODES: Final[frozenset[int]] = frozenset({codes.NOT_FOUND, codes.BAD_REQUEST})
 
-    def __init__(self, client: HTTPXClient, destination_dir: Path):
+    def __init__(self, client: HTTPXClient, destination_dir: Path, chunk_size: int = 64 * 1024,
+                 fsync_policy: FsyncPolicy = FsyncPolicy.NEVER, max_image_size: Optional[int] = None,
+                 image_store: Optional[ContentAddressedImageStore] = None,
+                 metrics: Optional[PipelineMetrics] = None, output_sink: Optional[RowSink] = None,
+                 thumbnail_width: Optional[int] = None, byte_budget: Optional[ByteBudget] = None,
+                 tracer: Optional[Tracer] = None):
         """
         Initializes the ImageDownloader with an HTTP client and a destination directory.
 
         :param client: HTTPXClient's instance for making HTTP requests.
         :param destination_dir: Path object representing the directory where images will be saved.
+        :param chunk_size: Size in bytes of the chunks streamed to disk.
+        :param fsync_policy: Whether the image file, and its directory entry, are flushed to disk before returning.
+        :param max_image_size: Optional maximum image size in bytes, larger downloads are aborted.
+        :param image_store: Optional content-addressed store, the saved images are then links to its blobs.
+        :param metrics: Optional metrics of the image stage: service time, saved bytes and errors by class.
+        :param output_sink: Optional streaming output, fed with each saved image.
+        :param thumbnail_width: Optional width in pixels of the Commons thumbnails downloaded instead of the
+                                original images, the original is downloaded when there is no such thumbnail.
+        :param byte_budget: Optional memory budget shared with the other stages, each image reserves its
+                            Content-Length (or ESTIMATED_IMAGE_SIZE) before its body is read until it is written.
+        :param tracer: Optional tracer of the image writes, each save_image call is a span.
         """
         self.client = client
         self.destination_dir = destination_dir
+        self.chunk_size = chunk_size
+        self.fsync_policy = fsync_policy
+        self.max_image_size = max_image_size
+        self.image_store = image_store
+        self.metrics = metrics
+        self.output_sink = output_sink
+        self.thumbnail_width = thumbnail_width
+        self.byte_budget = byte_budget
+        self.tracer = tracer
+        self.dead_letters: list[DeadLetterItem] = []
+        self.image_fetches_saved = 0
+        self._downloads: dict[str, Task[Path]] = {}
 
-    async def download_image_consumer(self, image_queue: Queue[ImageQueueItem]):
+    async def download_image_consumer(self, image_queue: PipelineQueue):
         """
         Consumes tasks from an image queue and downloads images.
+        Each item is completed with its images table row, which a durable queue keeps for a resumed run.
 
         :param image_queue: A queue containing tuples of image URL and image name.
         """
         while True:
-            image_item = await image_queue.get()
+            item_id, image_item = await image_queue.get()
             image_url, image_name = image_item.image_url, image_item.image_name
+            image_row = None
+            started_at = perf_counter()
             try:
-                await self.download_image(image_url, image_name)
-            except (ConnectionError, OSError) as e:
+                image_row = await self.download_image(image_url, image_name)
+            except (ConnectionError, OSError, ValueError) as e:
                 logger.error(f"Failed to download {image_name} image: {e}")
+                self.dead_letters.append(
+                    DeadLetterItem(stage="image", item_name=image_name, url=image_url, error=repr(e))
+                )
+                if self.metrics:
+                    self.metrics.record_error("image", e)
             finally:
-                image_queue.task_done()
+                if self.metrics:
+                    self.metrics.observe("stage_seconds", perf_counter() - started_at, stage="image")
+                image_queue.task_done(item_id, image_row)
 
-    async def download_image(self, image_url: str, image_name: str):
+    async def download_image(self, image_url: str, image_name: str) -> Row:
         """
         Downloads an image from the given URL and saves it to the destination directory.
 
         :param image_url: URL of the image to download.
         :param image_name: Name to save the image as.
+        :return: The images table row of the saved image.
         """
-        response = await self.client.get(url=image_url)
-        image_format = image_url.rsplit(".")[-1].lower()
-        file_path = Path(self.destination_dir, f"{image_name}.{image_format}")
-        await self.save_image(image_file_path=file_path, data=response.content)
+        first_download = self._downloads.get(image_url)
+        if first_download is None:
+            first_download = create_task(self._fetch_image(image_url, image_name))
+            first_download.add_done_callback(partial(self._forget_failed_download, image_url))
+            self._downloads[image_url] = first_download
+        else:
+            self.image_fetches_saved += 1
+        file_path = self._link_image(await shield(first_download), image_name)
         logger.info(f"Saved image to: {file_path}")
+        image_row = {"name": image_name, "image_url": image_url, "file_path": str(file_path)}
+        if self.output_sink:
+            await self.output_sink.add(IMAGES_TABLE, image_row)
+        return image_row
+
+    def _forget_failed_download(self, image_url: str, download: Task[Path]):
+        if (download.cancelled() or download.exception()) and self._downloads.get(image_url) is download:
+            del self._downloads[image_url]
 
-    async def save_image(self, image_file_path: Path, data: bytes):
+    async def _fetch_image(self, image_url: str, image_name: str) -> Path:
+        """Download the image, or its thumbnail, returns its blob path with an image store or else its file path."""
+        thumbnail_url = commons_thumbnail_url(image_url, self.thumbnail_width) if self.thumbnail_width else None
+        if thumbnail_url:
+            try:
+                return await self._fetch_url(thumbnail_url, image_name)
+            except ConnectionError as e:
+                if not (
+                    isinstance(e.__cause__, HTTPStatusError)
+                    and e.__cause__.response.status_code in self.MISSING_THUMBNAIL_STATUS_CODES
+                ):
+                    raise
+                logger.info(f"No {self.thumbnail_width}px thumbnail of {image_url}, downloading the original")
+        return await self._fetch_url(image_url, image_name)
+
+    async def _fetch_url(self, url: str, image_name: str) -> Path:
+        if self.image_store:
+            return await self._download_to_store(url)
+        return await self._download_to_file(
+            url, lambda image_format: Path(self.destination_dir, f"{image_name}.{image_format}")
+        )
+
+    def _link_image(self, source_path: Path, image_name: str) -> Path:
+        """Give the animal its image file, linked to the fetched image."""
+        if self.image_store:
+            return self.image_store.link(image_name, source_path, self.destination_dir)
+        file_path = source_path.with_name(f"{image_name}{source_path.suffix}")
+        if file_path != source_path:
+            file_path.unlink(missing_ok=True)
+            try:
+                os.link(source_path, file_path)
+            except OSError:
+                shutil.copyfile(source_path, file_path)
+        return file_path
+
+    async def _download_to_file(self, image_url: str, file_path_of: Callable[[str], Path], content_hash=None,
+                                use_cache: bool = True) -> Path:
+        """
+        Stream the image into the file, updating the optional content hash with every chunk.
+        The file path is given by file_path_of for the image format, detected once the first chunk is read.
         """
-        Saves image data to a file.
+        async with self.client.stream(url=image_url, use_cache=use_cache) as response:
+            expected_size = self._get_content_length(response.headers)
+            self._check_size(image_url, expected_size)
+            reservation_size = expected_size if expected_size is not None else self.ESTIMATED_IMAGE_SIZE
+            async with self.byte_budget.reserved(reservation_size) if self.byte_budget else nullcontext():
+                chunks = self._read_checked(image_url, response.aiter_bytes(self.chunk_size), content_hash)
+                first_chunk = await anext(chunks, b"")
+                image_format = detect_image_format(response.headers.get("Content-Type"), first_chunk, image_url)
+                file_path = file_path_of(image_format)
+                await self.save_image(
+                    image_file_path=file_path,
+                    chunks=self._prepend(first_chunk, chunks),
+                    # A content encoding makes the Content-Length differ from the decoded size.
+                    expected_size=None if "Content-Encoding" in response.headers else expected_size,
+                )
+        return file_path
+
+    async def _download_to_store(self, image_url: str) -> Path:
+        """Download the image into the store unless it is already there, returns its blob path."""
+        blob_path = self.image_store.find_blob(image_url)
+        if blob_path:
+            logger.info(f"Image {image_url} is already stored, skipping its download")
+        else:
+            content_hash = sha256()
+            # The store keeps the image itself, so it is not kept in the response cache too.
+            staged_path = await self._download_to_file(image_url, self.image_store.staging_path, content_hash,
+                                                       use_cache=False)
+            blob_path = self.image_store.add_blob(image_url, staged_path, content_hash.hexdigest())
+        return blob_path
+
+    async def save_image(self, image_file_path: Path, chunks: AsyncIterator[bytes],
+                         expected_size: Optional[int] = None) -> int:
+        """
+        Saves streamed image data to a file, atomically.
 
         :param image_file_path: The file path where the image will be saved.
-        :param data: Content of the image as bytes.
+        :param chunks: Content of the image as a stream of bytes chunks.
+        :param expected_size: Optional expected number of bytes, the image is not saved when it does not match.
+        :return: The number of bytes written.
+        """
+        span = self.tracer.span("save_image", "disk", path=str(image_file_path)) if self.tracer else nullcontext({})
+        with span as span_args:
+            written_size = await self._write_image(image_file_path, chunks, expected_size)
+            span_args["bytes"] = written_size
+        if self.metrics:
+            self.metrics.increment("image_bytes_written_total", written_size)
+        return written_size
+
+    async def _write_image(self, image_file_path: Path, chunks: AsyncIterator[bytes],
+                           expected_size: Optional[int]) -> int:
+        """
+        Write the chunks into a temporary file renamed into place once complete, returns its size.
+        Each write has its own temporary file, so concurrent writes of the same image do not collide.
+        """
+        tmp_file_path = image_file_path.with_name(f".{image_file_path.name}.{uuid4().hex}.part")
+        written_size = 0
+        try:
+            async with aio_open(tmp_file_path, mode="wb") as file:
+                async for chunk in chunks:
+                    await file.write(chunk)
+                    written_size += len(chunk)
+                if expected_size is not None and written_size != expected_size:
+                    raise ImageSizeError(
+                        f"Image {image_file_path.name} has {written_size} bytes, expected {expected_size}"
+                    )
+                if self.fsync_policy != FsyncPolicy.NEVER:
+                    await file.flush()
+                    await to_thread(os.fsync, file.fileno())
+            os.replace(tmp_file_path, image_file_path)
+        except BaseException:
+            tmp_file_path.unlink(missing_ok=True)
+            raise
+        if self.fsync_policy == FsyncPolicy.FILE_AND_DIRECTORY:
+            await to_thread(self._fsync_directory, image_file_path.parent)
+        return written_size
+
+    async def _read_checked(self, image_url: str, chunks: AsyncIterator[bytes],
+                            content_hash=None) -> AsyncIterator[bytes]:
+        """
+        Pass the chunks through, aborting once more than max_image_size bytes were read.
+        The optional hashlib content hash is updated with every chunk.
         """
-        async with aio_open(image_file_path, mode="wb") as file:
-            await file.write(data)
+        read_size = 0
+        async for chunk in chunks:
+            read_size += len(chunk)
+            self._check_size(image_url, read_size)
+            if content_hash:
+                content_hash.update(chunk)
+            yield chunk
+
+    @staticmethod
+    async def _prepend(first_chunk: bytes, chunks: AsyncIterator[bytes]) -> AsyncIterator[bytes]:
+        if first_chunk:
+            yield first_chunk
+        async for chunk in chunks:
+            yield chunk
+
+    def _check_size(self, image_url: str, size: Optional[int]):
+        if self.max_image_size is not None and size is not None and size > self.max_image_size:
+            raise ImageSizeError(f"Image {image_url} is larger than {self.max_image_size} bytes")
+
+    @staticmethod
+    def _get_content_length(headers) -> Optional[int]:
+        try:
+            return int(headers["Content-Length"])
+        except (KeyError, ValueError):
+            return None
+
+    @staticmethod
+    def _fsync_directory(directory: Path):
+        directory_fd = os.open(directory, os.O_RDONLY)
+        try:
+            os.fsync(directory_fd)
+        finally:
+            os.close(directory_fd)
@@ -0,0 +1,127 @@
+import logging
+import os
+import shutil
+from enum import Enum
+from pathlib import Path
+from typing import Final, Optional
+from uuid import uuid4
+
+from pydantic import BaseModel, ValidationError
+
+logger = logging.getLogger(__name__)
+
+
+class LinkMode(str, Enum):
+    HARDLINK = "hardlink"
+    SYMLINK = "symlink"
+
+
+class ImageStoreIndex(BaseModel):
+    """
+    Pydantic schema for the image store index file.
+    Blob paths are relative to the store blobs directory.
+    """
+    url_blobs: dict[str, str] = {}
+    animal_blobs: dict[str, str] = {}
+
+
+class ContentAddressedImageStore:
+    """
+    Stores each distinct image once, as a blob named by its content hash.
+    An index maps image URLs and animal names to their blobs, and every animal gets a link to its blob
+    in the images directory, so shared images and images from previous runs are not downloaded again.
+    """
+    INDEX_FILE_NAME: Final[str] = "index.json"
+
+    def __init__(self, root_dir: Path, link_mode: LinkMode = LinkMode.HARDLINK):
+        """
+        Initializes the store and loads its index.
+
+        :param root_dir: Directory of the blobs, staging area and index file.
+        :param link_mode: How the per-animal files link to their blobs, falls back to a copy when linking fails.
+        """
+        self.root_dir = root_dir
+        self.link_mode = link_mode
+        self.blobs_dir = root_dir / "blobs"
+        self.staging_dir = root_dir / "staging"
+        self.index_path = root_dir / self.INDEX_FILE_NAME
+        self.blobs_dir.mkdir(parents=True, exist_ok=True)
+        self.staging_dir.mkdir(parents=True, exist_ok=True)
+        self.index = self._load_index()
+
+    def find_blob(self, image_url: str) -> Optional[Path]:
+        """
+        Returns the blob of an already stored image URL.
+
+        :param image_url: URL of the image.
+        """
+        relative_blob_path = self.index.url_blobs.get(image_url)
+        if relative_blob_path is None:
+            return None
+        blob_path = self.blobs_dir / relative_blob_path
+        if not blob_path.exists():
+            del self.index.url_blobs[image_url]
+            return None
+        return blob_path
+
+    def staging_path(self, image_format: str) -> Path:
+        """Returns a unique path where a new image is downloaded before it is added to the store."""
+        return self.staging_dir / f"{uuid4().hex}.{image_format}"
+
+    def add_blob(self, image_url: str, staged_path: Path, content_hash: str) -> Path:
+        """
+        Moves a downloaded image into the store, dropping it if a blob with the same content exists.
+
+        :param image_url: URL the image was downloaded from.
+        :param staged_path: Path of the downloaded image in the staging area.
+        :param content_hash: Hex digest of the image content.
+        :return: The blob path.
+        """
+        relative_blob_path = Path(content_hash[:2], f"{content_hash}{staged_path.suffix}")
+        blob_path = self.blobs_dir / relative_blob_path
+        if blob_path.exists():
+            staged_path.unlink(missing_ok=True)
+        else:
+            blob_path.parent.mkdir(exist_ok=True)
+            os.replace(staged_path, blob_path)
+        self.index.url_blobs[image_url] = relative_blob_path.as_posix()
+        return blob_path
+
+    def link(self, animal_name: str, blob_path: Path, destination_dir: Path) -> Path:
+        """
+        Creates (or replaces) the animal's image file as a link to the blob.
+
+        :param animal_name: Name of the animal the image belongs to.
+        :param blob_path: Path of the blob.
+        :param destination_dir: Directory of the per-animal image files.
+        :return: The animal image file path.
+        """
+        file_path = destination_dir / f"{animal_name}{blob_path.suffix}"
+        tmp_link_path = destination_dir / f".{file_path.name}.link"
+        tmp_link_path.unlink(missing_ok=True)
+        try:
+            if self.link_mode == LinkMode.HARDLINK:
+                os.link(blob_path, tmp_link_path)
+            else:
+                os.symlink(os.path.relpath(blob_path, destination_dir), tmp_link_path)
+        except OSError as e:
+            logger.warning(f"Failed to link {file_path} to its blob, copying it instead: {e}")
+            shutil.copyfile(blob_path, tmp_link_path)
+        os.replace(tmp_link_path, file_path)
+        self.index.animal_blobs[animal_name] = blob_path.relative_to(self.blobs_dir).as_posix()
+        return file_path
+
+    def save_index(self):
+        """Writes the index file atomically."""
+        tmp_index_path = self.index_path.with_name(f"{self.INDEX_FILE_NAME}.tmp")
+        tmp_index_path.write_text(self.index.model_dump_json(indent=2))
+        os.replace(tmp_index_path, self.index_path)
+
+    def _load_index(self) -> ImageStoreIndex:
+        try:
+            return ImageStoreIndex.model_validate_json(self.index_path.read_text())
+        except FileNotFoundError:
+            return ImageStoreIndex()
+        except ValidationError as e:
+            logger.warning(f"Ignoring invalid image store index {self.index_path}: {e}")
+            return ImageStoreIndex()
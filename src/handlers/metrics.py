@@ -0,0 +1,256 @@
+import json
+from asyncio import AbstractServer, Queue, StreamReader, StreamWriter, start_server
+from bisect import bisect_left
+from collections import deque
+from logging import getLogger
+from time import monotonic, perf_counter
+from typing import Final, Optional, TypeVar
+from urllib.parse import urlsplit
+
+logger = getLogger(__name__)
+
+T = TypeVar("T")
+
+LabelsKey = tuple[tuple[str, str], ...]
+
+# Upper bounds in seconds, from a cached page to a slow image on a throttled host.
+DEFAULT_BUCKETS: Final[tuple[float, ...]] = (
+    0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0,
+)
+
+
+def host_of(url: str) -> str:
+    return urlsplit(url).hostname or ""
+
+
+def _escape_label_value(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+class Histogram:
+    """
+    A fixed buckets histogram, as in the Prometheus exposition format.
+    Percentiles are estimated by the upper bound of the bucket they fall in.
+    """
+
+    def __init__(self, buckets: tuple[float, ...] = DEFAULT_BUCKETS):
+        self.buckets = buckets
+        self.bucket_counts = [0] * (len(buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value: float):
+        self.bucket_counts[bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+
+    def percentile(self, percent: float) -> float:
+        if not self.count:
+            return 0.0
+        rank = self.count * percent / 100
+        cumulative_count = 0
+        for index, bucket_count in enumerate(self.bucket_counts):
+            cumulative_count += bucket_count
+            if cumulative_count >= rank:
+                return self.buckets[index] if index < len(self.buckets) else float("inf")
+        return float("inf")
+
+    def merge(self, other: "Histogram"):
+        """Adds the observations of a histogram with the same buckets."""
+        self.bucket_counts = [
+            count + other_count for count, other_count in zip(self.bucket_counts, other.bucket_counts)
+        ]
+        self.count += other.count
+        self.sum += other.sum
+
+    def summary(self) -> dict[str, float]:
+        return {
+            "count": self.count,
+            "sum": round(self.sum, 6),
+            "mean": round(self.sum / self.count, 6) if self.count else 0.0,
+            "p50": self.percentile(50),
+            "p99": self.percentile(99),
+        }
+
+
+class PipelineMetrics:
+    """
+    In-memory counters, gauges and histograms of the pipeline stages, labelled by e.g. stage, host or error class.
+    Components take an optional PipelineMetrics and skip their measurements without one,
+    so a run without metrics pays a single None check per measurement point.
+    """
+
+    def __init__(self, buckets: tuple[float, ...] = DEFAULT_BUCKETS):
+        """
+        :param buckets: Upper bounds in seconds of the histograms buckets.
+        """
+        self.buckets = buckets
+        self.started_at = monotonic()
+        self.counters: dict[str, dict[LabelsKey, float]] = {}
+        self.gauges: dict[str, dict[LabelsKey, float]] = {}
+        self.histograms: dict[str, dict[LabelsKey, Histogram]] = {}
+
+    def increment(self, name: str, value: float = 1, **labels: str):
+        counter = self.counters.setdefault(name, {})
+        key = self._labels_key(labels)
+        counter[key] = counter.get(key, 0) + value
+
+    def set_gauge(self, name: str, value: float, **labels: str):
+        self.gauges.setdefault(name, {})[self._labels_key(labels)] = value
+
+    def observe(self, name: str, value: float, **labels: str):
+        histograms = self.histograms.setdefault(name, {})
+        key = self._labels_key(labels)
+        if key not in histograms:
+            histograms[key] = Histogram(self.buckets)
+        histograms[key].observe(value)
+
+    def record_error(self, stage: str, error: BaseException):
+        """Count a failed item of the stage by its error class."""
+        self.increment("stage_errors_total", stage=stage, error=type(error).__name__)
+
+    def merge(self, other: "PipelineMetrics"):
+        """
+        Adds the metrics of another process, e.g. of a crawl shard. Counters and histograms are added up,
+        and gauges are summed, as each process reports its own queues.
+        """
+        self.started_at = min(self.started_at, other.started_at)
+        for name, values in other.counters.items():
+            for key, value in values.items():
+                counter = self.counters.setdefault(name, {})
+                counter[key] = counter.get(key, 0) + value
+        for name, values in other.gauges.items():
+            for key, value in values.items():
+                gauge = self.gauges.setdefault(name, {})
+                gauge[key] = gauge.get(key, 0) + value
+        for name, histograms in other.histograms.items():
+            for key, histogram in histograms.items():
+                self.histograms.setdefault(name, {}).setdefault(key, Histogram(histogram.buckets)).merge(histogram)
+
+    def summary(self) -> dict:
+        """A JSON serializable summary, with the request rate of each host."""
+        elapsed = max(monotonic() - self.started_at, 1e-9)
+        host_requests: dict[str, float] = {}
+        for key, value in self.counters.get("http_requests_total", {}).items():
+            host = dict(key).get("host", "")
+            host_requests[host] = host_requests.get(host, 0) + value
+        return {
+            "uptime_seconds": round(elapsed, 3),
+            "counters": {name: self._by_labels(values) for name, values in self.counters.items()},
+            "gauges": {name: self._by_labels(values) for name, values in self.gauges.items()},
+            "histograms": {
+                name: {self._format_labels(key): histogram.summary() for key, histogram in histograms.items()}
+                for name, histograms in self.histograms.items()
+            },
+            "host_requests_per_second": {host: round(count / elapsed, 3) for host, count in host_requests.items()},
+        }
+
+    def to_prometheus(self) -> str:
+        """The metrics in the Prometheus text exposition format."""
+        lines = []
+        for name, values in self.counters.items():
+            lines.append(f"# TYPE {name} counter")
+            lines.extend(f"{name}{self._format_labels(key)} {value}" for key, value in values.items())
+        for name, values in self.gauges.items():
+            lines.append(f"# TYPE {name} gauge")
+            lines.extend(f"{name}{self._format_labels(key)} {value}" for key, value in values.items())
+        for name, histograms in self.histograms.items():
+            lines.append(f"# TYPE {name} histogram")
+            for key, histogram in histograms.items():
+                cumulative_count = 0
+                for upper_bound, bucket_count in zip([*histogram.buckets, "+Inf"], histogram.bucket_counts):
+                    cumulative_count += bucket_count
+                    bucket_key = (*key, ("le", str(upper_bound)))
+                    lines.append(f"{name}_bucket{self._format_labels(bucket_key)} {cumulative_count}")
+                lines.append(f"{name}_sum{self._format_labels(key)} {histogram.sum}")
+                lines.append(f"{name}_count{self._format_labels(key)} {histogram.count}")
+        return "\n".join(lines) + "\n"
+
+    @staticmethod
+    def _labels_key(labels: dict[str, str]) -> LabelsKey:
+        return tuple(sorted(labels.items()))
+
+    @classmethod
+    def _by_labels(cls, values: dict[LabelsKey, float]) -> dict[str, float]:
+        return {cls._format_labels(key): value for key, value in values.items()}
+
+    @staticmethod
+    def _format_labels(key: LabelsKey) -> str:
+        if not key:
+            return ""
+        labels = ",".join(f'{name}="{_escape_label_value(value)}"' for name, value in key)
+        return f"{{{labels}}}"
+
+
+class MeteredQueue(Queue):
+    """
+    An asyncio Queue that reports its depth and how long each item waited in it, when it has metrics.
+    """
+
+    def __init__(self, maxsize: int, name: str, metrics: Optional[PipelineMetrics]):
+        """
+        :param maxsize: Maximum number of queued items, as in asyncio.Queue.
+        :param name: The queue label of the metrics.
+        :param metrics: Where the queue metrics are recorded, None for an unmetered queue.
+        """
+        super().__init__(maxsize)
+        self.name = name
+        self.metrics = metrics
+
+    def _init(self, maxsize):
+        self._queue = deque()
+
+    def _put(self, item: T):
+        self._queue.append((item, perf_counter()))
+        if self.metrics:
+            self.metrics.set_gauge("queue_depth", len(self._queue), queue=self.name)
+
+    def _get(self) -> T:
+        item, queued_at = self._queue.popleft()
+        if self.metrics:
+            self.metrics.observe("queue_wait_seconds", perf_counter() - queued_at, queue=self.name)
+            self.metrics.set_gauge("queue_depth", len(self._queue), queue=self.name)
+        return item
+
+
+class MetricsServer:
+    """
+    Serves the metrics over HTTP: "/metrics" in the Prometheus text format and "/metrics.json" as a JSON summary.
+    """
+
+    def __init__(self, metrics: PipelineMetrics, host: str = "127.0.0.1", port: int = 9100):
+        self.metrics = metrics
+        self.host = host
+        self.port = port
+        self._server: Optional[AbstractServer] = None
+
+    async def __aenter__(self):
+        self._server = await start_server(self._handle, self.host, self.port)
+        logger.info(f"Serving metrics at http://{self.host}:{self.port}/metrics")
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        self._server.close()
+        await self._server.wait_closed()
+
+    async def _handle(self, reader: StreamReader, writer: StreamWriter):
+        try:
+            request_line = await reader.readline()
+            # Skip the request headers.
+            while (await reader.readline()) not in (b"\r\n", b"\n", b""):
+                pass
+            path = request_line.split(b" ")[1] if request_line.count(b" ") >= 2 else b""
+            if path == b"/metrics":
+                status, content_type, body = "200 OK", "text/plain; version=0.0.4", self.metrics.to_prometheus()
+            elif path == b"/metrics.json":
+                status, content_type, body = "200 OK", "application/json", json.dumps(self.metrics.summary())
+            else:
+                status, content_type, body = "404 Not Found", "text/plain", "Not found\n"
+            payload = body.encode()
+            writer.write(
+                f"HTTP/1.1 {status}\r\nContent-Type: {content_type}\r\nContent-Length: {len(payload)}\r\n"
+                f"Connection: close\r\n\r\n".encode() + payload
+            )
+            await writer.drain()
+        finally:
+            writer.close()
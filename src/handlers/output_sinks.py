@@ -0,0 +1,301 @@
+import csv
+import io
+import json
+import sqlite3
+from abc import ABC, abstractmethod
+from asyncio import Lock, to_thread
+from logging import getLogger
+from pathlib import Path
+from typing import Any, Final, Optional, Protocol
+
+import aiofiles
+
+from src.handlers.output_writer import OutputWriter
+from src.processors.adjective_index import AdjectiveIndex
+
+try:
+    import pyarrow
+    import pyarrow.parquet
+except ImportError:  # Parquet output is optional.
+    pyarrow = None
+
+logger = getLogger(__name__)
+
+Row = dict[str, Any]
+
+ANIMALS_TABLE: Final[str] = "animals"
+IMAGES_TABLE: Final[str] = "images"
+
+
+class RowSink(Protocol):
+    """
+    A streaming output of the pipeline results, fed with rows of named tables as the animals are parsed
+    and their images are saved.
+    """
+
+    async def add(self, table: str, row: Row):
+        ...
+
+    async def flush(self):
+        ...
+
+    async def close(self):
+        ...
+
+    def fail(self):
+        """Marks the run as failed, the outputs derived from the whole run are then not written on close."""
+        ...
+
+
+class OutputSink(ABC):
+    """
+    A RowSink whose rows are buffered per table and written, and flushed, in batches of batch_size rows.
+    """
+
+    def __init__(self, batch_size: int = 500):
+        """
+        :param batch_size: Number of buffered rows of a table that triggers a write.
+        """
+        self.batch_size = batch_size
+        self.failed = False
+        self._batches: dict[str, list[Row]] = {}
+        self._lock = Lock()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        if exc_type:
+            self.fail()
+        await self.close()
+
+    async def add(self, table: str, row: Row):
+        """
+        Adds a row to the table, writing the table's batch once it is full.
+
+        :param table: Name of the table, e.g. ANIMALS_TABLE.
+        :param row: The row values by column name, every row of a table has the same columns.
+        """
+        batch = self._batches.setdefault(table, [])
+        batch.append(row)
+        if len(batch) >= self.batch_size:
+            self._batches[table] = []
+            async with self._lock:
+                await self._write_batch(table, batch)
+
+    async def flush(self):
+        """Writes the buffered rows of every table."""
+        batches, self._batches = self._batches, {}
+        async with self._lock:
+            for table, batch in batches.items():
+                if batch:
+                    await self._write_batch(table, batch)
+
+    async def close(self):
+        """Writes the buffered rows and releases the output."""
+        await self.flush()
+        async with self._lock:
+            await self._close()
+
+    @abstractmethod
+    async def _write_batch(self, table: str, rows: list[Row]):
+        pass
+
+    def fail(self):
+        self.failed = True
+
+    async def _close(self):
+        pass
+
+    @staticmethod
+    def _flat_value(value: Any) -> Any:
+        """Lists are joined by commas in the flat (CSV and SQLite) outputs."""
+        return ",".join(value) if isinstance(value, (list, tuple)) else value
+
+
+class CompositeOutputSink:
+    """
+    A RowSink feeding every row to several sinks, each one batches the rows by its own batch size.
+    """
+
+    def __init__(self, sinks: list[RowSink]):
+        self.sinks = sinks
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        if exc_type:
+            self.fail()
+        await self.close()
+
+    async def add(self, table: str, row: Row):
+        for sink in self.sinks:
+            await sink.add(table, row)
+
+    async def flush(self):
+        for sink in self.sinks:
+            await sink.flush()
+
+    async def close(self):
+        """Closes every sink, even when one fails to close, and raises the first error."""
+        first_error = None
+        for sink in self.sinks:
+            try:
+                await sink.close()
+            except BaseException as e:
+                logger.error(f"Failed to close the {type(sink).__name__} output: {e!r}")
+                first_error = first_error or e
+        if first_error:
+            raise first_error
+
+    def fail(self):
+        for sink in self.sinks:
+            sink.fail()
+
+
+class CSVOutputSink(OutputSink):
+    """
+    Writes each table to "<table>.csv" in the output directory, with the csv module.
+    """
+
+    def __init__(self, dir_path: Path, batch_size: int = 500):
+        super().__init__(batch_size)
+        self.dir_path = dir_path
+        self._files: dict[str, Any] = {}
+
+    async def _write_batch(self, table: str, rows: list[Row]):
+        buffer = io.StringIO()
+        writer = csv.writer(buffer, lineterminator="\n")
+        if table not in self._files:
+            self._files[table] = await aiofiles.open(self.dir_path / f"{table}.csv", mode="w", newline="")
+            writer.writerow(rows[0].keys())
+        writer.writerows([self._flat_value(value) for value in row.values()] for row in rows)
+        await self._files[table].write(buffer.getvalue())
+        await self._files[table].flush()
+
+    async def _close(self):
+        for file in self._files.values():
+            await file.close()
+        self._files = {}
+
+
+class JSONLOutputSink(OutputSink):
+    """
+    Writes each table to "<table>.jsonl" in the output directory, one JSON object per row.
+    """
+
+    def __init__(self, dir_path: Path, batch_size: int = 500):
+        super().__init__(batch_size)
+        self.dir_path = dir_path
+        self._files: dict[str, Any] = {}
+
+    async def _write_batch(self, table: str, rows: list[Row]):
+        if table not in self._files:
+            self._files[table] = await aiofiles.open(self.dir_path / f"{table}.jsonl", mode="w")
+        await self._files[table].write("".join(json.dumps(row, ensure_ascii=False) + "\n" for row in rows))
+        await self._files[table].flush()
+
+    async def _close(self):
+        for file in self._files.values():
+            await file.close()
+        self._files = {}
+
+
+class SQLiteOutputSink(OutputSink):
+    """
+    Writes each table to a table of a SQLite database, one transaction per batch.
+    The database calls run in a worker thread, so they do not block the event loop.
+    """
+
+    def __init__(self, db_path: Path, batch_size: int = 500):
+        super().__init__(batch_size)
+        self.db_path = db_path
+        self._connection: Optional[sqlite3.Connection] = None
+        self._tables: set[str] = set()
+
+    async def _write_batch(self, table: str, rows: list[Row]):
+        await to_thread(self._write_batch_sync, table, rows)
+
+    def _write_batch_sync(self, table: str, rows: list[Row]):
+        if self._connection is None:
+            self._connection = sqlite3.connect(self.db_path, check_same_thread=False)
+            self._connection.execute("PRAGMA journal_mode=WAL")
+        columns = ", ".join(f'"{column}"' for column in rows[0])
+        with self._connection:
+            if table not in self._tables:
+                self._connection.execute(f'DROP TABLE IF EXISTS "{table}"')
+                self._connection.execute(f'CREATE TABLE "{table}" ({columns})')
+                self._tables.add(table)
+            self._connection.executemany(
+                f'INSERT INTO "{table}" ({columns}) VALUES ({", ".join("?" * len(rows[0]))})',
+                ([self._flat_value(value) for value in row.values()] for row in rows),
+            )
+
+    async def _close(self):
+        if self._connection is not None:
+            await to_thread(self._connection.close)
+            self._connection = None
+
+
+class ParquetOutputSink(OutputSink):
+    """
+    Writes each table to "<table>.parquet" in the output directory, one row group per batch.
+    Requires the optional pyarrow package.
+    """
+
+    def __init__(self, dir_path: Path, batch_size: int = 10_000):
+        if pyarrow is None:
+            raise ImportError("Parquet output requires the pyarrow package")
+        super().__init__(batch_size)
+        self.dir_path = dir_path
+        self._writers: dict[str, Any] = {}
+
+    async def _write_batch(self, table: str, rows: list[Row]):
+        await to_thread(self._write_batch_sync, table, rows)
+
+    def _write_batch_sync(self, table: str, rows: list[Row]):
+        arrow_table = pyarrow.Table.from_pylist(rows)
+        if table not in self._writers:
+            self._writers[table] = pyarrow.parquet.ParquetWriter(self.dir_path / f"{table}.parquet",
+                                                                 arrow_table.schema)
+        self._writers[table].write_table(arrow_table)
+
+    async def _close(self):
+        for writer in self._writers.values():
+            await to_thread(writer.close)
+        self._writers = {}
+
+
+class AdjectiveGroupsCSVSink(OutputSink):
+    """
+    Derives the collateral adjectives groups from the streamed animals rows,
+    and writes them with OutputWriter to the grouped CSV file, and optionally to a query index file, on close.
+    The files of the last completed run are kept when the run failed.
+    """
+
+    def __init__(self, dir_path: Path, index_path: Optional[Path] = None):
+        """
+        :param dir_path: Directory of the grouped CSV file.
+        :param index_path: Optional path of the adjective query index file, see AdjectiveQueryIndex.
+        """
+        super().__init__(batch_size=1)
+        self.dir_path = dir_path
+        self.index_path = index_path
+        self.collateral_adjectives_groups = AdjectiveIndex()
+
+    async def add(self, table: str, row: Row):
+        if table == ANIMALS_TABLE:
+            for collateral_adjective in row["collateral_adjectives"]:
+                self.collateral_adjectives_groups.add(collateral_adjective, row["name"])
+
+    async def _write_batch(self, table: str, rows: list[Row]):
+        pass
+
+    async def _close(self):
+        if self.failed:
+            logger.warning("The run failed, the collateral adjectives groups of the last run are kept")
+            return
+        await OutputWriter.write_adjectives_groups_to_csv(self.dir_path, self.collateral_adjectives_groups)
+        if self.index_path:
+            await OutputWriter.write_adjectives_query_index(self.index_path, self.collateral_adjectives_groups)
@@ -1,36 +1,61 @@
+import csv
+import io
 import logging
+from asyncio import to_thread
 from pathlib import Path
+from typing import Mapping
 
 import aiofiles
 
+from src.processors.adjective_query_index import write_index
+
 logger = logging.getLogger(__name__)
 
 
 class OutputWriter:
     """
     A class responsible for writing output data to various file formats.
-    Currently supports writing data to CSV files.
+    Currently supports writing data to CSV files and to adjective query index files.
     """
 
     @staticmethod
-    async def write_adjectives_groups_to_csv(dir_path: Path, collateral_adjectives_groups: dict[str, list[str]]):
+    async def write_adjectives_groups_to_csv(dir_path: Path, collateral_adjectives_groups: Mapping[str, list[str]]):
         """
         Writes collateral adjectives animal groups to a CSV file.
 
         :param dir_path: The directory path where the CSV file will be saved.
-        :param collateral_adjectives_groups: Dictionary where keys are collateral adjectives
+        :param collateral_adjectives_groups: Mapping where keys are collateral adjectives
                                              and values are lists of animals (associated with these adjectives).
         """
         file_path = dir_path / "collateral_adjectives_animals_groups.csv"
+        buffer = io.StringIO()
+        csv.writer(buffer, lineterminator="\n").writerow(["Collateral Adjective", "Animals"])
+        csv.writer(buffer, lineterminator="\n", quoting=csv.QUOTE_ALL).writerows(
+            [collateral_adjective.capitalize(), ",".join(animals)]
+            for collateral_adjective, animals in collateral_adjectives_groups.items()
+        )
         try:
-            async with aiofiles.open(file_path, mode="w") as file:
-                await file.write("Collateral Adjective,Animals\n")
-                for collateral_adjective, animals in collateral_adjectives_groups.items():
-                    animals_list = ",".join(animals)
-                    await file.write(f'"{collateral_adjective.capitalize()}","{animals_list}"\n')
+            async with aiofiles.open(file_path, mode="w", newline="") as file:
+                await file.write(buffer.getvalue())
             logger.info(f"CSV file saved: {file_path}")
 
         except PermissionError as e:
             logger.error(f"Permission error while saving file {file_path}: {e}")
 
+    @staticmethod
+    async def write_adjectives_query_index(file_path: Path, collateral_adjectives_groups: Mapping[str, list[str]]):
+        """
+        Writes the collateral adjectives animal groups to a query index file, see AdjectiveQueryIndex.
+
+        :param file_path: Path of the index file.
+        :param collateral_adjectives_groups: Mapping where keys are collateral adjectives
+                                             and values are lists of animals (associated with these adjectives).
+        """
+        try:
+            await to_thread(write_index, file_path, collateral_adjectives_groups)
+            logger.info(f"Adjective query index saved: {file_path}")
+
+        except PermissionError as e:
+            logger.error(f"Permission error while saving file {file_path}: {e}")
+
     # Future method implementations for other formats like HTML
@@ -0,0 +1,146 @@
+import logging
+from asyncio import Lock, get_running_loop, sleep
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from typing import Optional
+from urllib.parse import urlsplit
+
+from pydantic import BaseModel
+
+logger = logging.getLogger(__name__)
+
+
+class RateLimit(BaseModel):
+    """
+    Pydantic schema for the rate limit settings of a host.
+    """
+    requests_per_second: float
+    burst: int
+
+
+class HostRateLimitStats(BaseModel):
+    """
+    Pydantic schema for the rate limiter statistics of a host.
+    """
+    requests: int = 0
+    throttled_responses: int = 0
+    waited_seconds: float = 0.0
+
+
+class TokenBucket:
+    """
+    A token bucket that admits requests at a steady rate with bursts of up to `burst` requests.
+    Waiting requests are admitted in FIFO order.
+    """
+
+    def __init__(self, rate_limit: RateLimit):
+        self.rate_limit = rate_limit
+        self.stats = HostRateLimitStats()
+        self._tokens = float(rate_limit.burst)
+        self._updated_at: Optional[float] = None
+        self._blocked_until = 0.0
+        self._lock = Lock()
+
+    async def acquire(self):
+        """Waits until a request may be sent."""
+        loop = get_running_loop()
+        started_at = loop.time()
+        async with self._lock:
+            while True:
+                now = loop.time()
+                if self._blocked_until > now:
+                    await sleep(self._blocked_until - now)
+                    continue
+                self._refill(now)
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    break
+                await sleep((1 - self._tokens) / self.rate_limit.requests_per_second)
+        self.stats.requests += 1
+        self.stats.waited_seconds += loop.time() - started_at
+
+    def block(self, delay: float):
+        """Stops admitting requests for delay seconds and drains the bucket."""
+        now = get_running_loop().time()
+        self._blocked_until = max(self._blocked_until, now + delay)
+        self._tokens = 0.0
+        self._updated_at = self._blocked_until
+        self.stats.throttled_responses += 1
+
+    def _refill(self, now: float):
+        if self._updated_at is None:
+            self._updated_at = now
+        elif now > self._updated_at:
+            refilled_tokens = (now - self._updated_at) * self.rate_limit.requests_per_second
+            self._tokens = min(float(self.rate_limit.burst), self._tokens + refilled_tokens)
+            self._updated_at = now
+
+
+class HostRateLimiter:
+    """
+    Rate limits requests per host, each host has its own token bucket.
+    Hosts that answer with "429 Too Many Requests" or "503 Service Unavailable" are paused
+    for the time given by their Retry-After header.
+    """
+
+    def __init__(self, default_limit: RateLimit, host_limits: Optional[dict[str, RateLimit]] = None,
+                 default_retry_after: float = 1.0, max_retry_after: float = 120.0):
+        """
+        Initializes the rate limiter.
+
+        :param default_limit: Rate limit of hosts without explicit settings.
+        :param host_limits: Rate limits by host name (e.g. "en.wikipedia.org").
+        :param default_retry_after: Pause in seconds when a throttled response has no valid Retry-After header.
+        :param max_retry_after: Upper bound in seconds of a single pause.
+        """
+        self.default_limit = default_limit
+        self.host_limits = host_limits or {}
+        self.default_retry_after = default_retry_after
+        self.max_retry_after = max_retry_after
+        self._buckets: dict[str, TokenBucket] = {}
+
+    async def acquire(self, url: str):
+        """
+        Waits until a request to the URL's host may be sent.
+
+        :param url: The requested URL.
+        """
+        await self._get_bucket(url).acquire()
+
+    def throttle(self, url: str, retry_after: Optional[str]) -> float:
+        """
+        Pauses the URL's host after a throttled response.
+
+        :param url: The throttled URL.
+        :param retry_after: Value of the response Retry-After header, in seconds or as an HTTP date.
+        :return: The pause in seconds.
+        """
+        delay = min(self._parse_retry_after(retry_after), self.max_retry_after)
+        self._get_bucket(url).block(delay)
+        logger.warning(f"Host {urlsplit(url).hostname} throttled the requests, pausing for {delay:.1f}s")
+        return delay
+
+    def stats(self) -> dict[str, HostRateLimitStats]:
+        """Returns the rate limiter statistics by host."""
+        return {host: bucket.stats for host, bucket in self._buckets.items()}
+
+    def _get_bucket(self, url: str) -> TokenBucket:
+        host = urlsplit(url).hostname or ""
+        if host not in self._buckets:
+            self._buckets[host] = TokenBucket(self.host_limits.get(host, self.default_limit))
+        return self._buckets[host]
+
+    def _parse_retry_after(self, retry_after: Optional[str]) -> float:
+        if not retry_after:
+            return self.default_retry_after
+        try:
+            return max(0.0, float(retry_after))
+        except ValueError:
+            pass
+        try:
+            retry_at = parsedate_to_datetime(retry_after)
+        except (TypeError, ValueError):
+            return self.default_retry_after
+        if retry_at.tzinfo is None:
+            retry_at = retry_at.replace(tzinfo=timezone.utc)
+        return max(0.0, (retry_at - datetime.now(timezone.utc)).total_seconds())
@@ -0,0 +1,52 @@
+from random import uniform
+
+from httpx import ConnectError, ConnectTimeout, PoolTimeout, Timeout, TransportError, codes
+from pydantic import BaseModel
+
+# Errors raised before the request was sent, so retrying them is safe for any method.
+NOT_SENT_ERRORS = (ConnectError, ConnectTimeout, PoolTimeout)
+
+
+class RetryPolicy(BaseModel):
+    """
+    Pydantic schema for the retry settings of HTTPXClient requests.
+    Delays grow exponentially from base_delay up to max_delay, with full jitter.
+    """
+    max_attempts: int = 4
+    base_delay: float = 0.5
+    max_delay: float = 30.0
+    retry_status_codes: frozenset[int] = frozenset({
+        codes.TOO_MANY_REQUESTS,
+        codes.INTERNAL_SERVER_ERROR,
+        codes.BAD_GATEWAY,
+        codes.SERVICE_UNAVAILABLE,
+        codes.GATEWAY_TIMEOUT,
+    })
+    idempotent_methods: frozenset[str] = frozenset({"GET", "HEAD", "OPTIONS"})
+    # Per-attempt timeouts in seconds: idempotent requests can afford short attempts since they are retried,
+    # other requests get a single long attempt once they may have reached the server.
+    idempotent_timeout: float = 10.0
+    non_idempotent_timeout: float = 60.0
+
+    def backoff(self, attempt: int) -> float:
+        """
+        Returns the delay before the next attempt.
+
+        :param attempt: Zero-based index of the attempt that failed.
+        """
+        return uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+
+    def timeout(self, method: str) -> Timeout:
+        """Returns the per-attempt timeout of the request method."""
+        if method in self.idempotent_methods:
+            return Timeout(self.idempotent_timeout)
+        return Timeout(self.non_idempotent_timeout)
+
+    def should_retry_status(self, method: str, status_code: int) -> bool:
+        return method in self.idempotent_methods and status_code in self.retry_status_codes
+
+    def should_retry_error(self, method: str, error: TransportError) -> bool:
+        return isinstance(error, NOT_SENT_ERRORS) or method in self.idempotent_methods
+
+    def is_last_attempt(self, attempt: int) -> bool:
+        return attempt >= self.max_attempts - 1
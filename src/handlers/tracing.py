@@ -0,0 +1,280 @@
+import json
+import os
+import sys
+import threading
+import traceback
+from asyncio import CancelledError, Task, create_task, current_task, sleep
+from contextlib import contextmanager
+from functools import wraps
+from itertools import count
+from logging import getLogger
+from pathlib import Path
+from time import perf_counter
+from typing import Any, Callable, Final, Iterator, Optional, TypeVar
+
+from httpx import Request, Response
+
+logger = getLogger(__name__)
+
+T = TypeVar("T")
+
+# Time to the first byte is measured from the request headers being sent to the response headers being received.
+HTTP_PHASES: Final[dict[str, str]] = {
+    "connect_tcp": "dns+connect",
+    "start_tls": "tls",
+    "receive_response_headers": "ttfb",
+    "receive_response_body": "body",
+}
+
+
+class Tracer:
+    """
+    Records timed spans of the pipeline in the Chrome trace event format, which chrome://tracing and
+    https://ui.perfetto.dev open as a timeline.
+    Spans are laid out on a track per asyncio task (or thread), so the spans of a track always nest,
+    and each HTTP request gets its own track of its phases: DNS and connect, TLS, time to first byte and body.
+    Components take an optional Tracer and skip their spans without one.
+    """
+
+    def __init__(self, max_events: int = 1_000_000):
+        """
+        :param max_events: Maximum number of recorded events, the later ones are dropped and counted.
+        """
+        self.max_events = max_events
+        self.events: list[dict[str, Any]] = []
+        self.dropped_events = 0
+        self.started_at = perf_counter()
+        self._pid = os.getpid()
+        self._tracks: dict[str, int] = {}
+        self._request_ids = count(1)
+
+    @contextmanager
+    def span(self, name: str, category: str, **args: Any) -> Iterator[dict[str, Any]]:
+        """
+        Records the span of the block on the current task's track. The yielded span arguments may be added to
+        within the block, e.g. with its result size, and the span gets the error class of a raised exception.
+        """
+        started_at = perf_counter()
+        try:
+            yield args
+        except BaseException as e:
+            args["error"] = type(e).__name__
+            raise
+        finally:
+            self.add_span(name, category, started_at, perf_counter(), **args)
+
+    def traced(self, func: Callable[..., T], name: str, category: str, **args: Any) -> Callable[..., T]:
+        """Wraps a function so that each of its calls is recorded as a span."""
+        @wraps(func)
+        def traced_func(*func_args, **func_kwargs) -> T:
+            with self.span(name, category, **args):
+                return func(*func_args, **func_kwargs)
+        return traced_func
+
+    def add_span(self, name: str, category: str, started_at: float, ended_at: float,
+                 track: Optional[str] = None, **args: Any):
+        """
+        Records a complete span given its perf_counter start and end times.
+
+        :param track: Name of the span's track, the current task's (or thread's) by default.
+        """
+        self._add_event({
+            "name": name, "cat": category, "ph": "X", "ts": self._timestamp(started_at),
+            "dur": round((ended_at - started_at) * 1_000_000, 3), "pid": self._pid,
+            "tid": self._track_id(track or self._current_track()), "args": args,
+        })
+
+    def add_async_event(self, phase: str, name: str, category: str, event_id: int, at: float, **args: Any):
+        """Records the begin ("b") or end ("e") event of a span of an async track, its spans may overlap others."""
+        self._add_event({
+            "name": name, "cat": category, "ph": phase, "id": event_id, "ts": self._timestamp(at),
+            "pid": self._pid, "tid": self._track_id(self._current_track()), "args": args,
+        })
+
+    def http_event_hooks(self) -> dict[str, list[Callable]]:
+        """
+        The httpx event hooks tracing each request: its track spans the request until its response is closed,
+        and its phases are recorded through the httpcore "trace" request extension.
+        """
+        return {"request": [self._on_request], "response": [self._on_response]}
+
+    async def _on_request(self, request: Request):
+        request.extensions["trace"] = _HTTPRequestTrace(self, next(self._request_ids), request)
+
+    @staticmethod
+    async def _on_response(response: Response):
+        request_trace = response.request.extensions.get("trace")
+        if isinstance(request_trace, _HTTPRequestTrace):
+            request_trace.response_received(response)
+
+    def to_chrome_trace(self) -> dict[str, Any]:
+        """The trace as a Chrome trace event JSON object, with the names of its tracks."""
+        track_names = [
+            {"name": "thread_name", "ph": "M", "pid": self._pid, "tid": track_id, "args": {"name": track}}
+            for track, track_id in self._tracks.items()
+        ]
+        return {
+            "traceEvents": track_names + self.events,
+            "displayTimeUnit": "ms",
+            "otherData": {"dropped_events": self.dropped_events},
+        }
+
+    def export(self, path: Path):
+        """Writes the trace to a JSON file, atomically."""
+        tmp_path = path.with_name(f".{path.name}.tmp")
+        tmp_path.write_text(json.dumps(self.to_chrome_trace()))
+        os.replace(tmp_path, path)
+        logger.info(f"Wrote {len(self.events)} trace events to {path}")
+
+    def _add_event(self, event: dict[str, Any]):
+        if len(self.events) < self.max_events:
+            self.events.append(event)
+        else:
+            self.dropped_events += 1
+
+    def _timestamp(self, at: float) -> float:
+        """Microseconds since the tracer was created."""
+        return round((at - self.started_at) * 1_000_000, 3)
+
+    def _track_id(self, track: str) -> int:
+        track_id = self._tracks.get(track)
+        if track_id is None:
+            track_id = self._tracks[track] = len(self._tracks) + 1
+        return track_id
+
+    @staticmethod
+    def _current_track() -> str:
+        try:
+            task = current_task()
+        except RuntimeError:
+            task = None
+        return task.get_name() if task else threading.current_thread().name
+
+
+class _HTTPRequestTrace:
+    """
+    The httpcore trace callback of a request: records the request's async track and its HTTP_PHASES spans.
+    The track ends once the response is closed, or when the request fails.
+    Transports that are not backed by httpcore, e.g. a replayed archive, trace no phases,
+    their track then ends with the response headers.
+    """
+
+    def __init__(self, tracer: Tracer, request_id: int, request: Request):
+        self.tracer = tracer
+        self.request_id = request_id
+        self.name = f"{request.method} {request.url}"
+        self.status: Optional[int] = None
+        self.traced = False
+        self.ended = False
+        self._started: dict[str, float] = {}
+        tracer.add_async_event("b", self.name, "http", request_id, perf_counter(), url=str(request.url))
+
+    async def __call__(self, event_name: str, info: dict[str, Any]):
+        self.traced = True
+        step, _, state = event_name.rpartition(".")
+        step = step.rpartition(".")[2]
+        now = perf_counter()
+        if state == "started":
+            # The time to the first byte starts with the request headers.
+            self._started.setdefault("receive_response_headers" if step == "send_request_headers" else step, now)
+            return
+        phase = HTTP_PHASES.get(step)
+        started_at = self._started.pop(step, None) if phase else None
+        if started_at is not None:
+            args = {"error": type(info["exception"]).__name__} if state == "failed" and "exception" in info else {}
+            self.tracer.add_async_event("b", phase, "http", self.request_id, started_at)
+            self.tracer.add_async_event("e", phase, "http", self.request_id, now, **args)
+        if state == "failed" or step == "response_closed":
+            self._end(now)
+
+    def response_received(self, response: Response):
+        self.status = response.status_code
+        if not self.traced:
+            self._end(perf_counter())
+
+    def _end(self, at: float):
+        if not self.ended:
+            self.ended = True
+            self.tracer.add_async_event("e", self.name, "http", self.request_id, at, status=self.status)
+
+
+class EventLoopBlockMonitor:
+    """
+    Flags the callbacks that block the event loop longer than a threshold.
+    A heartbeat task ticks every interval, and a watchdog thread captures the loop thread's stack once a tick is
+    overdue by the threshold, i.e. while the blocking callback still runs. Each block is logged and, with a tracer,
+    recorded as a span of the "event loop" track with its stack.
+    """
+    TRACK: Final[str] = "event loop"
+
+    def __init__(self, tracer: Optional[Tracer] = None, threshold: float = 0.1, interval: float = 0.01,
+                 stack_limit: int = 20):
+        """
+        :param tracer: Optional tracer that the blocks are recorded in.
+        :param threshold: Seconds the loop must be blocked for to be flagged.
+        :param interval: Seconds between the heartbeat ticks.
+        :param stack_limit: Number of innermost frames of the captured stacks.
+        """
+        self.tracer = tracer
+        self.threshold = threshold
+        self.interval = interval
+        self.stack_limit = stack_limit
+        self.blocks: list[tuple[float, str]] = []
+        self._tick = 0
+        self._tick_at = perf_counter()
+        self._stacks: dict[int, traceback.StackSummary] = {}
+        self._stopped = threading.Event()
+        self._task: Optional[Task] = None
+        self._watchdog: Optional[threading.Thread] = None
+
+    async def __aenter__(self):
+        self._stopped.clear()
+        self._tick_at = perf_counter()
+        loop_thread_id = threading.get_ident()
+        self._task = create_task(self._heartbeat())
+        self._watchdog = threading.Thread(target=self._watch, args=(loop_thread_id,), name="loop-watchdog",
+                                          daemon=True)
+        self._watchdog.start()
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        self._stopped.set()
+        self._task.cancel()
+        try:
+            await self._task
+        except CancelledError:
+            pass
+        self._watchdog.join()
+
+    async def _heartbeat(self):
+        while True:
+            scheduled_at = perf_counter()
+            await sleep(self.interval)
+            now = perf_counter()
+            lag = now - scheduled_at - self.interval
+            if lag >= self.threshold:
+                self._record_block(scheduled_at + self.interval, now, lag)
+            # The tick and its time are read together by the watchdog, without a lock.
+            self._tick, self._tick_at = self._tick + 1, now
+
+    def _watch(self, loop_thread_id: int):
+        while not self._stopped.wait(self.interval):
+            tick, tick_at = self._tick, self._tick_at
+            if tick not in self._stacks and perf_counter() - tick_at >= self.interval + self.threshold:
+                frame = sys._current_frames().get(loop_thread_id)
+                if frame is not None:
+                    self._stacks[tick] = traceback.extract_stack(frame, limit=self.stack_limit)
+
+    def _record_block(self, blocked_at: float, unblocked_at: float, lag: float):
+        stack_summary = self._stacks.pop(self._tick, None)
+        self._stacks.clear()
+        stack = "".join(stack_summary.format()) if stack_summary else ""
+        self.blocks.append((lag, stack))
+        blocker = (
+            f"{stack_summary[-1].name} ({stack_summary[-1].filename}:{stack_summary[-1].lineno})"
+            if stack_summary else "an unknown callback"
+        )
+        logger.warning(f"The event loop was blocked for {lag * 1000:.1f}ms in {blocker}")
+        if self.tracer:
+            self.tracer.add_span("blocked", "event_loop", blocked_at, unblocked_at, track=self.TRACK,
+                                 lag_ms=round(lag * 1000, 3), stack=stack)
@@ -0,0 +1,82 @@
+import json
+import os
+from importlib.util import find_spec
+from pathlib import Path
+from typing import Any, ClassVar, Mapping, Optional
+
+from httpx import Limits, Timeout
+from pydantic import BaseModel
+from typing_extensions import Self
+
+
+class TransportProfile(BaseModel):
+    """
+    Pydantic schema for the HTTP transport settings of HTTPXClient: protocol, connection pool and keep-alive,
+    timeouts by phase and accepted content encodings.
+    Timeouts left None keep the per-attempt timeout of the retry policy, and accept_encoding left None keeps
+    the httpx default, every encoding it can decode.
+    HTTP/2 requires the optional h2 package, and the "br" encoding the optional brotli package.
+    """
+    ENV_PREFIX: ClassVar[str] = "TRANSPORT_"
+
+    http2: bool = False
+    max_connections: Optional[int] = 100
+    max_keepalive_connections: Optional[int] = 20
+    keepalive_expiry: Optional[float] = 5.0
+    connect_timeout: Optional[float] = None
+    read_timeout: Optional[float] = None
+    write_timeout: Optional[float] = None
+    pool_timeout: Optional[float] = None
+    accept_encoding: Optional[str] = None
+
+    @classmethod
+    def load(cls, config_path: Optional[Path] = None, environ: Optional[Mapping[str, str]] = None,
+             **defaults: Any) -> Self:
+        """
+        Loads the profile from the given defaults, overridden by a JSON config file, overridden by
+        the environment variables named by the field, e.g. TRANSPORT_HTTP2=1 or TRANSPORT_MAX_CONNECTIONS=20.
+
+        :param config_path: Optional JSON file of the profile fields, ignored when it does not exist.
+        :param environ: The environment variables, os.environ by default.
+        :param defaults: Default field values, e.g. pool limits matched to the consumer counts.
+        """
+        settings = dict(defaults)
+        if config_path and config_path.exists():
+            settings.update(json.loads(config_path.read_text()))
+        environ = os.environ if environ is None else environ
+        for field_name in cls.model_fields:
+            value = environ.get(f"{cls.ENV_PREFIX}{field_name.upper()}")
+            if value is not None:
+                settings[field_name] = value or None
+        return cls.model_validate(settings)
+
+    def client_kwargs(self) -> dict[str, Any]:
+        """The keyword arguments of httpx AsyncClient."""
+        if self.http2 and find_spec("h2") is None:
+            raise ImportError("HTTP/2 requires the h2 package")
+        if self.accept_encoding and "br" in self.accept_encoding and not self._has_brotli():
+            raise ImportError("The br content encoding requires the brotli package")
+        client_kwargs: dict[str, Any] = {
+            "http2": self.http2,
+            "limits": Limits(
+                max_connections=self.max_connections,
+                max_keepalive_connections=self.max_keepalive_connections,
+                keepalive_expiry=self.keepalive_expiry,
+            ),
+        }
+        if self.accept_encoding:
+            client_kwargs["headers"] = {"Accept-Encoding": self.accept_encoding}
+        return client_kwargs
+
+    def timeout(self, attempt_timeout: Timeout) -> Timeout:
+        """Returns the attempt timeout with the phases that the profile sets replaced."""
+        return Timeout(
+            connect=attempt_timeout.connect if self.connect_timeout is None else self.connect_timeout,
+            read=attempt_timeout.read if self.read_timeout is None else self.read_timeout,
+            write=attempt_timeout.write if self.write_timeout is None else self.write_timeout,
+            pool=attempt_timeout.pool if self.pool_timeout is None else self.pool_timeout,
+        )
+
+    @staticmethod
+    def _has_brotli() -> bool:
+        return find_spec("brotli") is not None or find_spec("brotlicffi") is not None
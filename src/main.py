@@ -1,17 +1,108 @@
+import json
 import logging
 from asyncio import run
+from contextlib import nullcontext
 from pathlib import Path
+from typing import Optional
 
-from src.handlers.image_downloader import ImageDownloader
-from src.handlers.output_writer import OutputWriter
+from src.handlers.image_downloader import FsyncPolicy, ImageDownloader
+from src.handlers.output_sinks import (
+    AdjectiveGroupsCSVSink,
+    CompositeOutputSink,
+    CSVOutputSink,
+    JSONLOutputSink,
+    ParquetOutputSink,
+    SQLiteOutputSink,
+)
 from src.handlers.async_http_client import HTTPXClient
+from src.handlers.byte_budget import ByteBudget
+from src.handlers.circuit_breaker import HostCircuitBreaker
+from src.handlers.durable_queue import MemoryQueueBackend, SQLiteQueueBackend
+from src.handlers.http_archive import ArchiveMode, HTTPArchive
+from src.handlers.http_cache import HTTPCache
+from src.handlers.image_store import ContentAddressedImageStore
+from src.handlers.metrics import MetricsServer, PipelineMetrics
+from src.handlers.rate_limiter import HostRateLimiter, RateLimit
+from src.handlers.retry_policy import RetryPolicy
+from src.handlers.tracing import EventLoopBlockMonitor, Tracer
+from src.handlers.transport_profile import TransportProfile
 from src.processors.animals_page_processor import AnimalsPageProcessor
+from src.processors.html_parsers.constants import ParserBackend
+from src.processors.html_parsers.table_specs import ANIMAL_TERMS_TABLE_SPEC
+from src.processors.incremental_snapshot import IncrementalSnapshot
+from src.processors.page_image_batch_resolver import PageImageBatchResolver
+from src.processors.parse_executor import ParseExecutor, ParseMode
+from src.processors.sharded_crawl import ShardedCrawl, ShardSettings
 
 # Set up logging configuration
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 logging.getLogger("httpx").setLevel(logging.WARNING)
 
+# Where the HTML parsing runs: inline on the event loop, in a thread pool or in a process pool.
+PARSE_MODE = ParseMode.PROCESS
+PARSER_BACKEND = ParserBackend.LXML
+
+# Requests per second and burst size of the page and image hosts.
+RATE_LIMITS = {
+    "en.wikipedia.org": RateLimit(requests_per_second=20, burst=20),
+    "upload.wikimedia.org": RateLimit(requests_per_second=20, burst=20),
+}
+
+# Number of page consumers and of image consumers.
+CONCURRENCY = 10
+
+# Resolve the animal images in batches through the MediaWiki API, a request per 50 pages. Otherwise each animal page
+# is fetched and only its head is read up to the og:image tag, that stage is then bounded by the byte budget and its
+# parsing is traced.
+PAGE_IMAGES_API = True
+
+# Persist the page and image queues in src/.queues.sqlite, so an interrupted run resumes its unfinished pages and
+# images. The queues are in-memory asyncio queues by default.
+DURABLE_QUEUES = False
+
+# Memory budget of the pages and images being fetched, parsed and written, shared by the page and image stages.
+# Each item reserves its Content-Length, or an estimate, so concurrency can be raised while memory stays bounded.
+BYTE_BUDGET_MB: Optional[int] = 256
+
+# Per-stage metrics, written to metrics.json at the end of the run.
+# Set METRICS_PORT to also serve them in the Prometheus text format at http://127.0.0.1:<port>/metrics.
+METRICS_ENABLED = True
+METRICS_PORT: Optional[int] = None
+
+# The animals and images are streamed into CSV, JSONL and SQLite files in the output directory.
+# Parquet output requires the optional pyarrow package.
+PARQUET_OUTPUT = False
+
+# Other tables of the animals list page, parsed in the same pass as the animals table and written to the outputs,
+# e.g. the young, female, male and collective noun terms of each animal. Not used by sharded crawls.
+LIST_PAGE_TABLES = [ANIMAL_TERMS_TABLE_SPEC]
+
+# Width in pixels of the Wikimedia Commons thumbnails downloaded instead of the full-resolution originals,
+# or None to download the originals.
+THUMBNAIL_WIDTH: Optional[int] = 640
+
+# Fetch only the animals that are new, changed or whose page revision moved since the last run, whose snapshot is
+# kept in the output directory. The outputs are still written from the whole table. Not used by sharded crawls.
+INCREMENTAL = True
+
+# Number of worker processes that crawl the animal pages and images, each with its own event loop and client.
+# The list page is parsed once and its rows are split between the shards by page URL, the rate limits are split too.
+# Sharded crawls keep their queues in memory and do not use the HTTP cache or the image store.
+SHARDS = 1
+
+# Record every response of the run in src/http_archive.bin, or replay a recorded run from it without any network
+# request, e.g. to measure the parsing and pipeline throughput. Recorded and replayed runs skip the HTTP cache,
+# replayed runs skip the rate limits too and can simulate a latency per request. Not used by sharded crawls.
+HTTP_ARCHIVE_MODE: Optional[ArchiveMode] = None
+REPLAY_LATENCY = 0.0
+
+# Trace each request's DNS and connect, time to first byte and body, the page parsing and the image writes,
+# and flag the callbacks that block the event loop longer than the threshold with their stack. The timeline is
+# written to src/trace.json, open it in https://ui.perfetto.dev or chrome://tracing. Shard workers are not traced.
+TRACING = False
+LOOP_BLOCK_THRESHOLD = 0.1
+
 
 async def main():
     """The main function of the application."""
@@ -20,24 +111,147 @@ async def main():
     current_dir = Path(__file__).parent
     tmp_directory = current_dir / "tmp"
     tmp_directory.mkdir(exist_ok=True)
+    output_directory = current_dir / "output"
+    output_directory.mkdir(exist_ok=True)
 
-    async with HTTPXClient() as client:
+    # Set up the HTTP client components.
+    http_cache = HTTPCache(cache_dir=current_dir / ".http_cache", max_size_bytes=1024 * 1024 * 1024)
+    rate_limiter = HostRateLimiter(default_limit=RateLimit(requests_per_second=10, burst=10), host_limits=RATE_LIMITS)
+    retry_policy = RetryPolicy(max_attempts=4, base_delay=0.5, max_delay=30.0)
+    circuit_breaker = HostCircuitBreaker(failure_threshold=5, recovery_timeout=30.0)
+    # The connection pool keeps a connection per page and image consumer alive. The defaults are overridden by
+    # src/transport.json and by TRANSPORT_<FIELD> environment variables, e.g. TRANSPORT_HTTP2=1 (requires h2).
+    transport_profile = TransportProfile.load(
+        current_dir / "transport.json",
+        max_connections=2 * CONCURRENCY,
+        max_keepalive_connections=2 * CONCURRENCY,
+        keepalive_expiry=30.0,
+        connect_timeout=5.0,
+        pool_timeout=30.0,
+    )
+    image_store = ContentAddressedImageStore(root_dir=current_dir / ".image_store")
+    metrics = PipelineMetrics() if METRICS_ENABLED else None
+    queue_backend = (
+        SQLiteQueueBackend(current_dir / ".queues.sqlite", metrics=metrics) if DURABLE_QUEUES
+        else MemoryQueueBackend(metrics)
+    )
+    byte_budget = ByteBudget(BYTE_BUDGET_MB * 1024 * 1024, metrics) if BYTE_BUDGET_MB else None
+    metrics_server = MetricsServer(metrics, port=METRICS_PORT) if metrics and METRICS_PORT else nullcontext()
+    tracer = Tracer() if TRACING else None
+    loop_block_monitor = EventLoopBlockMonitor(tracer, threshold=LOOP_BLOCK_THRESHOLD) if tracer else nullcontext()
+    http_archive = (
+        HTTPArchive(path=current_dir / "http_archive.bin", mode=HTTP_ARCHIVE_MODE, latency=REPLAY_LATENCY)
+        if HTTP_ARCHIVE_MODE else None
+    )
+    replay = HTTP_ARCHIVE_MODE == ArchiveMode.REPLAY
+    client = HTTPXClient(
+        # Archived runs skip the HTTP cache, a recorded 304 of a cached page could not be replayed.
+        cache=None if http_archive else http_cache,
+        rate_limiter=None if replay else rate_limiter,
+        retry_policy=retry_policy,
+        circuit_breaker=circuit_breaker,
+        metrics=metrics,
+        transport_profile=transport_profile,
+        http_archive=http_archive,
+        tracer=tracer,
+    )
+    incremental_snapshot = (
+        IncrementalSnapshot(client, output_directory, api_url=PageImageBatchResolver.API_URL)
+        if INCREMENTAL and SHARDS == 1 else None
+    )
+    output_sinks = [
+        CSVOutputSink(output_directory),
+        JSONLOutputSink(output_directory),
+        SQLiteOutputSink(output_directory / "animals.sqlite"),
+        # The grouped CSV and the adjective query index are derived from the streamed animals rows and written
+        # when the sink closes. The index is served by python -m src.handlers.adjective_query_server.
+        AdjectiveGroupsCSVSink(current_dir, index_path=output_directory / "adjectives.idx"),
+    ]
+    if PARQUET_OUTPUT:
+        output_sinks.append(ParquetOutputSink(output_directory))
+    if incremental_snapshot:
+        # Records the streamed rows of the next run's snapshot.
+        output_sinks.append(incremental_snapshot)
 
-        image_downloader = ImageDownloader(client, tmp_directory)
-        try:
-            animals_processor = await AnimalsPageProcessor.create(
-                client=client,
-                concurrency=10,
-                image_downloader=image_downloader,
-            )
-            await animals_processor.run()
-            await OutputWriter.write_adjectives_groups_to_csv(
-                dir_path=current_dir,
-                collateral_adjectives_groups=animals_processor.collateral_adjectives_groups,
+    try:
+        async with client, ParseExecutor(mode=PARSE_MODE, parser_backend=PARSER_BACKEND) as parse_executor, \
+                metrics_server, loop_block_monitor, CompositeOutputSink(output_sinks) as output_sink:
+
+            image_downloader = ImageDownloader(
+                client,
+                tmp_directory,
+                fsync_policy=FsyncPolicy.FILE,
+                max_image_size=50 * 1024 * 1024,
+                image_store=image_store,
+                metrics=metrics,
+                output_sink=output_sink,
+                thumbnail_width=THUMBNAIL_WIDTH,
+                byte_budget=byte_budget,
+                tracer=tracer,
             )
+            try:
+                if SHARDS > 1:
+                    sharded_crawl = ShardedCrawl(
+                        ShardSettings(
+                            concurrency=CONCURRENCY,
+                            destination_dir=tmp_directory,
+                            head_only_pages=not PAGE_IMAGES_API,
+                            page_images_api_url=PageImageBatchResolver.API_URL if PAGE_IMAGES_API else None,
+                            parser_backend=PARSER_BACKEND,
+                            default_rate_limit=rate_limiter.default_limit,
+                            host_rate_limits=RATE_LIMITS,
+                            retry_policy=retry_policy,
+                            transport_profile=transport_profile,
+                            fsync_policy=FsyncPolicy.FILE,
+                            max_image_size=50 * 1024 * 1024,
+                            thumbnail_width=THUMBNAIL_WIDTH,
+                            byte_budget_bytes=byte_budget.max_bytes if byte_budget else None,
+                        ),
+                        shards=SHARDS,
+                        metrics=metrics,
+                        output_sink=output_sink,
+                    )
+                    await sharded_crawl.run(client, parse_executor)
+                else:
+                    animals_processor = await AnimalsPageProcessor.create(
+                        client=client,
+                        concurrency=CONCURRENCY,
+                        image_downloader=image_downloader,
+                        parse_executor=parse_executor,
+                        head_only_pages=not PAGE_IMAGES_API,
+                        page_images_api_url=PageImageBatchResolver.API_URL if PAGE_IMAGES_API else None,
+                        stream_list_page=True,
+                        metrics=metrics,
+                        output_sink=output_sink,
+                        queue_backend=queue_backend,
+                        byte_budget=byte_budget,
+                        incremental_snapshot=incremental_snapshot,
+                        table_specs=LIST_PAGE_TABLES,
+                        tracer=tracer,
+                    )
+                    await animals_processor.run()
+                    queue_backend.clear()
+
+            except ConnectionError as e:
+                logger.error(f"Connection Error: {e}")
+                output_sink.fail()
+            finally:
+                # The blobs stored by a failed or interrupted run are indexed too, so the next run reuses them.
+                try:
+                    image_store.save_index()
+                finally:
+                    queue_backend.close()
 
-        except ConnectionError as e:
-            logger.error(f"Connection Error: {e}")
+        for host, host_stats in rate_limiter.stats().items():
+            logger.info(f"Rate limiter stats of {host}: {host_stats.model_dump()}")
+        if byte_budget:
+            logger.info(f"Byte budget stats: {byte_budget.stats().model_dump()}")
+        if metrics:
+            (current_dir / "metrics.json").write_text(json.dumps(metrics.summary(), indent=2))
+    finally:
+        # The trace of a failed or interrupted run is written too, it shows where the run was.
+        if tracer:
+            tracer.export(current_dir / "trace.json")
 
 
 if __name__ == "__main__":
@@ -0,0 +1,52 @@
+from array import array
+from collections.abc import Mapping
+from sys import intern
+from typing import Iterator
+
+
+class AdjectiveIndex(Mapping):
+    """
+    The collateral adjectives groups: a read-only mapping of each collateral adjective to its animal names.
+    Each animal name is stored once, and every group is an array of 32-bit name ids
+    instead of a list of references, so a group costs 4 bytes per animal.
+    """
+
+    def __init__(self):
+        self._names: list[str] = []
+        self._name_ids: dict[str, int] = {}
+        self._groups: dict[str, array] = {}
+
+    def add(self, collateral_adjective: str, animal_name: str):
+        """
+        Adds the animal to the group of the collateral adjective.
+
+        :param collateral_adjective: The collateral adjective.
+        :param animal_name: Name of the animal.
+        """
+        name_id = self._name_ids.get(animal_name)
+        if name_id is None:
+            name_id = self._name_ids[animal_name] = len(self._names)
+            self._names.append(intern(animal_name))
+        group = self._groups.get(collateral_adjective)
+        if group is None:
+            group = self._groups[intern(collateral_adjective)] = array("I")
+        group.append(name_id)
+
+    def group_ids(self, collateral_adjective: str) -> array:
+        """Returns the name ids of the adjective's animals, see name()."""
+        return self._groups[collateral_adjective]
+
+    def name(self, name_id: int) -> str:
+        return self._names[name_id]
+
+    def __getitem__(self, collateral_adjective: str) -> list[str]:
+        return [self._names[name_id] for name_id in self._groups[collateral_adjective]]
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._groups)
+
+    def __len__(self) -> int:
+        return len(self._groups)
+
+    def __contains__(self, collateral_adjective) -> bool:
+        return collateral_adjective in self._groups
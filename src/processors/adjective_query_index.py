@@ -0,0 +1,236 @@
+import mmap
+import os
+import struct
+import sys
+from array import array
+from pathlib import Path
+from typing import Final, Iterable, Mapping, Optional, Union
+
+# File layout: MAGIC, the SECTION_COUNT (offset, length) pairs of SECTION_HEADER, then the sections.
+# Every section but the strings one is an array of 32-bit unsigned integers in little-endian order.
+MAGIC: Final[bytes] = b"WAHADJ1\n"
+SECTION_HEADER: Final[struct.Struct] = struct.Struct("<II")
+SECTION_COUNT: Final[int] = 9
+STRINGS_SECTION: Final[int] = 8
+
+# Sections of each side of the index, the adjectives (0-3) and the animals (4-7): the offsets of the sorted
+# normalized keys and of the labels in the strings section, the offsets of each term's postings, and the postings,
+# i.e. the sorted term ids of the other side.
+KEY_OFFSETS, LABEL_OFFSETS, POSTING_OFFSETS, POSTINGS = range(4)
+ADJECTIVES_SIDE: Final[int] = 0
+ANIMALS_SIDE: Final[int] = 4
+
+
+def normalize_term(term: str) -> str:
+    """Returns the lookup key of an adjective or an animal name: case-folded, with its whitespace trimmed."""
+    return " ".join(term.split()).casefold()
+
+
+class _Terms:
+    """The terms of one side of the index while it is built: their keys, labels and postings."""
+
+    def __init__(self):
+        self.labels: dict[str, str] = {}
+        self.postings: dict[str, set[str]] = {}
+
+    def add(self, term: str, other_key: str) -> str:
+        key = normalize_term(term)
+        self.labels.setdefault(key, " ".join(term.split()))
+        self.postings.setdefault(key, set()).add(other_key)
+        return key
+
+    def sorted_keys(self) -> list[str]:
+        # Sorted by their UTF-8 bytes, the order that the lookups compare the stored keys in.
+        return sorted(self.labels, key=str.encode)
+
+
+def build_index(collateral_adjectives_groups: Mapping[str, Iterable[str]]) -> bytes:
+    """
+    Builds the query index of the collateral adjectives groups, see AdjectiveQueryIndex.
+    The adjectives and animal names are normalized (see normalize_term), empty ones and duplicates are dropped,
+    and each term is labelled by its first spelling.
+
+    :param collateral_adjectives_groups: Mapping of each collateral adjective to its animal names.
+    """
+    adjectives, animals = _Terms(), _Terms()
+    for collateral_adjective, animal_names in collateral_adjectives_groups.items():
+        if not normalize_term(collateral_adjective):
+            continue
+        for animal_name in animal_names:
+            if normalize_term(animal_name):
+                animal_key = animals.add(animal_name, normalize_term(collateral_adjective))
+                adjectives.add(collateral_adjective, animal_key)
+
+    strings = bytearray()
+    sections: list[Union[array, bytes]] = []
+    sorted_sides = [(adjectives, adjectives.sorted_keys()), (animals, animals.sorted_keys())]
+    for side, (terms, keys) in enumerate(sorted_sides):
+        other_ids = {key: term_id for term_id, key in enumerate(sorted_sides[1 - side][1])}
+        # Each string ends where the next one starts, the offsets end with the end of the last one.
+        key_offsets, label_offsets = array("I"), array("I")
+        for strings_of_keys, offsets in ((keys, key_offsets), ([terms.labels[key] for key in keys], label_offsets)):
+            for string in strings_of_keys:
+                offsets.append(len(strings))
+                strings += string.encode()
+            offsets.append(len(strings))
+        posting_offsets, postings = array("I", [0]), array("I")
+        for key in keys:
+            postings.extend(sorted(other_ids[other_key] for other_key in terms.postings[key]))
+            posting_offsets.append(len(postings))
+        sections.extend([key_offsets, label_offsets, posting_offsets, postings])
+    sections.append(bytes(strings))
+
+    payloads = [_little_endian(section) for section in sections]
+    header_size = len(MAGIC) + SECTION_COUNT * SECTION_HEADER.size
+    header, offset = bytearray(MAGIC), header_size
+    for payload in payloads:
+        header += SECTION_HEADER.pack(offset, len(payload))
+        # Each section starts at a multiple of 4 bytes, so it can be viewed as an array of integers.
+        offset += len(payload) + (-len(payload) % 4)
+    return bytes(header) + b"".join(payload + b"\0" * (-len(payload) % 4) for payload in payloads)
+
+
+def write_index(path: Path, collateral_adjectives_groups: Mapping[str, Iterable[str]]):
+    """Builds the query index of the collateral adjectives groups and atomically writes it to the path."""
+    tmp_path = path.with_name(f".{path.name}.part")
+    tmp_path.write_bytes(build_index(collateral_adjectives_groups))
+    os.replace(tmp_path, path)
+
+
+def _little_endian(section: Union[array, bytes]) -> bytes:
+    if isinstance(section, array) and sys.byteorder == "big":
+        section = array("I", section)
+        section.byteswap()
+    return section.tobytes() if isinstance(section, array) else section
+
+
+class AdjectiveQueryIndex:
+    """
+    A read-only query index of the collateral adjectives groups: the animals of an adjective, the adjectives of
+    an animal, and the adjectives and animals starting with a prefix, all by their normalized terms.
+    The index is read in place from its buffer, e.g. a memory-mapped index file, without being deserialized:
+    a lookup is a binary search over the sorted keys and a slice of the postings.
+    """
+
+    def __init__(self, buffer: Union[bytes, mmap.mmap]):
+        """
+        :param buffer: The index, as built by build_index().
+        """
+        if buffer[:len(MAGIC)] != MAGIC:
+            raise ValueError("Not an adjective query index")
+        self._buffer = buffer
+        self._view = memoryview(buffer)
+        self._sections = []
+        for section in range(SECTION_COUNT):
+            offset, length = SECTION_HEADER.unpack_from(buffer, len(MAGIC) + section * SECTION_HEADER.size)
+            section_view = self._view[offset:offset + length]
+            self._sections.append(section_view if section == STRINGS_SECTION else self._integers(section_view))
+        self._strings = self._sections[STRINGS_SECTION]
+
+    @classmethod
+    def load(cls, path: Path) -> "AdjectiveQueryIndex":
+        """Memory-maps the index file, only the pages that the lookups read are loaded."""
+        with open(path, "rb") as file:
+            buffer = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            return cls(buffer)
+        except ValueError:
+            buffer.close()
+            raise
+
+    @classmethod
+    def from_groups(cls, collateral_adjectives_groups: Mapping[str, Iterable[str]]) -> "AdjectiveQueryIndex":
+        return cls(build_index(collateral_adjectives_groups))
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def close(self):
+        for section in self._sections:
+            if isinstance(section, memoryview):
+                section.release()
+        self._view.release()
+        if isinstance(self._buffer, mmap.mmap):
+            self._buffer.close()
+
+    @property
+    def adjectives_count(self) -> int:
+        return len(self._sections[ADJECTIVES_SIDE + POSTING_OFFSETS]) - 1
+
+    @property
+    def animals_count(self) -> int:
+        return len(self._sections[ANIMALS_SIDE + POSTING_OFFSETS]) - 1
+
+    def animals(self, collateral_adjective: str) -> Optional[list[str]]:
+        """Returns the animal names of the collateral adjective, or None for an unknown adjective."""
+        return self._lookup(ADJECTIVES_SIDE, ANIMALS_SIDE, collateral_adjective)
+
+    def adjectives(self, animal_name: str) -> Optional[list[str]]:
+        """Returns the collateral adjectives of the animal, or None for an unknown animal."""
+        return self._lookup(ANIMALS_SIDE, ADJECTIVES_SIDE, animal_name)
+
+    def label(self, side: int, term: str) -> Optional[str]:
+        """Returns the spelling of the adjective (ADJECTIVES_SIDE) or animal (ANIMALS_SIDE) in the index."""
+        term_id = self._find(side, normalize_term(term).encode())
+        return None if term_id is None else self._string(side + LABEL_OFFSETS, term_id)
+
+    def search_adjectives(self, prefix: str, limit: int = 10) -> list[str]:
+        """Returns up to limit collateral adjectives starting with the prefix, in the order of their keys."""
+        return self._search(ADJECTIVES_SIDE, prefix, limit)
+
+    def search_animals(self, prefix: str, limit: int = 10) -> list[str]:
+        """Returns up to limit animal names starting with the prefix, in the order of their keys."""
+        return self._search(ANIMALS_SIDE, prefix, limit)
+
+    def _lookup(self, side: int, other_side: int, term: str) -> Optional[list[str]]:
+        term_id = self._find(side, normalize_term(term).encode())
+        if term_id is None:
+            return None
+        posting_offsets = self._sections[side + POSTING_OFFSETS]
+        postings = self._sections[side + POSTINGS][posting_offsets[term_id]:posting_offsets[term_id + 1]]
+        return [self._string(other_side + LABEL_OFFSETS, other_id) for other_id in postings]
+
+    def _search(self, side: int, prefix: str, limit: int) -> list[str]:
+        key_prefix = normalize_term(prefix).encode()
+        key_offsets = self._sections[side + KEY_OFFSETS]
+        results = []
+        for term_id in range(self._bisect_left(side, key_prefix), len(key_offsets) - 1):
+            if len(results) >= limit or not self._key(side, term_id).startswith(key_prefix):
+                break
+            results.append(self._string(side + LABEL_OFFSETS, term_id))
+        return results
+
+    def _find(self, side: int, key: bytes) -> Optional[int]:
+        term_id = self._bisect_left(side, key)
+        if term_id < len(self._sections[side + KEY_OFFSETS]) - 1 and self._key(side, term_id) == key:
+            return term_id
+        return None
+
+    def _bisect_left(self, side: int, key: bytes) -> int:
+        low, high = 0, len(self._sections[side + KEY_OFFSETS]) - 1
+        while low < high:
+            middle = (low + high) // 2
+            if self._key(side, middle) < key:
+                low = middle + 1
+            else:
+                high = middle
+        return low
+
+    def _key(self, side: int, term_id: int) -> bytes:
+        offsets = self._sections[side + KEY_OFFSETS]
+        return self._strings[offsets[term_id]:offsets[term_id + 1]].tobytes()
+
+    def _string(self, section: int, term_id: int) -> str:
+        offsets = self._sections[section]
+        return str(self._strings[offsets[term_id]:offsets[term_id + 1]], "utf-8")
+
+    @staticmethod
+    def _integers(section_view: memoryview) -> Union[memoryview, array]:
+        if sys.byteorder == "little":
+            return section_view.cast("I")
+        integers = array("I", section_view.tobytes())
+        integers.byteswap()
+        return integers
@@ -1,9 +1,18 @@
 from asyncio import Queue
+from contextlib import nullcontext
 from logging import getLogger
+from time import perf_counter
+from typing import Final, Optional
 
-from src.processors.html_parsers.animal_html_parser import AnimalHTMLParser
+from src.processors.html_parsers.animal_html_parser import AnimalHeadHTMLParser
+from src.processors.page_deduplicator import PageDeduplicator
+from src.processors.parse_executor import ParseExecutor, extract_image_url
 from src.handlers.async_http_client import HTTPXClient
-from src.common.schemas import PageQueueItem, ImageQueueItem
+from src.handlers.byte_budget import ByteBudget
+from src.handlers.durable_queue import PipelineQueue
+from src.handlers.metrics import PipelineMetrics
+from src.handlers.tracing import Tracer
+from src.common.schemas import DeadLetterItem, PageQueueItem, ImageQueueItem
 
 logger = getLogger(__name__)
 
@@ -12,36 +21,108 @@ class AnimalPageProcessor:
     """
     A class responsible for extracting data from animal wiki pages given animal's page URL.
     """
+    ESTIMATED_PAGE_SIZE: Final[int] = 256 * 1024
+    ESTIMATED_HEAD_SIZE: Final[int] = 64 * 1024
 
-    def __init__(self, client: HTTPXClient):
+    def __init__(self, client: HTTPXClient, parse_executor: Optional[ParseExecutor] = None, head_only: bool = False,
+                 metrics: Optional[PipelineMetrics] = None, byte_budget: Optional[ByteBudget] = None,
+                 tracer: Optional[Tracer] = None):
+        """
+        :param client: HTTPXClient's instance for making HTTP requests.
+        :param parse_executor: Executor running the page parsing, inline on the event loop by default.
+        :param head_only: Stream each page and stop reading once its head has been parsed.
+        :param metrics: Optional metrics of the page stage: service time and errors by class.
+        :param byte_budget: Optional memory budget shared with the other stages, each page reserves
+                            ESTIMATED_PAGE_SIZE (ESTIMATED_HEAD_SIZE when head only) before it is fetched,
+                            resized to its actual size, until it is parsed.
+        :param tracer: Optional tracer of the page parsing, a span per parsed page (per fed chunk when head only).
+        """
         self.client = client
+        self.parse_executor = parse_executor or ParseExecutor()
+        self.head_only = head_only
+        self.metrics = metrics
+        self.byte_budget = byte_budget
+        self.tracer = tracer
+        self.dead_letters: list[DeadLetterItem] = []
 
-    async def extract_animal_page_data(self, page_queue: Queue[PageQueueItem], image_queue: Queue[ImageQueueItem]):
+    async def extract_animal_page_data(self, page_queue: PipelineQueue, image_queue: Queue[ImageQueueItem],
+                                       page_deduplicator: Optional[PageDeduplicator] = None):
         """
         Asynchronously consumes page URLs from a queue, extracts relevant data from each page,
         and puts the extracted data into the image queue.
 
         :param page_queue: containing items (PageQueueItem) with the names and URLs of animal pages.
         :param image_queue: containing items (ImageQueueItem) with the extracted image URL and page name.
+        :param page_deduplicator: Optional run-scoped deduplicator, whose aliases of each page get its image too.
         """
         while True:
-            page_item = await page_queue.get()
-            page_name, page_url = page_item.page_name, page_item.page_url
+            item_id, page_item = await page_queue.get()
             try:
-                response = await self.client.get(url=page_url)
-                parser = AnimalHTMLParser.create(
-                    html_content=response.text, resource_url=page_url
-                )
-                image_url = parser.extract_image_url()
-                logger.info(f"Successfully processed {page_url}")
-                image_item = ImageQueueItem(image_url=image_url, image_name=page_name)
-                await image_queue.put(image_item)
+                await self._process_page_item(page_item, image_queue, page_deduplicator)
+            finally:
+                page_queue.task_done(item_id)
 
-            except ValueError as e:
-                logger.error(f"Error processing {page_name} page: {e}")
+    async def _process_page_item(self, page_item: PageQueueItem, image_queue: Queue[ImageQueueItem],
+                                 page_deduplicator: Optional[PageDeduplicator]):
+        """Extract the page image and queue it for the page animal and its aliases."""
+        page_name, page_url = page_item.page_name, page_item.page_url
+        image_url, error = None, None
+        started_at = perf_counter()
+        try:
+            image_url = await self.extract_image_url(page_url)
+            logger.info(f"Successfully processed {page_url}")
 
-            except ConnectionError as e:
-                logger.error(f"Error fetching {page_name} page: {e}")
+        except ValueError as e:
+            logger.error(f"Error processing {page_name} page: {e}")
+            error = e
 
-            finally:
-                page_queue.task_done()
+        except ConnectionError as e:
+            logger.error(f"Error fetching {page_name} page: {e}")
+            error = e
+
+        if self.metrics:
+            self.metrics.observe("stage_seconds", perf_counter() - started_at, stage="page")
+            if error:
+                self.metrics.record_error("page", error)
+
+        aliases = (
+            page_deduplicator.resolve_page(page_url, image_url, repr(error) if error else None)
+            if page_deduplicator else []
+        )
+        for image_name in [page_name, *aliases]:
+            if image_url:
+                await image_queue.put(ImageQueueItem(image_url=image_url, image_name=image_name))
+            else:
+                self._add_dead_letter(image_name, page_url, error)
+
+    async def extract_image_url(self, page_url: str) -> str:
+        """
+        Fetches the animal page and extracts its main image URL.
+
+        :param page_url: URL of the animal page.
+        :return: The image URL.
+        """
+        estimated_size = self.ESTIMATED_HEAD_SIZE if self.head_only else self.ESTIMATED_PAGE_SIZE
+        async with self.byte_budget.reserved(estimated_size) if self.byte_budget else nullcontext() as reservation:
+            if self.head_only:
+                head_parser = AnimalHeadHTMLParser(resource_url=page_url)
+                consumer = head_parser.feed
+                if self.tracer:
+                    consumer = self.tracer.traced(consumer, "parse", "parse", url=page_url)
+                await self.client.stream_until(url=page_url, consumer=consumer)
+                return head_parser.extract_image_url()
+
+            response = await self.client.get(url=page_url)
+            if reservation:
+                reservation.resize(len(response.content))
+            span = (
+                self.tracer.span("parse", "parse", url=page_url, mode=self.parse_executor.mode.value)
+                if self.tracer else nullcontext()
+            )
+            with span:
+                return await self.parse_executor.run(
+                    extract_image_url, response.content, page_url, self.parse_executor.parser_backend
+                )
+
+    def _add_dead_letter(self, page_name: str, page_url: str, error: Exception):
+        self.dead_letters.append(DeadLetterItem(stage="page", item_name=page_name, url=page_url, error=repr(error)))
@@ -1,14 +1,26 @@
 import logging
 from asyncio import Queue, create_task, gather
-from collections import defaultdict
 from typing_extensions import Self
-from typing import Final
+from typing import AsyncIterator, Final, Optional, Sequence, Union
 
 from src.handlers.image_downloader import ImageDownloader
 from src.processors.animal_page_processor import AnimalPageProcessor
 from src.processors.html_parsers.animals_html_parser import AnimalsHTMLParser
+from src.processors.adjective_index import AdjectiveIndex
+from src.processors.html_parsers.schemas import AnimalRecord
+from src.processors.html_parsers.table_specs import TableRow, TableSpec
+from src.processors.incremental_snapshot import IncrementalSnapshot
+from src.processors.page_deduplicator import PageDeduplicator
+from src.processors.page_image_batch_resolver import PageImageBatchResolver
+from src.processors.parse_executor import ParseExecutor, ParsedAnimalsTable, parse_list_page_tables
+from src.processors.streamed_animals_table import StreamedAnimalsTable
 from src.handlers.async_http_client import HTTPXClient
-from src.common.schemas import PageQueueItem, ImageQueueItem
+from src.handlers.byte_budget import ByteBudget
+from src.handlers.durable_queue import DurableQueue, MemoryQueueBackend, QueueBackend
+from src.handlers.metrics import PipelineMetrics
+from src.handlers.output_sinks import ANIMALS_TABLE, IMAGES_TABLE, RowSink
+from src.handlers.tracing import Tracer
+from src.common.schemas import DeadLetterItem, PageQueueItem, ImageQueueItem
 
 logger = logging.getLogger(__name__)
 
@@ -21,19 +33,26 @@ class AnimalsPageProcessor:
     queues and asynchronous programming.
     """
     RESOURCE_URL: Final[str] = "https://en.wikipedia.org/wiki/List_of_animal_names"
+    EXHAUSTED_ERROR: Final[str] = "Skipped, the item failed max_attempts times in previous runs"
 
-    def __init__(self, concurrency: int, parser: AnimalsHTMLParser,
-                 animal_page_processor: AnimalPageProcessor, image_downloader: ImageDownloader,
-                 page_queue: Queue[PageQueueItem], image_queue: Queue[ImageQueueItem]):
+    def __init__(self, concurrency: int, parser: Union[AnimalsHTMLParser, ParsedAnimalsTable, StreamedAnimalsTable],
+                 animal_page_processor: Union[AnimalPageProcessor, PageImageBatchResolver],
+                 image_downloader: ImageDownloader,
+                 page_queue: Queue[PageQueueItem], image_queue: Queue[ImageQueueItem],
+                 output_sink: Optional[RowSink] = None,
+                 incremental_snapshot: Optional[IncrementalSnapshot] = None):
         """
         Initializes the AnimalsPageProcessor with necessary components and queues.
 
         :param concurrency: Number of concurrent tasks to run.
-        :param parser: Parser for the animals page HTML content.
-        :param animal_page_processor: process single animal page content.
+        :param parser: Parser for the animals page HTML content, its already parsed table or its streamed table.
+        :param animal_page_processor: process single animal page content, or resolves page images in batches.
         :param image_downloader: Downloader for animal images.
         :param page_queue: Queue for animal page URLs.
         :param image_queue: Queue for animal image URLs.
+        :param output_sink: Optional streaming output, fed with each animals table row as it is parsed.
+        :param incremental_snapshot: Optional snapshot of the last run, only the animals that changed since then
+                                     are fetched, the others get their images table row from the snapshot.
         """
         self.concurrency = concurrency
         self.content_parser = parser
@@ -41,22 +60,70 @@ class AnimalsPageProcessor:
         self.image_downloader = image_downloader
         self.page_queue = page_queue
         self.image_queue = image_queue
-        self.collateral_adjectives_groups = defaultdict(list)
+        self.output_sink = output_sink
+        self.incremental_snapshot = incremental_snapshot
+        self.collateral_adjectives_groups = AdjectiveIndex()
+        self.queue_dead_letters: list[DeadLetterItem] = []
+        self.page_deduplicator = PageDeduplicator()
 
     @classmethod
-    async def create(cls, client: HTTPXClient, concurrency: int, image_downloader: ImageDownloader) -> Self:
+    async def create(cls, client: HTTPXClient, concurrency: int, image_downloader: ImageDownloader,
+                     parse_executor: Optional[ParseExecutor] = None, head_only_pages: bool = False,
+                     page_images_api_url: Optional[str] = None, stream_list_page: bool = False,
+                     resource_url: str = RESOURCE_URL, metrics: Optional[PipelineMetrics] = None,
+                     output_sink: Optional[RowSink] = None, queue_backend: Optional[QueueBackend] = None,
+                     parsed_rows: Optional[list[AnimalRecord]] = None,
+                     byte_budget: Optional[ByteBudget] = None,
+                     incremental_snapshot: Optional[IncrementalSnapshot] = None,
+                     table_specs: Sequence[TableSpec] = (), tracer: Optional[Tracer] = None) -> Self:
         """
         Class method to create an instance of AnimalsPageProcessor.
 
         :param client: HTTP client for making requests.
         :param concurrency: Number of concurrent tasks.
         :param image_downloader: Downloader for animal images.
+        :param parse_executor: Executor running the HTML parsing, inline on the event loop by default.
+        :param head_only_pages: Read only the head of each animal page, see AnimalPageProcessor.
+        :param page_images_api_url: When set, the animal images are resolved in batches through this
+                                    MediaWiki API endpoint instead of fetching every animal page.
+        :param stream_list_page: Parse the animals list page while it is downloaded, during run(),
+                                 instead of fetching and parsing it upfront.
+        :param resource_url: URL of the animals list page, e.g. of a local server in the benchmarks.
+        :param metrics: Optional metrics of the stages, their queues are then metered too.
+        :param output_sink: Optional streaming output of the animals table rows.
+        :param queue_backend: Creates the page and image queues, in-memory (and metered with metrics) by default.
+                              With a durable backend, the unfinished items of a previous run are resumed.
+        :param parsed_rows: Rows of the animals table that were already parsed, e.g. a shard of a sharded crawl.
+                            The list page is then not fetched.
+        :param byte_budget: Optional memory budget of the fetched pages, shared with the image downloader.
+        :param incremental_snapshot: Optional snapshot of the last run, see IncrementalSnapshot.
+                                     It must be one of the sinks of output_sink too.
+        :param table_specs: Specs of the other tables of the list page, e.g. ANIMAL_TERMS_TABLE_SPEC. They are
+                            parsed in the same pass as the animals table and their rows are fed to output_sink.
+        :param tracer: Optional tracer of the animal pages parsing, see AnimalPageProcessor.
         :return: An instance of AnimalsPageProcessor.
         """
-        html_content = await cls._fetch_resource_content(client)
-        parser = AnimalsHTMLParser.create(html_content=html_content, resource_url=cls.RESOURCE_URL)
-        animal_page_processor = AnimalPageProcessor(client)
-        return cls(concurrency, parser, animal_page_processor, image_downloader, Queue(concurrency), Queue(concurrency))
+        parse_executor = parse_executor or ParseExecutor()
+        if parsed_rows is not None:
+            parser = ParsedAnimalsTable(parsed_rows)
+        elif stream_list_page:
+            parser = StreamedAnimalsTable(client, resource_url, table_specs)
+        else:
+            html_content = await cls._fetch_resource_content(client, resource_url)
+            rows, table_rows = await parse_executor.run(
+                parse_list_page_tables, html_content, resource_url, parse_executor.parser_backend, table_specs
+            )
+            parser = ParsedAnimalsTable(rows, table_rows)
+        if page_images_api_url:
+            animal_page_processor = PageImageBatchResolver(client, api_url=page_images_api_url, metrics=metrics)
+        else:
+            animal_page_processor = AnimalPageProcessor(client, parse_executor, head_only=head_only_pages,
+                                                        metrics=metrics, byte_budget=byte_budget, tracer=tracer)
+        queue_backend = queue_backend or MemoryQueueBackend(metrics)
+        page_queue = queue_backend.queue("page", PageQueueItem, concurrency)
+        image_queue = queue_backend.queue("image", ImageQueueItem, concurrency)
+        return cls(concurrency, parser, animal_page_processor, image_downloader, page_queue, image_queue,
+                   output_sink=output_sink, incremental_snapshot=incremental_snapshot)
 
     async def run(self):
         """
@@ -64,39 +131,160 @@ class AnimalsPageProcessor:
         """
         await self._activate_processor_consumers()
         producers = [create_task(self._process_animals_wiki_page())]
+        producers.extend(create_task(queue.resume()) for queue in (self.page_queue, self.image_queue)
+                         if isinstance(queue, DurableQueue))
         await gather(*producers)
+        if isinstance(self.image_queue, DurableQueue):
+            # The images that interrupted runs saved are output again, once their animals rows are.
+            image_rows = self.image_queue.finished_results()
+            if self.output_sink:
+                for image_row in image_rows:
+                    await self.output_sink.add(IMAGES_TABLE, image_row)
         await self.page_queue.join()
         await self.image_queue.join()
+        if isinstance(self.image_queue, DurableQueue):
+            for image_item in self.image_queue.pop_exhausted_items():
+                self.queue_dead_letters.append(DeadLetterItem(
+                    stage="image", item_name=image_item.image_name, url=image_item.image_url, error=self.EXHAUSTED_ERROR
+                ))
+        if self.output_sink:
+            await self.output_sink.flush()
+        self._report_dead_letters()
+        self._report_saved_fetches()
+
+    @property
+    def dead_letters(self) -> list[DeadLetterItem]:
+        """Items of the page and image stages that failed and were dropped."""
+        return self.animal_page_processor.dead_letters + self.image_downloader.dead_letters + self.queue_dead_letters
 
     async def _process_animals_wiki_page(self):
         """
-        Builds the collateral adjectives groups dictionary and puts animal page URLs into the page queue.
+        Builds the collateral adjectives groups index and puts animal page URLs into the page queue.
+        The rows of the other tables of the list page are fed to the output sink.
+        With an incremental snapshot, the rows are queued in batches once their page revisions are checked, so the
+        recorded revision of a page is never newer than its fetch. The batches are checked while the list page is
+        still read.
         """
-        for animal_info in self.content_parser.parse_animal_table():
-            for collateral_adjective in animal_info.collateral_adjectives:
-                self.collateral_adjectives_groups[collateral_adjective].append(animal_info.name)
-            page_item = PageQueueItem(page_url=animal_info.page_url, page_name=animal_info.name)
+        unchecked_rows = []
+        revision_checks = []
+        try:
+            async for table, animal_info in self._iter_table_rows():
+                if table != ANIMALS_TABLE:
+                    if self.output_sink:
+                        await self.output_sink.add(table, animal_info.model_dump())
+                    continue
+                for collateral_adjective in animal_info.collateral_adjectives:
+                    self.collateral_adjectives_groups.add(collateral_adjective, animal_info.name)
+                if self.output_sink:
+                    await self.output_sink.add(ANIMALS_TABLE, {
+                        "name": animal_info.name,
+                        "page_url": animal_info.page_url,
+                        "collateral_adjectives": list(animal_info.collateral_adjectives),
+                    })
+                if self.incremental_snapshot:
+                    unchecked_rows.append(animal_info)
+                    if len(unchecked_rows) >= self.incremental_snapshot.CHECK_BATCH_SIZE:
+                        revision_checks.append(create_task(self._queue_changed_animals(unchecked_rows)))
+                        unchecked_rows = []
+                else:
+                    await self._queue_animal(animal_info)
+            if unchecked_rows:
+                revision_checks.append(create_task(self._queue_changed_animals(unchecked_rows)))
+            await gather(*revision_checks)
+        finally:
+            for revision_check in revision_checks:
+                revision_check.cancel()
+
+    async def _queue_changed_animals(self, rows: list[AnimalRecord]):
+        """Queues the animals that changed since the snapshot, and outputs the saved images of the others."""
+        await self.incremental_snapshot.check_revisions(rows)
+        for animal_info in rows:
+            image_row = self.incremental_snapshot.reused_image_row(animal_info)
+            if image_row is None:
+                await self._queue_animal(animal_info)
+            elif self.output_sink:
+                await self.output_sink.add(IMAGES_TABLE, image_row)
+
+    async def _queue_animal(self, animal_info: AnimalRecord):
+        page_item = PageQueueItem(page_url=animal_info.page_url, page_name=animal_info.name)
+        if self.page_deduplicator.claim_page(page_item):
             await self.page_queue.put(page_item)
+            if isinstance(self.page_queue, DurableQueue):
+                for exhausted_item in self.page_queue.pop_exhausted_items():
+                    self._add_page_dead_letters(exhausted_item, self.EXHAUSTED_ERROR)
+        elif image_item := self.page_deduplicator.resolved_image_item(page_item):
+            await self.image_queue.put(image_item)
+        elif page_error := self.page_deduplicator.failed_page_error(page_item):
+            # A late duplicate of a page that already failed.
+            self._add_queue_dead_letter(page_item.page_name, page_item.page_url, page_error)
+
+    def _add_page_dead_letters(self, page_item: PageQueueItem, error: str):
+        """Dead-letters a page that is not fetched, and its aliases."""
+        aliases = self.page_deduplicator.resolve_page(page_item.page_url, None, error)
+        for page_name in [page_item.page_name, *aliases]:
+            self._add_queue_dead_letter(page_name, page_item.page_url, error)
+
+    def _add_queue_dead_letter(self, page_name: str, page_url: str, error: str):
+        self.queue_dead_letters.append(DeadLetterItem(stage="page", item_name=page_name, url=page_url, error=error))
+
+    async def _iter_table_rows(self) -> AsyncIterator[TableRow]:
+        """
+        Iterates the animals table rows and the rows of the other tables of the list page,
+        a streamed table yields them while the list page downloads.
+        """
+        if isinstance(self.content_parser, StreamedAnimalsTable):
+            async for table_row in self.content_parser.aiter_tables():
+                yield table_row
+        else:
+            for animal_info in self.content_parser.parse_animal_table():
+                yield TableRow(ANIMALS_TABLE, animal_info)
+            if isinstance(self.content_parser, ParsedAnimalsTable):
+                for table_row in self.content_parser.table_rows:
+                    yield table_row
+
+    def _report_dead_letters(self):
+        """
+        Logs the items that failed, so they can be fixed or re-run.
+        """
+        dead_letters = self.dead_letters
+        if not dead_letters:
+            logger.info("All pipeline items were processed successfully.")
+            return
+        logger.warning(f"{len(dead_letters)} pipeline items failed:")
+        for dead_letter in dead_letters:
+            logger.warning(f"[{dead_letter.stage}] {dead_letter.item_name} ({dead_letter.url}): {dead_letter.error}")
+
+    def _report_saved_fetches(self):
+        """
+        Logs how many fetches the run-scoped deduplication and the client request coalescing saved.
+        """
+        logger.info(
+            f"Fetches saved: {self.page_deduplicator.page_fetches_saved} pages, "
+            f"{self.image_downloader.image_fetches_saved} images, "
+            f"{self.animal_page_processor.client.coalesced_requests} coalesced requests."
+        )
 
     async def _activate_processor_consumers(self):
         """
         Activates the consumers for the page and image queues.
         """
-        consumers = [create_task(self.animal_page_processor.extract_animal_page_data(self.page_queue, self.image_queue))
+        consumers = [create_task(self.animal_page_processor.extract_animal_page_data(self.page_queue, self.image_queue,
+                                                                                     self.page_deduplicator))
                      for _ in range(self.concurrency)]
         consumers.extend(create_task(self.image_downloader.download_image_consumer(self.image_queue))
                          for _ in range(self.concurrency))
 
     @classmethod
-    async def _fetch_resource_content(cls, client: HTTPXClient):
+    async def _fetch_resource_content(cls, client: HTTPXClient, resource_url: str = RESOURCE_URL):
         """
         Fetches the content of the Wikipedia resource page.
 
         :param client: HTTP client for making requests.
+        :param resource_url: URL of the Wikipedia resource page.
         :return: The content of the Wikipedia page.
         """
-        response = await client.get(url=cls.RESOURCE_URL)
-        logger.info(f"Successfully fetched: {cls.RESOURCE_URL}")
+        response = await client.get(url=resource_url)
+        logger.info(f"Successfully fetched: {resource_url}")
         return response.content
 
 
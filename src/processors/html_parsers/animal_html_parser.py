@@ -1,7 +1,12 @@
+from typing import Optional
+from urllib.parse import urljoin
+
 from bs4 import BeautifulSoup, SoupStrainer
+from lxml.etree import HTMLPullParser, _Element
 from typing_extensions import Self
 
-from src.processors.html_parsers.base_html_parser import BaseHTMLParser
+from src.processors.html_parsers.base_html_parser import BaseHTMLParser, LxmlHTMLParserMixin
+from src.processors.html_parsers.constants import ParserBackend
 
 
 class AnimalHTMLParser(BaseHTMLParser):
@@ -20,7 +25,68 @@ class AnimalHTMLParser(BaseHTMLParser):
             raise ValueError(f"Failed to find image url at {self.resource_url}") from e
 
     @classmethod
-    def create(cls, html_content, resource_url) -> Self:
+    def create(cls, html_content, resource_url, backend: ParserBackend = ParserBackend.BEAUTIFULSOUP) -> Self:
+        if backend == ParserBackend.LXML:
+            return LxmlAnimalHTMLParser.create(html_content=html_content, resource_url=resource_url)
         strainer = SoupStrainer(["meta"])
         soup = BeautifulSoup(html_content, "lxml", parse_only=strainer)
         return cls(soup=soup, resource_url=resource_url)
+
+
+class LxmlAnimalHTMLParser(LxmlHTMLParserMixin, AnimalHTMLParser):
+    """This parser reference parser to https://en.wikipedia.org/wiki/<animal_page_name> using the lxml tree."""
+
+    def __init__(self, tree: _Element, resource_url: str):
+        super().__init__(soup=None, resource_url=resource_url)
+        self.tree = tree
+
+    def extract_image_url(self):
+        """Extract the main image url of the page resource."""
+        image_urls = self.tree.xpath('(//meta[@property="og:image"])[1]/@content')
+        if not image_urls:
+            raise ValueError(f"Failed to find image url at {self.resource_url}")
+        return self._get_full_url(image_urls[0])
+
+    @classmethod
+    def create(cls, html_content, resource_url, backend: ParserBackend = ParserBackend.LXML) -> Self:
+        return cls(tree=cls._parse_tree(html_content), resource_url=resource_url)
+
+
+class AnimalHeadHTMLParser:
+    """
+    An incremental parser of https://en.wikipedia.org/wiki/<animal_page_name> that only reads the page head.
+    It is fed with the response chunks and reports when the og:image meta tag is found or the head is over,
+    so the rest of the page does not have to be downloaded.
+    """
+
+    def __init__(self, resource_url: str):
+        self.resource_url = resource_url
+        self._pull_parser = HTMLPullParser(events=("start", "end"))
+        self._image_url: Optional[str] = None
+        self._is_done = False
+
+    def feed(self, chunk: bytes) -> bool:
+        """
+        Feeds the next response chunk to the parser.
+
+        :param chunk: The next bytes of the page.
+        :return: True once the parser does not need more content.
+        """
+        if self._is_done:
+            return True
+        self._pull_parser.feed(chunk)
+        for event, element in self._pull_parser.read_events():
+            if event == "start" and element.tag == "meta" and element.get("property") == "og:image":
+                self._image_url = element.get("content")
+                self._is_done = True
+            elif (event == "end" and element.tag == "head") or (event == "start" and element.tag == "body"):
+                self._is_done = True
+            if self._is_done:
+                break
+        return self._is_done
+
+    def extract_image_url(self) -> str:
+        """Extract the main image url of the page resource."""
+        if not self._image_url:
+            raise ValueError(f"Failed to find image url at {self.resource_url}")
+        return urljoin(self.resource_url, self._image_url)
@@ -1,16 +1,14 @@
 import logging
-from typing import Iterator, Optional
+from typing import Any, Iterator, Optional, Sequence
 
 from bs4 import BeautifulSoup, SoupStrainer, Tag
-from pydantic import ValidationError
+from lxml.etree import HTMLPullParser, _Element
 from typing_extensions import Self
 
-from src.processors.html_parsers.base_html_parser import BaseHTMLParser
-from src.processors.html_parsers.constants import (
-    AnimalsTableHeaders,
-    AnimalsTableHTMLSetting,
-)
-from src.processors.html_parsers.schemas import ParsedAnimalData
+from src.processors.html_parsers.base_html_parser import BaseHTMLParser, LxmlHTMLParserMixin
+from src.processors.html_parsers.constants import ListPageTables, ParserBackend
+from src.processors.html_parsers.schemas import AnimalRecord
+from src.processors.html_parsers.table_specs import ANIMALS_TABLE_SPEC, RowCells, TableRow, TableSpec
 
 
 logger = logging.getLogger(__name__)
@@ -25,122 +23,330 @@ class AnimalsHTMLParser(BaseHTMLParser):
         super().__init__(soup, resource_url)
 
     @classmethod
-    def create(cls, html_content, resource_url) -> Self:
+    def create(cls, html_content, resource_url, backend: ParserBackend = ParserBackend.BEAUTIFULSOUP) -> Self:
+        if backend == ParserBackend.LXML:
+            return LxmlAnimalsHTMLParser.create(html_content=html_content, resource_url=resource_url)
         strainer = SoupStrainer(["span", "table"])
         soup = BeautifulSoup(html_content, "lxml", parse_only=strainer)
         return cls(soup=soup, resource_url=resource_url)
 
-    def parse_animal_table(self) -> Iterator[ParsedAnimalData]:
+    def parse_animal_table(self) -> Iterator[AnimalRecord]:
         """Parse the html animal table."""
-        table = self._get_table(
-            span_id=AnimalsTableHTMLSetting.SPAN_ID,
-            table_class=AnimalsTableHTMLSetting.TABLE_CLASS,
-        )
-        if table:
+        for table_row in self.parse_tables([ANIMALS_TABLE_SPEC]):
+            yield table_row.row
+
+    def parse_tables(self, table_specs: Sequence[TableSpec]) -> Iterator[TableRow]:
+        """
+        Parse the tables of the table specs with a single walk over the page's spans and tables,
+        each table's rows are walked once whatever the number of its specs.
+
+        :param table_specs: The specs of the extracted tables.
+        :return: The typed rows of each spec, with the spec name.
+        """
+        tables = self._find_tables(table_specs)
+        found_specs = [table_spec for _, specs in tables for table_spec in specs]
+        for table_spec in table_specs:
+            if table_spec not in found_specs:
+                self._report_missing_table(table_spec)
+
+        for table, specs in tables:
             table_headers = self._get_table_headers(table)
-            self._validate_animal_table_headers(table_headers)
+            specs = self._validate_table_headers(specs, table_headers)
+            for row in self._get_table_rows(table):
+                yield from self._parse_table_row(self._get_row_cells(row), table_headers, specs)
 
-            for parsed_row in self._parse_animal_table_rows(table, table_headers):
-                yield parsed_row
+    def _find_tables(self, table_specs: Sequence[TableSpec]) -> list[tuple[Any, list[TableSpec]]]:
+        """
+        Find the table of each spec, the first one of its class that appears after its span tag,
+        and return the found tables in the page order, with their specs.
+        """
+        waiting_specs: list[TableSpec] = []
+        unseen_specs = list(table_specs)
+        tables = []
+        for element in self._iter_spans_and_tables():
+            if not unseen_specs and not waiting_specs:
+                break
+            if self._get_tag_name(element) == "span":
+                span_id = element.get("id")
+                waiting_specs.extend(table_spec for table_spec in unseen_specs if table_spec.span_id == span_id)
+                unseen_specs = [table_spec for table_spec in unseen_specs if table_spec.span_id != span_id]
+            else:
+                table_class = self._get_table_class(element)
+                specs = [table_spec for table_spec in waiting_specs if table_spec.table_class == table_class]
+                if specs:
+                    tables.append((element, specs))
+                    waiting_specs = [table_spec for table_spec in waiting_specs if table_spec not in specs]
+        return tables
 
-        else:
-            raise ValueError(
-                f"Failed to find the animals table at {self.resource_url}."
-            )
+    def _report_missing_table(self, table_spec: TableSpec):
+        if table_spec.required:
+            raise ValueError(f"Failed to find the {table_spec.name} table at {self.resource_url}.")
+        logger.warning(f"Skipping the {table_spec.name} table, it was not found at {self.resource_url}.")
 
     @classmethod
-    def _validate_animal_table_headers(cls, table_headers: dict[str, int]) -> None:
-        """Validates animal table headers."""
-        missing_headers = {
-            AnimalsTableHeaders.ANIMAL,
-            AnimalsTableHeaders.COLLATERAL_ADJECTIVE,
-        }.difference(table_headers)
-
-        if len(missing_headers) > 0:
-            raise ValueError(
-                f"The following table headers are missing: {','.join(missing_headers)}\n"
-            )
-
-    def _get_table(self, span_id: str, table_class: str) -> Optional[Tag]:
-        """Find and return table that appear after specific span tag and by table class value."""
-        span_tag = self.soup.find("span", id=span_id)
-        return span_tag.find_next("table", {"class": table_class}) if span_tag else None
+    def _validate_table_headers(cls, table_specs: list[TableSpec], table_headers: dict[str, int]) -> list[TableSpec]:
+        """Validates the table headers of each spec, and returns the specs whose headers are all present."""
+        valid_specs = []
+        for table_spec in table_specs:
+            missing_headers = table_spec.required_headers.difference(table_headers)
+            if not missing_headers:
+                valid_specs.append(table_spec)
+            elif table_spec.required:
+                raise ValueError(
+                    f"The following table headers are missing: {','.join(missing_headers)}\n"
+                )
+            else:
+                logger.warning(f"Skipping the {table_spec.name} table, its headers are missing: "
+                               f"{','.join(missing_headers)}")
+        return valid_specs
+
+    def _iter_spans_and_tables(self) -> Iterator[Tag]:
+        """Iterate the span and table tags in the page order, lazily so the walk stops once every table is found."""
+        return (
+            element for element in self.soup.descendants
+            if isinstance(element, Tag) and element.name in ("span", "table")
+        )
+
+    @staticmethod
+    def _get_tag_name(element: Tag) -> str:
+        return element.name
+
+    @staticmethod
+    def _get_table_class(table: Tag) -> str:
+        return " ".join(table.get("class") or [])
 
     def _get_table_headers(self, table: Tag) -> dict[str, int]:
-        """Map table headers to their indices."""
-        headers = [
-            header.get_text(strip=True)
-            for header in table.find_next("tr").find_all("th")
-        ]
+        """Map table headers, without their <sup> references, to their indices."""
+        headers = []
+        for header in table.find_next("tr").find_all("th"):
+            for sup in header.find_all("sup"):
+                sup.decompose()
+            headers.append(header.get_text(strip=True))
         return dict(zip(headers, range(len(headers))))
 
-    def _extract_animal_collateral_adjectives(
-        self, cells: list[Tag], table_headers: dict
-    ) -> Optional[list[str]]:
-        """Extract collateral adjectives values, without references."""
-        collateral_adjectives_cell = cells[
-            table_headers[AnimalsTableHeaders.COLLATERAL_ADJECTIVE]
-        ]
+    def _get_table_rows(self, table: Tag) -> list[Tag]:
+        """Return the table rows, without the headers row."""
+        return table.find_all("tr")[1:]
 
-        # Remove references
-        for sup in collateral_adjectives_cell.find_all("sup"):
+    def _get_row_cells(self, row: Tag) -> list[Tag]:
+        return row.find_all("td")
+
+    def _get_text_without_references(self, cell: Tag) -> str:
+        """Return the cell text, its strings separated by commas, without the <sup> references."""
+        for sup in cell.find_all("sup"):
             sup.decompose()
+        return cell.get_text(separator=",")
+
+    def _get_first_link(self, cell: Tag) -> tuple[Optional[str], Optional[str]]:
+        """Return the href and title of the first link in the cell."""
+        a_tag = cell.find("a")
+        return a_tag.get("href"), a_tag.get("title")
 
-        # Extract adjectives
-        collateral_adjectives = collateral_adjectives_cell.get_text(
-            separator=","
-        ).split(",")
-
-        if collateral_adjectives[0] not in ["—", ""]:
-            # collateral adjectives' cell is not empty
-            return collateral_adjectives
-
-    def _extract_animal_info(
-        self, cells: list[Tag], table_headers: dict[str, int]
-    ) -> tuple[Optional[str], Optional[str]]:
-        animal_cell = cells[table_headers[AnimalsTableHeaders.ANIMAL]]
-        try:
-            animal_a_tag = animal_cell.find("a")
-            animal_page_url, animal_name = self._get_full_url(
-                animal_a_tag.get("href")
-            ), animal_a_tag.get("title")
-            return animal_page_url, animal_name
-
-        except AttributeError:
-            logger.error(
-                f"Failed to extract animal name and URL from the content: {animal_cell}"
-            )
-
-    def _parse_animal_row(
-        self, row: Tag, table_headers: dict[str, int]
-    ) -> Optional[ParsedAnimalData]:
-        """Parse row cells based on table's headers mapping."""
-        cells = row.find_all("td")
-
-        if len(cells) == len(table_headers):
-            animal_page_url, animal_name = self._extract_animal_info(
-                cells, table_headers
-            )
-            adjectives = self._extract_animal_collateral_adjectives(
-                cells, table_headers
-            )
+    def _parse_table_row(self, cells: list, table_headers: dict[str, int],
+                         table_specs: list[TableSpec]) -> Iterator[TableRow]:
+        """Parse the row cells of each spec, based on table's headers mapping."""
+        if len(cells) != len(table_headers):
+            return
+        row_cells = RowCells(self, cells, table_headers)
+        for table_spec in table_specs:
+            values = {field_name: column.extract(row_cells) for field_name, column in table_spec.columns.items()}
             try:
-                return ParsedAnimalData(
-                    page_url=animal_page_url,
-                    name=animal_name,
-                    collateral_adjectives=adjectives,
-                )
+                yield TableRow(table_spec.name, table_spec.row_model(**values))
+
+            except ValueError:
+                logger.error(f"Row {values.get('name')} of the {table_spec.name} table has missing arguments")
+
+
+class LxmlAnimalsHTMLParser(LxmlHTMLParserMixin, AnimalsHTMLParser):
+    """
+    This parser reference parser to "https://en.wikipedia.org/wiki/List_of_animal_names",
+    it walks the lxml tree directly instead of a BeautifulSoup tree and yields the same rows.
+    """
+
+    def __init__(self, tree: _Element, resource_url: str):
+        super().__init__(soup=None, resource_url=resource_url)
+        self.tree = tree
+
+    @classmethod
+    def create(cls, html_content, resource_url, backend: ParserBackend = ParserBackend.LXML) -> Self:
+        return cls(tree=cls._parse_tree(html_content), resource_url=resource_url)
+
+    def _iter_spans_and_tables(self) -> Iterator[_Element]:
+        return self.tree.iter("span", "table")
+
+    @staticmethod
+    def _get_tag_name(element: _Element) -> str:
+        return element.tag
+
+    @staticmethod
+    def _get_table_class(table: _Element) -> str:
+        return " ".join((table.get("class") or "").split())
+
+    def _get_table_headers(self, table: _Element) -> dict[str, int]:
+        headers_row = next(table.iter("tr"), None)
+        headers = [
+            self._get_header_text(header) for header in (headers_row.iter("th") if headers_row is not None else [])
+        ]
+        return dict(zip(headers, range(len(headers))))
+
+    def _get_header_text(self, header: _Element) -> str:
+        """Return the header text without its <sup> references."""
+        return "".join(text.strip() for text in self._iter_text(header, skipped_tags=self.REFERENCE_TAGS))
+
+    def _get_table_rows(self, table: _Element) -> list[_Element]:
+        return list(table.iter("tr"))[1:]
+
+    def _get_row_cells(self, row: _Element) -> list[_Element]:
+        return list(row.iter("td"))
+
+    def _get_text_without_references(self, cell: _Element) -> str:
+        return ",".join(self._iter_text(cell, skipped_tags=self.REFERENCE_TAGS))
+
+    def _get_first_link(self, cell: _Element) -> tuple[Optional[str], Optional[str]]:
+        a_element = next(cell.iter("a"), None)
+        return a_element.get("href"), a_element.get("title")
+
+
+class _StreamedTable:
+    """A table of table specs found by the streaming parser, and its headers once its first row is complete."""
+
+    def __init__(self, element: _Element, table_specs: list[TableSpec]):
+        self.element = element
+        self.table_specs = table_specs
+        self.table_headers: Optional[dict[str, int]] = None
+
+
+class StreamingAnimalsHTMLParser(LxmlAnimalsHTMLParser):
+    """
+    An incremental parser of "https://en.wikipedia.org/wiki/List_of_animal_names".
+    It is fed with the page chunks while they are downloaded and returns each table row as soon as it is complete.
+    Parsed rows and the tables that no spec reads are cleared, so memory does not grow with the page.
+    """
+
+    def __init__(self, resource_url: str, table_specs: Sequence[TableSpec] = (ANIMALS_TABLE_SPEC,)):
+        """
+        :param resource_url: URL of the animals list page.
+        :param table_specs: The specs of the extracted tables, the animals table by default.
+        """
+        super().__init__(tree=None, resource_url=resource_url)
+        self.table_specs = list(table_specs)
+        self._pull_parser = HTMLPullParser(
+            events=("start", "end"), tag=("span", "table", "tr"), encoding="utf-8"
+        )
+        self._unseen_specs = list(table_specs)
+        self._waiting_specs: list[TableSpec] = []
+        self._tables: list[_StreamedTable] = []
+        self._open_tables = 0
+        self._done_specs = 0
+
+    @property
+    def _is_done(self) -> bool:
+        return self._done_specs == len(self.table_specs)
+
+    def feed(self, chunk: bytes) -> list[AnimalRecord]:
+        """
+        Feeds the next page chunk to the parser.
+
+        :param chunk: The next bytes of the page.
+        :return: The animal table rows completed by the chunk.
+        """
+        return self._animal_rows(self.feed_tables(chunk))
+
+    def close(self) -> list[AnimalRecord]:
+        """
+        Ends the parsing once the whole page was fed.
+
+        :return: The last animal table rows.
+        """
+        return self._animal_rows(self.close_tables())
+
+    def feed_tables(self, chunk: bytes) -> list[TableRow]:
+        """
+        Feeds the next page chunk to the parser.
+
+        :param chunk: The next bytes of the page.
+        :return: The rows of the table specs completed by the chunk.
+        """
+        if self._is_done:
+            return []
+        self._pull_parser.feed(chunk)
+        return self._read_rows()
+
+    def close_tables(self) -> list[TableRow]:
+        """
+        Ends the parsing once the whole page was fed.
+
+        :return: The last rows of the table specs.
+        """
+        rows = []
+        if not self._is_done:
+            self._pull_parser.close()
+            rows = self._read_rows()
+        found_specs = [table_spec for table in self._tables for table_spec in table.table_specs]
+        for table_spec in self.table_specs:
+            if table_spec not in found_specs:
+                self._report_missing_table(table_spec)
+        return rows
+
+    def _read_rows(self) -> list[TableRow]:
+        """Handle the parser events read so far and return the completed rows."""
+        rows = []
+        for event, element in self._pull_parser.read_events():
+            if event == "start":
+                self._handle_start(element)
+                continue
+            table = self._table_of(element)
+            if element.tag == "table" and table is not None and table.element is element:
+                self._open_tables -= 1
+                self._done_specs += len(table.table_specs)
+                if self._is_done:
+                    break
+            elif element.tag == "table" and table is None:
+                # Tables that no spec reads are not needed anymore.
+                element.clear(keep_tail=True)
+            elif element.tag == "tr" and table is not None:
+                rows.extend(self._handle_row(table, element))
+        return rows
+
+    def _handle_start(self, element: _Element):
+        if element.tag == "span" and element.get("id"):
+            span_id = element.get("id")
+            self._waiting_specs.extend(table_spec for table_spec in self._unseen_specs if table_spec.span_id == span_id)
+            self._unseen_specs = [table_spec for table_spec in self._unseen_specs if table_spec.span_id != span_id]
+        elif element.tag == "table" and self._waiting_specs:
+            table_class = self._get_table_class(element)
+            specs = [table_spec for table_spec in self._waiting_specs if table_spec.table_class == table_class]
+            if specs:
+                self._tables.append(_StreamedTable(element, specs))
+                self._open_tables += 1
+                self._waiting_specs = [table_spec for table_spec in self._waiting_specs if table_spec not in specs]
+
+    def _handle_row(self, table: _StreamedTable, row: _Element) -> list[TableRow]:
+        """Parse the completed row, the first row holds the table headers."""
+        if table.table_headers is None:
+            table.table_headers = self._get_table_headers_of_row(row)
+            specs = self._validate_table_headers(table.table_specs, table.table_headers)
+            self._done_specs += len(table.table_specs) - len(specs)
+            table.table_specs = specs
+            return []
+        rows = list(self._parse_table_row(self._get_row_cells(row), table.table_headers, table.table_specs))
+        row.clear(keep_tail=True)
+        return rows
+
+    def _get_table_headers_of_row(self, row: _Element) -> dict[str, int]:
+        headers = [self._get_header_text(header) for header in row.iter("th")]
+        return dict(zip(headers, range(len(headers))))
+
+    def _table_of(self, element: _Element) -> Optional[_StreamedTable]:
+        """Return the found table that is, or contains, the element."""
+        if not self._open_tables:
+            return None
+        for ancestor in (element, *element.iterancestors("table")):
+            for table in self._tables:
+                if table.element is ancestor:
+                    return table
+        return None
 
-            except ValidationError:
-                logger.error(f"Row of animal {animal_name} has missing arguments")
-
-    def _parse_animal_table_rows(
-        self, table: Tag, table_headers: dict
-    ) -> Iterator[ParsedAnimalData]:
-        """Iterate and parse all table rows."""
-        for row in table.find_all("tr")[1:]:
-            parsed_row: Optional[ParsedAnimalData] = self._parse_animal_row(
-                row, table_headers
-            )
-            if parsed_row:
-                yield parsed_row
+    @staticmethod
+    def _animal_rows(table_rows: list[TableRow]) -> list[AnimalRecord]:
+        return [table_row.row for table_row in table_rows if table_row.table == ListPageTables.ANIMALS]
@@ -1,18 +1,23 @@
 from abc import ABC, abstractmethod
+from typing import Final, Iterator, Optional, Union
 from urllib.parse import urljoin
 
 from bs4 import BeautifulSoup
+from lxml.etree import HTMLParser, _Element, fromstring
 from typing_extensions import Self
 
 
 class BaseHTMLParser(ABC):
-    """This base parser uses Beautiful Soup as the base HTML parser."""
+    """
+    This base parser uses Beautiful Soup as the base HTML parser.
+    Subclasses with the LxmlHTMLParserMixin walk the lxml tree directly instead.
+    """
 
-    def __init__(self, soup: BeautifulSoup, resource_url: str):
+    def __init__(self, soup: Optional[BeautifulSoup], resource_url: str):
         """
         Initialize the parser with a BeautifulSoup object and the URL of the HTML page.
 
-        :param soup: BeautifulSoup object to parse HTML.
+        :param soup: BeautifulSoup object to parse HTML, None for lxml based parsers.
         :param resource_url: The URL of the HTML page resource.
         """
         self.soup = soup
@@ -34,3 +39,33 @@ class BaseHTMLParser(ABC):
     def _get_full_url(self, link: str) -> str:
         """Return the full URL that the link refer to based on the resource page URL."""
         return urljoin(self.resource_url, link)
+
+
+class LxmlHTMLParserMixin:
+    """
+    Helpers of the parsers that walk the lxml tree directly.
+    Text extraction follows Beautiful Soup's get_text: comments and script contents are not text.
+    """
+    NON_TEXT_TAGS: Final[frozenset[str]] = frozenset({"script", "style", "template"})
+    REFERENCE_TAGS: Final[frozenset[str]] = NON_TEXT_TAGS | {"sup"}
+
+    @staticmethod
+    def _parse_tree(html_content: Union[str, bytes]) -> _Element:
+        """Parse the HTML content into an lxml tree, bytes are decoded as UTF-8 like the Wikipedia pages."""
+        parser = HTMLParser(encoding="utf-8") if isinstance(html_content, bytes) else HTMLParser()
+        tree = fromstring(html_content, parser=parser)
+        if tree is None:
+            raise ValueError("Failed to parse an empty HTML document")
+        return tree
+
+    @classmethod
+    def _iter_text(cls, element: _Element, skipped_tags: frozenset[str] = NON_TEXT_TAGS) -> Iterator[str]:
+        """Iterate the text strings of the element, skipping the content of comments and of skipped tags."""
+        if element.text:
+            yield element.text
+        for child in element:
+            # Comments and processing instructions have a non-string tag.
+            if isinstance(child.tag, str) and child.tag not in skipped_tags:
+                yield from cls._iter_text(child, skipped_tags)
+            if child.tail:
+                yield child.tail
@@ -1,11 +1,27 @@
+from enum import Enum
 from typing import Final
 
 
 class AnimalsTableHeaders:
     ANIMAL: Final[str] = "Animal"
+    YOUNG: Final[str] = "Young"
+    FEMALE: Final[str] = "Female"
+    MALE: Final[str] = "Male"
+    COLLECTIVE_NOUN: Final[str] = "Collective noun"
     COLLATERAL_ADJECTIVE: Final[str] = "Collateral adjective"
 
 
 class AnimalsTableHTMLSetting:
     SPAN_ID: Final[str] = "Terms_by_species_or_taxon"
     TABLE_CLASS: Final[str] = "wikitable sortable"
+
+
+class ListPageTables:
+    """Names of the tables extracted from the animals list page, as they are written to the outputs."""
+    ANIMALS: Final[str] = "animals"
+    ANIMAL_TERMS: Final[str] = "animal_terms"
+
+
+class ParserBackend(str, Enum):
+    BEAUTIFULSOUP = "beautifulsoup"
+    LXML = "lxml"
@@ -1,8 +1,50 @@
-from typing import Optional
+from dataclasses import dataclass
+from sys import intern
+from typing import Iterable, Optional
 from pydantic import BaseModel
+from typing_extensions import Self
 
 
 class ParsedAnimalData(BaseModel):
     name: str
     collateral_adjectives: list[str]
     page_url: Optional[str]
+
+
+class AnimalTermsData(BaseModel):
+    """
+    The terms of an animal in the animals list page: the names of its young, female and male, and its collective nouns.
+    """
+    name: str
+    page_url: Optional[str]
+    young: list[str] = []
+    female: list[str] = []
+    male: list[str] = []
+    collective_nouns: list[str] = []
+
+
+@dataclass(frozen=True, slots=True)
+class AnimalRecord:
+    """
+    A compact animals table row, whose names and adjectives are interned strings.
+    The parser builds the records directly, checking the values of the list page row once.
+    """
+    name: str
+    collateral_adjectives: tuple[str, ...]
+    page_url: Optional[str]
+
+    @classmethod
+    def from_cells(cls, name: Optional[str], collateral_adjectives: Optional[Iterable[str]],
+                   page_url: Optional[str]) -> Self:
+        """
+        Builds the record of the values extracted from a row of the list page.
+
+        :raises ValueError: If the row has no animal name or no collateral adjectives.
+        """
+        if not isinstance(name, str) or collateral_adjectives is None:
+            raise ValueError(f"Row {name} has no animal name or no collateral adjectives")
+        return cls(
+            name=intern(name),
+            collateral_adjectives=tuple(intern(adjective) for adjective in collateral_adjectives),
+            page_url=page_url,
+        )
@@ -0,0 +1,156 @@
+from abc import ABC, abstractmethod
+from dataclasses import dataclass
+from typing import TYPE_CHECKING, Any, Callable, NamedTuple, Optional
+
+from src.processors.html_parsers.constants import AnimalsTableHeaders, AnimalsTableHTMLSetting, ListPageTables
+from src.processors.html_parsers.schemas import AnimalRecord, AnimalTermsData
+
+if TYPE_CHECKING:
+    from src.processors.html_parsers.animals_html_parser import AnimalsHTMLParser
+
+
+class RowCells:
+    """
+    The cells of a table row by header. Each cell's link and text are read once, through the parser helpers,
+    whatever the number of columns and table specs that read them.
+    """
+    _NO_LINK: tuple[None, None] = (None, None)
+
+    def __init__(self, parser: "AnimalsHTMLParser", cells: list, table_headers: dict[str, int]):
+        self.parser = parser
+        self.cells = cells
+        self.table_headers = table_headers
+        self._links: dict[str, tuple[Optional[str], Optional[str]]] = {}
+        self._texts: dict[str, str] = {}
+
+    def has(self, header: str) -> bool:
+        return header in self.table_headers
+
+    def first_link(self, header: str) -> tuple[Optional[str], Optional[str]]:
+        """Return the href and title of the first link in the cell, None and None when it has no link."""
+        link = self._links.get(header)
+        if link is None:
+            try:
+                link = self.parser._get_first_link(self.cells[self.table_headers[header]])
+            except AttributeError:
+                link = self._NO_LINK
+            self._links[header] = link
+        return link
+
+    def text(self, header: str) -> str:
+        """Return the cell text without references, its strings separated by commas."""
+        text = self._texts.get(header)
+        if text is None:
+            text = self._texts[header] = self.parser._get_text_without_references(
+                self.cells[self.table_headers[header]]
+            )
+        return text
+
+
+@dataclass(frozen=True)
+class Column(ABC):
+    """Extracts a row value from the cell under a table header, None when the table has no such header."""
+    header: str
+
+    def extract(self, row: RowCells) -> Any:
+        return self.extract_cell(row) if row.has(self.header) else None
+
+    @abstractmethod
+    def extract_cell(self, row: RowCells) -> Any:
+        """Extracts the value of the header's cell, the row is known to have it."""
+
+
+@dataclass(frozen=True)
+class LinkColumn(Column):
+    """The title, or the full URL, of the first link in the cell, None when it has no link."""
+    attribute: str = "title"
+
+    def extract_cell(self, row: RowCells) -> Optional[str]:
+        link = row.first_link(self.header)
+        if link is RowCells._NO_LINK:
+            return None
+        href, title = link
+        return row.parser._get_full_url(href) if self.attribute == "href" else title
+
+
+@dataclass(frozen=True)
+class SplitTextColumn(Column):
+    """
+    The cell text without references, its strings separated by commas and split on them.
+    None when the cell is empty or holds one of the empty values.
+    """
+    empty_values: tuple[str, ...] = ("—", "")
+
+    def extract_cell(self, row: RowCells) -> Optional[list[str]]:
+        values = row.text(self.header).split(",")
+        return None if values[0] in self.empty_values else values
+
+
+@dataclass(frozen=True)
+class TermsColumn(Column):
+    """
+    The trimmed strings of the cell text without references, without the empty ones and the empty values.
+    Empty when the table has no such header.
+    """
+    empty_values: tuple[str, ...] = ("—", "")
+
+    def extract(self, row: RowCells) -> list[str]:
+        return super().extract(row) or []
+
+    def extract_cell(self, row: RowCells) -> list[str]:
+        terms = (term.strip(" \n\t,;") for term in row.text(self.header).split(","))
+        return [term for term in terms if term not in self.empty_values]
+
+
+@dataclass(frozen=True)
+class TableSpec:
+    """
+    A declarative spec of a table of the animals list page: the first table of the class after the section's span,
+    the headers it must have, and the column extracting each field of its row model.
+    The row model is called with the extracted fields, it raises a ValueError, e.g. a pydantic ValidationError,
+    for a row it rejects.
+    A required table that is missing, or misses a header, fails the parsing, an optional one is skipped.
+    Several specs may read the same table, its rows are still walked once.
+    """
+    name: str
+    span_id: str
+    row_model: Callable[..., Any]
+    columns: dict[str, Column]
+    required_headers: frozenset[str] = frozenset()
+    table_class: str = AnimalsTableHTMLSetting.TABLE_CLASS
+    required: bool = True
+
+
+class TableRow(NamedTuple):
+    """A parsed row and the name of its table spec."""
+    table: str
+    row: Any
+
+
+ANIMALS_TABLE_SPEC = TableSpec(
+    name=ListPageTables.ANIMALS,
+    span_id=AnimalsTableHTMLSetting.SPAN_ID,
+    row_model=AnimalRecord.from_cells,
+    columns={
+        "page_url": LinkColumn(AnimalsTableHeaders.ANIMAL, attribute="href"),
+        "name": LinkColumn(AnimalsTableHeaders.ANIMAL),
+        "collateral_adjectives": SplitTextColumn(AnimalsTableHeaders.COLLATERAL_ADJECTIVE),
+    },
+    required_headers=frozenset({AnimalsTableHeaders.ANIMAL, AnimalsTableHeaders.COLLATERAL_ADJECTIVE}),
+)
+
+ANIMAL_TERMS_TABLE_SPEC = TableSpec(
+    name=ListPageTables.ANIMAL_TERMS,
+    span_id=AnimalsTableHTMLSetting.SPAN_ID,
+    row_model=AnimalTermsData,
+    columns={
+        "name": LinkColumn(AnimalsTableHeaders.ANIMAL),
+        "page_url": LinkColumn(AnimalsTableHeaders.ANIMAL, attribute="href"),
+        "young": TermsColumn(AnimalsTableHeaders.YOUNG),
+        "female": TermsColumn(AnimalsTableHeaders.FEMALE),
+        "male": TermsColumn(AnimalsTableHeaders.MALE),
+        "collective_nouns": TermsColumn(AnimalsTableHeaders.COLLECTIVE_NOUN),
+    },
+    required_headers=frozenset({AnimalsTableHeaders.ANIMAL}),
+    required=False,
+)
@@ -0,0 +1,145 @@
+import os
+from asyncio import to_thread
+from logging import getLogger
+from pathlib import Path
+from typing import Final, Optional
+
+from pydantic import BaseModel, ValidationError
+
+from src.handlers.async_http_client import HTTPXClient
+from src.handlers.output_sinks import ANIMALS_TABLE, IMAGES_TABLE, OutputSink, Row
+from src.processors.html_parsers.schemas import AnimalRecord, ParsedAnimalData
+from src.processors.mediawiki_pages import MAX_TITLES, query_pages
+
+logger = getLogger(__name__)
+
+
+class PageSnapshot(BaseModel):
+    """
+    Pydantic schema for the state of an animal page in a table snapshot.
+    """
+    revision_id: Optional[int] = None
+    image_url: Optional[str] = None
+
+
+class TableSnapshot(BaseModel):
+    """
+    Pydantic schema for the snapshot of a run: the animals table rows, the revision and image URL of each page,
+    and the saved image file of each animal.
+    """
+    rows: list[ParsedAnimalData] = []
+    pages: dict[str, PageSnapshot] = {}
+    image_files: dict[str, str] = {}
+
+
+class IncrementalSnapshot(OutputSink):
+    """
+    Keeps the snapshot of the last run next to the output, so the next run fetches only the animals that changed.
+    The current revision IDs of the pages are checked with batched MediaWiki API queries, and an animal is reused
+    when its row, its page revision and its saved image file are the same as in the snapshot.
+    It is an output sink too: it must be one of the pipeline's output sinks, to record the streamed animals and
+    image rows of the new snapshot, which is written when it closes.
+    The snapshot of a failed run is not written, so the next run is still compared with the last complete one.
+    """
+    SNAPSHOT_FILE_NAME: Final[str] = "snapshot.json"
+    CHECK_BATCH_SIZE: Final[int] = MAX_TITLES
+
+    def __init__(self, client: HTTPXClient, dir_path: Path, api_url: str):
+        """
+        Loads the snapshot of the last run.
+
+        :param client: HTTPXClient's instance for the revision queries.
+        :param dir_path: Directory of the snapshot file, next to the output.
+        :param api_url: URL of the MediaWiki API endpoint.
+        """
+        super().__init__(batch_size=1)
+        self.client = client
+        self.snapshot_path = dir_path / self.SNAPSHOT_FILE_NAME
+        self.api_url = api_url
+        self.previous = self._load()
+        self.current = TableSnapshot()
+        self.reused_animals = 0
+        self._previous_rows = {row.name: row for row in self.previous.rows}
+        self._page_urls: dict[str, str] = {}
+
+    async def check_revisions(self, rows: list[AnimalRecord]):
+        """
+        Records the current revision of the rows' pages, with one API query per CHECK_BATCH_SIZE pages.
+        Pages whose revision could not be checked are fetched again.
+
+        :param rows: Rows of the animals table.
+        """
+        page_urls = list(dict.fromkeys(
+            row.page_url for row in rows if row.page_url and row.page_url not in self.current.pages
+        ))
+        for start in range(0, len(page_urls), self.CHECK_BATCH_SIZE):
+            batch = page_urls[start:start + self.CHECK_BATCH_SIZE]
+            try:
+                pages = await query_pages(self.client, self.api_url, batch, {"prop": "info"})
+            except (ConnectionError, ValueError) as e:
+                logger.error(f"Failed to check the revisions of {len(batch)} pages: {e}")
+                pages = {}
+            for page_url in batch:
+                page = self.current.pages.setdefault(page_url, PageSnapshot())
+                page.revision_id = (pages.get(page_url) or {}).get("lastrevid")
+
+    def reused_image_row(self, row: AnimalRecord) -> Optional[Row]:
+        """
+        Returns the images table row of the last run when the animal did not change, so it is not fetched again.
+
+        :param row: A row of the animals table, whose page revision was checked.
+        """
+        previous_row = self._previous_rows.get(row.name)
+        previous_page = self.previous.pages.get(row.page_url)
+        current_page = self.current.pages.get(row.page_url)
+        image_file = self.previous.image_files.get(row.name)
+        if (
+            previous_row is None
+            or previous_row.page_url != row.page_url
+            or previous_row.collateral_adjectives != list(row.collateral_adjectives)
+            or previous_page is None
+            or current_page is None
+            or current_page.revision_id is None
+            or previous_page.revision_id != current_page.revision_id
+            or not previous_page.image_url
+            or image_file is None
+            or not Path(image_file).exists()
+        ):
+            return None
+        self.reused_animals += 1
+        return {"name": row.name, "image_url": previous_page.image_url, "file_path": image_file}
+
+    async def add(self, table: str, row: Row):
+        if table == ANIMALS_TABLE:
+            # The rows are the pipeline's checked records, the snapshot file is validated when it is loaded.
+            self.current.rows.append(ParsedAnimalData.model_construct(**row))
+            self._page_urls[row["name"]] = row["page_url"]
+        elif table == IMAGES_TABLE:
+            self.current.image_files[row["name"]] = row["file_path"]
+            page_url = self._page_urls.get(row["name"])
+            if page_url:
+                self.current.pages.setdefault(page_url, PageSnapshot()).image_url = row["image_url"]
+
+    async def _write_batch(self, table: str, rows: list[Row]):
+        pass
+
+    async def _close(self):
+        if self.failed:
+            logger.warning(f"The run failed, keeping the snapshot of the last run in {self.snapshot_path}")
+            return
+        logger.info(f"Incremental run: {self.reused_animals} of {len(self.current.rows)} animals were unchanged")
+        await to_thread(self._save)
+
+    def _save(self):
+        tmp_path = self.snapshot_path.with_name(f".{self.snapshot_path.name}.part")
+        tmp_path.write_text(self.current.model_dump_json())
+        os.replace(tmp_path, self.snapshot_path)
+
+    def _load(self) -> TableSnapshot:
+        if not self.snapshot_path.exists():
+            return TableSnapshot()
+        try:
+            return TableSnapshot.model_validate_json(self.snapshot_path.read_bytes())
+        except ValidationError as e:
+            logger.warning(f"Ignoring the invalid snapshot {self.snapshot_path}: {e}")
+            return TableSnapshot()
@@ -0,0 +1,56 @@
+import json
+from typing import Final, Optional
+from urllib.parse import unquote, urlencode, urlsplit
+
+from src.handlers.async_http_client import HTTPXClient
+
+# Maximum number of titles of a MediaWiki API query.
+MAX_TITLES: Final[int] = 50
+
+
+def page_title(page_url: str) -> str:
+    """Return the page title of a https://en.wikipedia.org/wiki/<title> URL."""
+    return unquote(urlsplit(page_url).path.rsplit("/wiki/", 1)[-1]).replace("_", " ")
+
+
+async def query_pages(client: HTTPXClient, api_url: str, page_urls: list[str],
+                      properties: dict[str, str]) -> dict[str, Optional[dict]]:
+    """
+    Queries the properties of up to MAX_TITLES pages with a single MediaWiki API "action=query" request,
+    following the title normalizations and redirects of the API.
+
+    :param client: HTTPXClient's instance for making HTTP requests.
+    :param api_url: URL of the MediaWiki API endpoint.
+    :param page_urls: URLs of the pages.
+    :param properties: The query parameters of the requested properties, e.g. {"prop": "info"}.
+    :return: The returned page object by page URL, None for pages the API did not return.
+    """
+    titles = {page_url: page_title(page_url) for page_url in page_urls}
+    query = {
+        "action": "query",
+        "format": "json",
+        "formatversion": "2",
+        "redirects": "1",
+        **properties,
+        "titles": "|".join(dict.fromkeys(titles.values())),
+    }
+    response = await client.get(url=f"{api_url}?{urlencode(query)}")
+    try:
+        result = json.loads(response.content)["query"]
+    except (KeyError, ValueError) as e:
+        raise ValueError(f"Unexpected MediaWiki API response from {api_url}") from e
+
+    # Follow the API title normalizations and redirects to the titles of the returned pages.
+    title_mapping = {
+        mapping["from"]: mapping["to"]
+        for mapping in [*result.get("normalized", []), *result.get("redirects", [])]
+    }
+    pages = {page["title"]: page for page in result.get("pages", [])}
+    resolved_pages = {}
+    for page_url, title in titles.items():
+        followed_titles = set()
+        while title in title_mapping and title not in followed_titles:
+            followed_titles.add(title)
+            title = title_mapping[title]
+        resolved_pages[page_url] = pages.get(title)
+    return resolved_pages
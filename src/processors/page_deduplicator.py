@@ -0,0 +1,64 @@
+from typing import Optional
+
+from src.common.schemas import ImageQueueItem, PageQueueItem
+
+
+class PageDeduplicator:
+    """
+    Run-scoped deduplication of animal pages by URL.
+    Only the first item of each page URL is fetched; the animals of later items with the same URL
+    are recorded as aliases and get the page's image once it is resolved, or its error if the page failed.
+    """
+
+    def __init__(self):
+        self.page_fetches_saved = 0
+        self._pending_aliases: dict[str, list[str]] = {}
+        self._image_urls: dict[str, Optional[str]] = {}
+        self._page_errors: dict[str, str] = {}
+
+    def claim_page(self, page_item: PageQueueItem) -> bool:
+        """
+        Claims the fetch of a page.
+
+        :param page_item: The page item.
+        :return: True if the page should be fetched, False if it is a duplicate recorded as an alias.
+        """
+        page_url = page_item.page_url
+        if page_url not in self._pending_aliases and page_url not in self._image_urls:
+            self._pending_aliases[page_url] = []
+            return True
+        self.page_fetches_saved += 1
+        if page_url in self._pending_aliases:
+            self._pending_aliases[page_url].append(page_item.page_name)
+        return False
+
+    def resolved_image_item(self, page_item: PageQueueItem) -> Optional[ImageQueueItem]:
+        """
+        Returns the image item of a duplicate page item whose page was already resolved, if any.
+
+        :param page_item: The duplicate page item.
+        """
+        image_url = self._image_urls.get(page_item.page_url)
+        return ImageQueueItem(image_url=image_url, image_name=page_item.page_name) if image_url else None
+
+    def failed_page_error(self, page_item: PageQueueItem) -> Optional[str]:
+        """
+        Returns the error of a duplicate page item whose page already failed, if any.
+
+        :param page_item: The duplicate page item.
+        """
+        return self._page_errors.get(page_item.page_url)
+
+    def resolve_page(self, page_url: str, image_url: Optional[str], error: Optional[str] = None) -> list[str]:
+        """
+        Records the result of a page fetch.
+
+        :param page_url: URL of the fetched page.
+        :param image_url: The page's image URL, or None if the page failed.
+        :param error: Error of the failed page, the later duplicates of the page are dead-lettered with it.
+        :return: Names of the aliases that were waiting for the page.
+        """
+        self._image_urls[page_url] = image_url
+        if image_url is None:
+            self._page_errors[page_url] = error or f"Failed to find image url of {page_url}"
+        return self._pending_aliases.pop(page_url, [])
@@ -0,0 +1,119 @@
+from asyncio import Queue, TimeoutError, get_running_loop, wait_for
+from logging import getLogger
+from time import perf_counter
+from typing import Final, Optional
+
+from src.common.schemas import DeadLetterItem, ImageQueueItem, PageQueueItem
+from src.handlers.async_http_client import HTTPXClient
+from src.handlers.durable_queue import PipelineQueue, QueuedItem
+from src.handlers.metrics import PipelineMetrics
+from src.processors.mediawiki_pages import MAX_TITLES, query_pages
+from src.processors.page_deduplicator import PageDeduplicator
+
+logger = getLogger(__name__)
+
+
+class PageImageBatchResolver:
+    """
+    A class responsible for resolving the main image of animal pages in batches through the MediaWiki API.
+    Page items are grouped into windows of up to batch_size items or max_wait seconds,
+    and each window costs a single "prop=pageimages" query instead of one page GET per animal.
+    It consumes the page queue like AnimalPageProcessor, so it can replace it in the pipeline.
+    """
+    MAX_BATCH_SIZE: Final[int] = MAX_TITLES
+    API_URL: Final[str] = "https://en.wikipedia.org/w/api.php"
+
+    def __init__(self, client: HTTPXClient, api_url: str = API_URL, batch_size: int = MAX_BATCH_SIZE,
+                 max_wait: float = 0.2, metrics: Optional[PipelineMetrics] = None):
+        """
+        :param client: HTTPXClient's instance for making HTTP requests.
+        :param api_url: URL of the MediaWiki API endpoint.
+        :param batch_size: Maximum number of pages per query, the API allows up to 50.
+        :param max_wait: Seconds a window waits for more pages before its query is sent.
+        :param metrics: Optional metrics of the page stage: service time of each window and errors by class.
+        """
+        self.client = client
+        self.api_url = api_url
+        self.batch_size = min(batch_size, self.MAX_BATCH_SIZE)
+        self.max_wait = max_wait
+        self.metrics = metrics
+        self.dead_letters: list[DeadLetterItem] = []
+
+    async def extract_animal_page_data(self, page_queue: PipelineQueue, image_queue: Queue[ImageQueueItem],
+                                       page_deduplicator: Optional[PageDeduplicator] = None):
+        """
+        Asynchronously consumes windows of page items from a queue, resolves their images with a single query
+        and puts the image items into the image queue.
+
+        :param page_queue: containing items (PageQueueItem) with the names and URLs of animal pages.
+        :param image_queue: containing items (ImageQueueItem) with the resolved image URL and page name.
+        :param page_deduplicator: Optional run-scoped deduplicator, whose aliases of each page get its image too.
+        """
+        while True:
+            queued_items = await self._collect_window(page_queue)
+            try:
+                await self._process_window([page_item for _, page_item in queued_items], image_queue,
+                                           page_deduplicator)
+            finally:
+                for item_id, _ in queued_items:
+                    page_queue.task_done(item_id)
+
+    async def resolve_image_urls(self, page_urls: list[str]) -> dict[str, Optional[str]]:
+        """
+        Resolves the main image URL of up to batch_size pages with a single API query.
+
+        :param page_urls: URLs of the pages.
+        :return: The image URL by page URL, None for pages without an image.
+        """
+        pages = await query_pages(self.client, self.api_url, page_urls, {
+            "prop": "pageimages",
+            "piprop": "original",
+            "pilimit": str(self.MAX_BATCH_SIZE),
+        })
+        return {page_url: (page or {}).get("original", {}).get("source") for page_url, page in pages.items()}
+
+    async def _collect_window(self, page_queue: PipelineQueue) -> list[QueuedItem]:
+        """Wait for a page item, then collect more until the window is full or its time is up."""
+        queued_items = [await page_queue.get()]
+        loop = get_running_loop()
+        deadline = loop.time() + self.max_wait
+        while len(queued_items) < self.batch_size:
+            remaining_time = deadline - loop.time()
+            if remaining_time <= 0:
+                break
+            try:
+                queued_items.append(await wait_for(page_queue.get(), timeout=remaining_time))
+            except TimeoutError:
+                break
+        return queued_items
+
+    async def _process_window(self, page_items: list[PageQueueItem], image_queue: Queue[ImageQueueItem],
+                              page_deduplicator: Optional[PageDeduplicator]):
+        """Resolve the window's images and fan the image items out to the image queue."""
+        started_at = perf_counter()
+        try:
+            image_urls = await self.resolve_image_urls([page_item.page_url for page_item in page_items])
+            logger.info(f"Successfully resolved the images of {len(page_items)} pages")
+            errors = {}
+        except (ConnectionError, ValueError) as e:
+            logger.error(f"Error resolving the images of {len(page_items)} pages: {e}")
+            image_urls, errors = {}, {page_item.page_url: e for page_item in page_items}
+            if self.metrics:
+                self.metrics.record_error("page_batch", e)
+        if self.metrics:
+            self.metrics.observe("stage_seconds", perf_counter() - started_at, stage="page_batch")
+
+        for page_item in page_items:
+            page_url = page_item.page_url
+            image_url = image_urls.get(page_url)
+            error = None if image_url else repr(
+                errors.get(page_url) or ValueError(f"Failed to find image url of {page_url}")
+            )
+            aliases = page_deduplicator.resolve_page(page_url, image_url, error) if page_deduplicator else []
+            for image_name in [page_item.page_name, *aliases]:
+                if image_url:
+                    await image_queue.put(ImageQueueItem(image_url=image_url, image_name=image_name))
+                else:
+                    self.dead_letters.append(
+                        DeadLetterItem(stage="page", item_name=image_name, url=page_url, error=error)
+                    )
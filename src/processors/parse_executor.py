@@ -0,0 +1,113 @@
+import logging
+from asyncio import get_running_loop
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from enum import Enum
+from functools import partial
+from typing import Callable, Iterator, Optional, Sequence, TypeVar
+
+from src.processors.html_parsers.animal_html_parser import AnimalHTMLParser
+from src.processors.html_parsers.animals_html_parser import AnimalsHTMLParser
+from src.processors.html_parsers.constants import ListPageTables, ParserBackend
+from src.processors.html_parsers.schemas import AnimalRecord
+from src.processors.html_parsers.table_specs import ANIMALS_TABLE_SPEC, TableRow, TableSpec
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+
+class ParseMode(str, Enum):
+    INLINE = "inline"
+    THREAD = "thread"
+    PROCESS = "process"
+
+
+def extract_image_url(html_content: bytes, resource_url: str,
+                      backend: ParserBackend = ParserBackend.BEAUTIFULSOUP) -> str:
+    """Parse an animal page and return its main image URL."""
+    parser = AnimalHTMLParser.create(html_content=html_content, resource_url=resource_url, backend=backend)
+    return parser.extract_image_url()
+
+
+def parse_animal_table(html_content: bytes, resource_url: str,
+                       backend: ParserBackend = ParserBackend.BEAUTIFULSOUP) -> list[AnimalRecord]:
+    """Parse the animals list page and return its table rows, as compact records."""
+    parser = AnimalsHTMLParser.create(html_content=html_content, resource_url=resource_url, backend=backend)
+    return list(parser.parse_animal_table())
+
+
+def parse_list_page_tables(html_content: bytes, resource_url: str, backend: ParserBackend = ParserBackend.BEAUTIFULSOUP,
+                           table_specs: Sequence[TableSpec] = ()) -> tuple[list[AnimalRecord], list[TableRow]]:
+    """
+    Parse the animals table and the tables of the other table specs of the animals list page in a single pass.
+
+    :return: The animals table rows, as compact records, and the rows of the other tables.
+    """
+    parser = AnimalsHTMLParser.create(html_content=html_content, resource_url=resource_url, backend=backend)
+    animal_rows, table_rows = [], []
+    for table_row in parser.parse_tables([ANIMALS_TABLE_SPEC, *table_specs]):
+        if table_row.table == ListPageTables.ANIMALS:
+            animal_rows.append(table_row.row)
+        else:
+            table_rows.append(table_row)
+    return animal_rows, table_rows
+
+
+class ParsedAnimalsTable:
+    """
+    The animals table rows parsed by a ParseExecutor, exposed with the same interface as AnimalsHTMLParser,
+    and the rows of the other tables of the list page.
+    """
+
+    def __init__(self, rows: list[AnimalRecord], table_rows: Optional[list[TableRow]] = None):
+        self.rows = rows
+        self.table_rows = table_rows or []
+
+    def parse_animal_table(self) -> Iterator[AnimalRecord]:
+        return iter(self.rows)
+
+
+class ParseExecutor:
+    """
+    Runs HTML parse functions either inline on the event loop, in a thread pool or in a process pool.
+    Parse functions receive the raw response bytes and return only their small results,
+    so nothing heavier than the page content and the parsed values crosses the worker boundary.
+    """
+
+    def __init__(self, mode: ParseMode = ParseMode.INLINE, max_workers: Optional[int] = None,
+                 parser_backend: ParserBackend = ParserBackend.BEAUTIFULSOUP):
+        """
+        Initializes the executor, the worker pool is started on enter.
+
+        :param mode: Where the parse functions run.
+        :param max_workers: Number of pool workers, defaults to the concurrent.futures default.
+        :param parser_backend: The HTML parser backend that the parse functions are called with.
+        """
+        self.mode = mode
+        self.max_workers = max_workers
+        self.parser_backend = parser_backend
+        self._executor: Optional[Executor] = None
+
+    async def __aenter__(self):
+        if self.mode == ParseMode.THREAD:
+            self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="parser")
+        elif self.mode == ParseMode.PROCESS:
+            self._executor = ProcessPoolExecutor(max_workers=self.max_workers)
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        if self._executor:
+            self._executor.shutdown(wait=True, cancel_futures=True)
+            self._executor = None
+
+    async def run(self, parse_func: Callable[..., T], *args) -> T:
+        """
+        Runs the parse function with the given arguments in the configured mode.
+
+        :param parse_func: A module level (picklable) parse function.
+        :param args: Arguments of the parse function.
+        :return: The parse function result.
+        """
+        if self._executor is None:
+            return parse_func(*args)
+        return await get_running_loop().run_in_executor(self._executor, partial(parse_func, *args))
@@ -0,0 +1,218 @@
+import logging
+from asyncio import gather, get_running_loop, run
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Any, Final, NamedTuple, Optional
+from zlib import crc32
+
+from pydantic import BaseModel
+
+from src.common.schemas import DeadLetterItem
+from src.handlers.async_http_client import HTTPXClient
+from src.handlers.byte_budget import ByteBudget
+from src.handlers.circuit_breaker import HostCircuitBreaker
+from src.handlers.image_downloader import FsyncPolicy, ImageDownloader
+from src.handlers.metrics import PipelineMetrics
+from src.handlers.output_sinks import ANIMALS_TABLE, IMAGES_TABLE, OutputSink, Row, RowSink
+from src.handlers.rate_limiter import HostRateLimiter, RateLimit
+from src.handlers.retry_policy import RetryPolicy
+from src.handlers.transport_profile import TransportProfile
+from src.processors.adjective_index import AdjectiveIndex
+from src.processors.animals_page_processor import AnimalsPageProcessor
+from src.processors.html_parsers.constants import ParserBackend
+from src.processors.html_parsers.schemas import AnimalRecord
+from src.processors.parse_executor import ParseExecutor, parse_animal_table
+
+logger = logging.getLogger(__name__)
+
+
+class ShardSettings(BaseModel):
+    """
+    Pydantic schema for the settings of a crawl shard, sent to its worker process.
+    The rate limits and the byte budget are the totals of the crawl, each of the shards gets an equal part of them.
+    """
+    concurrency: int = 10
+    destination_dir: Path
+    head_only_pages: bool = False
+    page_images_api_url: Optional[str] = None
+    parser_backend: ParserBackend = ParserBackend.LXML
+    default_rate_limit: Optional[RateLimit] = None
+    host_rate_limits: dict[str, RateLimit] = {}
+    retry_policy: RetryPolicy = RetryPolicy()
+    transport_profile: Optional[TransportProfile] = None
+    fsync_policy: FsyncPolicy = FsyncPolicy.NEVER
+    max_image_size: Optional[int] = None
+    thumbnail_width: Optional[int] = None
+    byte_budget_bytes: Optional[int] = None
+    metrics: bool = False
+    # Keyword arguments of the shards' HTTP clients, e.g. a transport, they are pickled to the worker processes.
+    client_kwargs: dict[str, Any] = {}
+
+
+class ShardResult(NamedTuple):
+    """What a shard's worker process sends back: its failed items, saved image rows and metrics."""
+    dead_letters: list[DeadLetterItem]
+    image_rows: list[Row]
+    metrics: Optional[PipelineMetrics]
+
+
+class CollectedRows(OutputSink):
+    """
+    Keeps the rows in memory, so a worker process can send them back to the process that owns the outputs.
+    """
+
+    def __init__(self):
+        super().__init__(batch_size=1)
+        self.rows: dict[str, list[Row]] = {}
+
+    async def add(self, table: str, row: Row):
+        self.rows.setdefault(table, []).append(row)
+
+    async def _write_batch(self, table: str, rows: list[Row]):
+        pass
+
+
+def partition_rows(rows: list[AnimalRecord], shards: int) -> list[list[AnimalRecord]]:
+    """
+    Hash-partitions the animals table rows by page URL, so every row of a page, and thus its single fetch,
+    lands in the same shard. The rows keep their table order within each shard.
+    """
+    partitions: list[list[AnimalRecord]] = [[] for _ in range(shards)]
+    for row in rows:
+        partitions[crc32(row.page_url.encode()) % shards].append(row)
+    return partitions
+
+
+def _shard_rate_limit(rate_limit: RateLimit, shards: int) -> RateLimit:
+    return RateLimit(requests_per_second=rate_limit.requests_per_second / shards,
+                     burst=max(1, rate_limit.burst // shards))
+
+
+def crawl_shard(settings: ShardSettings, shards: int, rows: list[AnimalRecord]) -> ShardResult:
+    """
+    Runs the page and image stages of a shard's rows on a new event loop, in a worker process.
+    """
+    return run(_crawl_shard(settings, shards, rows))
+
+
+async def _crawl_shard(settings: ShardSettings, shards: int, rows: list[AnimalRecord]) -> ShardResult:
+    metrics = PipelineMetrics() if settings.metrics else None
+    rate_limiter = None
+    if settings.default_rate_limit:
+        rate_limiter = HostRateLimiter(
+            default_limit=_shard_rate_limit(settings.default_rate_limit, shards),
+            host_limits={host: _shard_rate_limit(rate_limit, shards)
+                         for host, rate_limit in settings.host_rate_limits.items()},
+        )
+    byte_budget = ByteBudget(settings.byte_budget_bytes // shards, metrics) if settings.byte_budget_bytes else None
+    image_rows = CollectedRows()
+    async with HTTPXClient(rate_limiter=rate_limiter, retry_policy=settings.retry_policy,
+                           circuit_breaker=HostCircuitBreaker(), metrics=metrics,
+                           transport_profile=settings.transport_profile, **settings.client_kwargs) as client:
+        image_downloader = ImageDownloader(
+            client,
+            settings.destination_dir,
+            fsync_policy=settings.fsync_policy,
+            max_image_size=settings.max_image_size,
+            thumbnail_width=settings.thumbnail_width,
+            byte_budget=byte_budget,
+            metrics=metrics,
+            output_sink=image_rows,
+        )
+        # Each worker is a process of its own, so its parsing runs inline on its event loop.
+        animals_processor = await AnimalsPageProcessor.create(
+            client=client,
+            concurrency=settings.concurrency,
+            image_downloader=image_downloader,
+            parse_executor=ParseExecutor(parser_backend=settings.parser_backend),
+            head_only_pages=settings.head_only_pages,
+            page_images_api_url=settings.page_images_api_url,
+            metrics=metrics,
+            parsed_rows=rows,
+            byte_budget=byte_budget,
+        )
+        await animals_processor.run()
+    return ShardResult(animals_processor.dead_letters, image_rows.rows.get(IMAGES_TABLE, []), metrics)
+
+
+class ShardedCrawl:
+    """
+    Crawls the animal pages and images with several processes, each one with its own event loop,
+    HTTP client and consumers, to use more than one CPU for the page parsing and the rest of the pipeline.
+    The list page is fetched and parsed once, its rows are hash-partitioned between the shards,
+    and the adjective groups, dead letters, image rows and metrics of the shards are merged back.
+    A shard whose worker fails dead-letters its rows, the results of the other shards are kept.
+    """
+    SHARD_STAGE: Final[str] = "shard"
+
+    def __init__(self, settings: ShardSettings, shards: int, metrics: Optional[PipelineMetrics] = None,
+                 output_sink: Optional[RowSink] = None):
+        """
+        :param settings: Settings of every shard.
+        :param shards: Number of worker processes.
+        :param metrics: Optional metrics that the metrics of the shards are merged into.
+        :param output_sink: Optional output of the animals rows and of the images saved by the shards.
+        """
+        self.settings = settings.model_copy(update={"metrics": settings.metrics or metrics is not None})
+        self.shards = shards
+        self.metrics = metrics
+        self.output_sink = output_sink
+        self.collateral_adjectives_groups = AdjectiveIndex()
+        self.dead_letters: list[DeadLetterItem] = []
+
+    async def run(self, client: HTTPXClient, parse_executor: ParseExecutor,
+                  resource_url: str = AnimalsPageProcessor.RESOURCE_URL):
+        """
+        Fetches and parses the animals list page, then crawls its rows' pages and images in the shards.
+
+        :param client: HTTP client of the list page request.
+        :param parse_executor: Executor of the list page parsing.
+        :param resource_url: URL of the animals list page.
+        """
+        html_content = await AnimalsPageProcessor._fetch_resource_content(client, resource_url)
+        rows = await parse_executor.run(parse_animal_table, html_content, resource_url, parse_executor.parser_backend)
+        await self.crawl(rows)
+
+    async def crawl(self, rows: list[AnimalRecord]):
+        """
+        Crawls the pages and images of the parsed animals table rows in the shards.
+
+        :param rows: The animals table rows.
+        """
+        for row in rows:
+            for collateral_adjective in row.collateral_adjectives:
+                self.collateral_adjectives_groups.add(collateral_adjective, row.name)
+            if self.output_sink:
+                await self.output_sink.add(ANIMALS_TABLE, {
+                    "name": row.name,
+                    "page_url": row.page_url,
+                    "collateral_adjectives": list(row.collateral_adjectives),
+                })
+
+        loop = get_running_loop()
+        partitions = partition_rows(rows, self.shards)
+        logger.info(f"Crawling {len(rows)} animals in {self.shards} shards of {[len(p) for p in partitions]} rows")
+        with ProcessPoolExecutor(max_workers=self.shards) as executor:
+            results: list[ShardResult | BaseException] = await gather(*(
+                loop.run_in_executor(executor, crawl_shard, self.settings, self.shards, partition)
+                for partition in partitions
+            ), return_exceptions=True)
+
+        for shard_index, (partition, result) in enumerate(zip(partitions, results)):
+            if isinstance(result, BaseException):
+                logger.error(f"Shard {shard_index} failed, its {len(partition)} animals are dropped: {result!r}")
+                self.dead_letters.extend(
+                    DeadLetterItem(stage=self.SHARD_STAGE, item_name=row.name, url=row.page_url, error=repr(result))
+                    for row in partition
+                )
+                continue
+            self.dead_letters.extend(result.dead_letters)
+            if self.metrics and result.metrics:
+                self.metrics.merge(result.metrics)
+            if self.output_sink:
+                for image_row in result.image_rows:
+                    await self.output_sink.add(IMAGES_TABLE, image_row)
+        if self.output_sink:
+            await self.output_sink.flush()
+        if self.dead_letters:
+            logger.warning(f"{len(self.dead_letters)} items failed and were dropped in the shards")
@@ -0,0 +1,52 @@
+from asyncio import sleep
+from logging import getLogger
+from typing import AsyncIterator, Sequence
+
+from src.handlers.async_http_client import HTTPXClient
+from src.processors.html_parsers.animals_html_parser import StreamingAnimalsHTMLParser
+from src.processors.html_parsers.constants import ListPageTables
+from src.processors.html_parsers.schemas import AnimalRecord
+from src.processors.html_parsers.table_specs import ANIMALS_TABLE_SPEC, TableRow, TableSpec
+
+logger = getLogger(__name__)
+
+
+class StreamedAnimalsTable:
+    """
+    The animals table rows, and the rows of the other table specs, parsed while the animals list page is downloaded.
+    Each row is yielded as soon as its closing tag arrives, so the page consumers start
+    before the list page download ends and the whole page is never held in memory.
+    """
+
+    def __init__(self, client: HTTPXClient, resource_url: str, table_specs: Sequence[TableSpec] = ()):
+        """
+        :param client: HTTPXClient's instance for making HTTP requests.
+        :param resource_url: URL of the animals list page.
+        :param table_specs: Specs of the other tables of the list page, parsed in the same pass.
+        """
+        self.client = client
+        self.resource_url = resource_url
+        self.table_specs = table_specs
+
+    async def aiter_animal_table(self) -> AsyncIterator[AnimalRecord]:
+        """Streams the animals list page and yields its animals table rows."""
+        async for table_row in self.aiter_tables():
+            if table_row.table == ListPageTables.ANIMALS:
+                yield table_row.row
+
+    async def aiter_tables(self) -> AsyncIterator[TableRow]:
+        """
+        Streams the animals list page and yields the rows of its tables, the animals rows as compact records.
+        The rest of the body is still read after the tables end, so the response cache gets the whole page.
+        """
+        parser = StreamingAnimalsHTMLParser(resource_url=self.resource_url,
+                                            table_specs=[ANIMALS_TABLE_SPEC, *self.table_specs])
+        async with self.client.stream(self.resource_url) as streamed_response:
+            async for chunk in streamed_response.aiter_bytes():
+                for table_row in parser.feed_tables(chunk):
+                    yield table_row
+                # Let the consumers run between the chunks of a fast (or cached) download.
+                await sleep(0)
+        for table_row in parser.close_tables():
+            yield table_row
+        logger.info(f"Successfully streamed: {self.resource_url}")
@@ -0,0 +1,14 @@
+from src.processors.adjective_index import AdjectiveIndex
+
+
+class TestAdjectiveIndex:
+    def test_groups_share_names(self):
+        index = AdjectiveIndex()
+        index.add("lupine", "Wolf")
+        index.add("canine", "Wolf")
+        index.add("canine", "Dog")
+
+        assert index == {"lupine": ["Wolf"], "canine": ["Wolf", "Dog"]}
+        assert "canine" in index and "feline" not in index
+        assert list(index.group_ids("canine")) == [0, 1]
+        assert index.name(index.group_ids("lupine")[0]) == "Wolf"
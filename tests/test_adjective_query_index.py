@@ -0,0 +1,112 @@
+import mmap
+from asyncio import open_connection, wait_for
+
+import httpx
+import pytest
+
+from src.handlers.adjective_query_server import AdjectiveQueryServer
+from src.processors.adjective_query_index import AdjectiveQueryIndex, normalize_term, write_index
+
+
+@pytest.fixture
+def collateral_adjectives_groups():
+    return {
+        "Lupine": ["Wolf"],
+        "canine ": ["Wolf", "Dog", " dog"],
+        "lupine": ["wolf"],
+        "bovine": ["Cattle", "Ox"],
+        "": ["Cat"],
+    }
+
+
+class TestAdjectiveQueryIndex:
+    def test_normalized_bidirectional_lookups(self, collateral_adjectives_groups):
+        assert normalize_term("  Honey \n Bee ") == "honey bee"
+        with AdjectiveQueryIndex.from_groups(collateral_adjectives_groups) as index:
+            assert (index.adjectives_count, index.animals_count) == (3, 4)
+            assert index.animals("LUPINE") == ["Wolf"]
+            assert index.animals("canine") == ["Dog", "Wolf"]
+            assert index.adjectives(" WOLF ") == ["canine", "Lupine"]
+            assert index.animals("feline") is None and index.adjectives("Cat") is None
+
+    def test_prefix_search(self, collateral_adjectives_groups):
+        with AdjectiveQueryIndex.from_groups(collateral_adjectives_groups) as index:
+            assert index.search_adjectives("lup") == ["Lupine"]
+            assert index.search_adjectives("") == ["bovine", "canine", "Lupine"]
+            assert index.search_animals("", limit=2) == ["Cattle", "Dog"]
+            assert index.search_animals("z") == []
+
+    def test_memory_mapped_index_file(self, tmp_path, collateral_adjectives_groups):
+        index_path = tmp_path / "adjectives.idx"
+        write_index(index_path, collateral_adjectives_groups)
+        with AdjectiveQueryIndex.load(index_path) as index:
+            assert index.animals("bovine") == ["Cattle", "Ox"]
+
+    def test_file_that_is_not_an_index_is_unmapped(self, tmp_path, monkeypatch):
+        index_path = tmp_path / "adjectives.idx"
+        index_path.write_bytes(b"not an index")
+        buffers, mmap_type = [], mmap.mmap
+
+        def recorded_mmap(*args, **kwargs):
+            buffers.append(mmap_type(*args, **kwargs))
+            return buffers[-1]
+
+        monkeypatch.setattr(mmap, "mmap", recorded_mmap)
+        with pytest.raises(ValueError):
+            AdjectiveQueryIndex.load(index_path)
+        assert [buffer.closed for buffer in buffers] == [True]
+
+
+class TestAdjectiveQueryServer:
+    @pytest.mark.asyncio
+    async def test_lookups_over_http(self, collateral_adjectives_groups):
+        with AdjectiveQueryIndex.from_groups(collateral_adjectives_groups) as index:
+            async with AdjectiveQueryServer(index, port=0) as server, \
+                    httpx.AsyncClient(base_url=f"http://127.0.0.1:{server.port}") as client:
+                adjective_response = await client.get("/adjectives/Canine")
+                animal_response = await client.get("/animals/wolf")
+                search_response = await client.get("/search", params={"prefix": "c", "limit": 1})
+                await client.get("/adjectives/Canine")
+                missing_response = await client.get("/animals/Cat")
+
+        assert adjective_response.json() == {"adjective": "canine", "animals": ["Dog", "Wolf"]}
+        assert animal_response.json() == {"animal": "Wolf", "adjectives": ["canine", "Lupine"]}
+        assert search_response.json() == {"prefix": "c", "adjectives": ["canine"], "animals": ["Cattle"]}
+        assert missing_response.status_code == 404
+        assert server.reply.cache_info().hits == 1
+
+    @pytest.mark.asyncio
+    async def test_over_long_request_lines(self, collateral_adjectives_groups):
+        with AdjectiveQueryIndex.from_groups(collateral_adjectives_groups) as index:
+            async with AdjectiveQueryServer(index, port=0) as server:
+                status_lines = []
+                for request in [
+                    b"GET /adjectives/" + b"a" * 70_000 + b" HTTP/1.1\r\n\r\n",
+                    b"GET /adjectives/canine HTTP/1.1\r\nX-Long: " + b"a" * 70_000 + b"\r\n\r\n",
+                ]:
+                    reader, writer = await open_connection("127.0.0.1", server.port)
+                    writer.write(request)
+                    status_lines.append(await reader.readline())
+                    writer.close()
+
+        assert status_lines == [b"HTTP/1.1 414 URI Too Long\r\n", b"HTTP/1.1 400 Bad Request\r\n"]
+
+    @pytest.mark.asyncio
+    async def test_requests_with_a_body(self, collateral_adjectives_groups):
+        with AdjectiveQueryIndex.from_groups(collateral_adjectives_groups) as index:
+            async with AdjectiveQueryServer(index, port=0) as server:
+                responses = []
+                for request in [
+                    b"POST /adjectives/canine HTTP/1.1\r\nContent-Length: 5\r\n\r\nGET /",
+                    b"GET /adjectives/canine HTTP/1.1\r\nContent-Length: 5\r\n\r\nGET /",
+                ]:
+                    reader, writer = await open_connection("127.0.0.1", server.port)
+                    writer.write(request)
+                    # The body is never read as a next request, the server closes the connection after its response.
+                    responses.append(await wait_for(reader.read(), timeout=5))
+                    writer.close()
+
+        assert responses[0].startswith(b"HTTP/1.1 405 Method Not Allowed\r\n")
+        assert b"\r\nAllow: GET\r\nConnection: close\r\n" in responses[0]
+        assert responses[1].startswith(b"HTTP/1.1 200 OK\r\n") and responses[1].count(b"HTTP/1.1") == 1
+        assert b"\r\nConnection: close\r\n" in responses[1]
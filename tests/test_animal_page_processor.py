@@ -0,0 +1,58 @@
+import httpx
+import pytest
+
+from src.handlers.async_http_client import HTTPXClient
+from src.processors.animal_page_processor import AnimalPageProcessor
+from src.processors.html_parsers.constants import ParserBackend
+from src.processors.parse_executor import ParseExecutor
+
+CHUNK_SIZE = 64
+
+
+@pytest.fixture
+def mock_page_content():
+    head = (
+        b"<!DOCTYPE html><html><head><title>Animal1 - Wikipedia</title>"
+        b'<meta property="og:image" content="//upload.test/Animal1.jpg"></head>'
+    )
+    return head + b"<body>" + b"<p>Article text.</p>" * 10_000 + b"</body></html>"
+
+
+@pytest.fixture
+def sent_chunks():
+    return []
+
+
+@pytest.fixture
+def mock_transport(mock_page_content, sent_chunks):
+    async def page_chunks():
+        for start in range(0, len(mock_page_content), CHUNK_SIZE):
+            chunk = mock_page_content[start:start + CHUNK_SIZE]
+            sent_chunks.append(chunk)
+            yield chunk
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        return httpx.Response(200, content=page_chunks())
+
+    return httpx.MockTransport(handler)
+
+
+class TestAnimalPageProcessor:
+    @pytest.mark.asyncio
+    @pytest.mark.parametrize("head_only", [False, True])
+    @pytest.mark.parametrize("parser_backend", list(ParserBackend))
+    async def test_extract_image_url(self, mock_transport, head_only, parser_backend):
+        async with HTTPXClient(transport=mock_transport) as client:
+            parse_executor = ParseExecutor(parser_backend=parser_backend)
+            processor = AnimalPageProcessor(client, parse_executor, head_only=head_only)
+            image_url = await processor.extract_image_url("https://test/wiki/Animal1")
+
+        assert image_url == "https://upload.test/Animal1.jpg"
+
+    @pytest.mark.asyncio
+    async def test_head_only_stops_reading_after_head(self, mock_transport, mock_page_content, sent_chunks):
+        async with HTTPXClient(transport=mock_transport) as client:
+            processor = AnimalPageProcessor(client, head_only=True)
+            await processor.extract_image_url("https://test/wiki/Animal1")
+
+        assert sum(map(len, sent_chunks)) < len(mock_page_content) // 100
@@ -1,7 +1,11 @@
+from dataclasses import replace
+
 import pytest
 
-from src.processors.html_parsers.animals_html_parser import AnimalsHTMLParser
-from src.processors.html_parsers.schemas import ParsedAnimalData
+from src.processors.html_parsers.animals_html_parser import AnimalsHTMLParser, StreamingAnimalsHTMLParser
+from src.processors.html_parsers.constants import ParserBackend
+from src.processors.html_parsers.schemas import AnimalTermsData, AnimalRecord
+from src.processors.html_parsers.table_specs import ANIMAL_TERMS_TABLE_SPEC, ANIMALS_TABLE_SPEC
 
 
 @pytest.fixture()
@@ -33,9 +37,56 @@ def mock_html_content():
 
 
 @pytest.fixture()
-def mock_animals_html_parser(mock_html_content):
+def mock_complex_html_content():
+    """A table with references, line breaks, comments, empty cells and rows without links."""
+    return """
+    <html>
+    <h2><span class="mw-headline" id="Other">Other</span></h2>
+    <table class="wikitable sortable"><tr><th>Animal</th><th>Collateral adjective</th></tr>
+    <tr><td><a href="/wiki/Wrong" title="Wrong">Wrong</a></td><td>wrong</td></tr></table>
+    <h2><span class="mw-headline" id="Terms_by_species_or_taxon">Terms by species or taxon</span></h2>
+    <table class="wikitable sortable">
+    <tbody>
+    <tr>
+    <th>Animal</th>
+    <th>Young<sup>[a]</sup></th>
+    <th> Collateral adjective<!-- comment --> </th>
+    </tr>
+    <tr>
+    <td><a href="/wiki/Wolf" title="Wolf">Wolf</a><sup>[1]</sup></td>
+    <td>pup</td>
+    <td>lupine<sup>[2]</sup><br>canine <i>(dog)</i><!-- note --></td>
+    </tr>
+    <tr>
+    <td><a href="/wiki/Bee" title="Bee">Bee</a></td>
+    <td>larva</td>
+    <td>apian &amp; melittine</td>
+    </tr>
+    <tr>
+    <td><a href="/wiki/Ant" title="Ant">Ant</a></td>
+    <td>antling</td>
+    <td>—</td>
+    </tr>
+    <tr>
+    <td>No link</td>
+    <td>none</td>
+    <td>unknown</td>
+    </tr>
+    <tr><td colspan="3">Section row</td></tr>
+    <tr>
+    <td><a href="https://other.test/wiki/Yak" title="Yak">Yak</a></td>
+    <td>calf</td>
+    <td><a href="/wiki/Bovine">bovine</a>, <span>caprine</span></td>
+    </tr>
+    </tbody></table>
+    </html>
+    """
+
+
+@pytest.fixture(params=list(ParserBackend))
+def mock_animals_html_parser(request, mock_html_content):
     return AnimalsHTMLParser.create(
-        html_content=mock_html_content, resource_url="https://test"
+        html_content=mock_html_content, resource_url="https://test", backend=request.param
     )
 
 
@@ -46,21 +97,84 @@ class TestAnimalsHTMLParser:
             for parsed_animal in mock_animals_html_parser.parse_animal_table()
         ]
         excepted_parsed_animals = [
-            ParsedAnimalData(
+            AnimalRecord(
                 name="Animal1",
-                collateral_adjectives=["Test1"],
+                collateral_adjectives=("Test1",),
                 page_url="https://test/wiki/Animal1",
             ),
-            ParsedAnimalData(
+            AnimalRecord(
                 name="Animal2",
-                collateral_adjectives=["Test2"],
+                collateral_adjectives=("Test2",),
                 page_url="https://test/wiki/Animal2",
             ),
-            ParsedAnimalData(
+            AnimalRecord(
                 name="Animal3",
-                collateral_adjectives=["Test2"],
+                collateral_adjectives=("Test2",),
                 page_url="https://test/wiki/Animal3",
             ),
         ]
 
         assert excepted_parsed_animals == parsed_animals
+
+    @pytest.mark.parametrize("encode", [False, True])
+    def test_backends_parity(self, mock_complex_html_content, encode):
+        html_content = mock_complex_html_content.encode() if encode else mock_complex_html_content
+        parsed_animals_by_backend = [
+            list(
+                AnimalsHTMLParser.create(
+                    html_content=html_content, resource_url="https://test", backend=backend
+                ).parse_animal_table()
+            )
+            for backend in ParserBackend
+        ]
+
+        beautifulsoup_animals, lxml_animals = parsed_animals_by_backend
+        assert [animal.name for animal in beautifulsoup_animals] == ["Wolf", "Bee", "Yak"]
+        assert lxml_animals == beautifulsoup_animals
+
+    def test_streaming_parser_parity(self, mock_complex_html_content):
+        html_content = mock_complex_html_content.encode()
+        streaming_parser = StreamingAnimalsHTMLParser(resource_url="https://test")
+        streamed_animals = []
+        for start in range(0, len(html_content), 16):
+            streamed_animals.extend(streaming_parser.feed(html_content[start:start + 16]))
+        streamed_animals.extend(streaming_parser.close())
+
+        lxml_animals = list(
+            AnimalsHTMLParser.create(
+                html_content=html_content, resource_url="https://test", backend=ParserBackend.LXML
+            ).parse_animal_table()
+        )
+        assert streamed_animals == lxml_animals
+
+    def test_parse_tables_in_one_pass(self, mock_complex_html_content):
+        html_content = mock_complex_html_content.encode()
+        orphan_spec = replace(ANIMAL_TERMS_TABLE_SPEC, name="orphan", span_id="Missing_section")
+        table_specs = [ANIMALS_TABLE_SPEC, ANIMAL_TERMS_TABLE_SPEC, orphan_spec]
+        table_rows_by_backend = [
+            list(
+                AnimalsHTMLParser.create(
+                    html_content=html_content, resource_url="https://test", backend=backend
+                ).parse_tables(table_specs)
+            )
+            for backend in ParserBackend
+        ]
+        streaming_parser = StreamingAnimalsHTMLParser(resource_url="https://test", table_specs=table_specs)
+        streamed_table_rows = []
+        for start in range(0, len(html_content), 16):
+            streamed_table_rows.extend(streaming_parser.feed_tables(html_content[start:start + 16]))
+        streamed_table_rows.extend(streaming_parser.close_tables())
+
+        beautifulsoup_rows, lxml_rows = table_rows_by_backend
+        assert lxml_rows == beautifulsoup_rows == streamed_table_rows
+        assert [row.name for table, row in lxml_rows if table == "animals"] == ["Wolf", "Bee", "Yak"]
+        assert [row for table, row in lxml_rows if table == "animal_terms"][:2] == [
+            AnimalTermsData(name="Wolf", page_url="https://test/wiki/Wolf", young=["pup"]),
+            AnimalTermsData(name="Bee", page_url="https://test/wiki/Bee", young=["larva"]),
+        ]
+
+    def test_missing_required_table(self, mock_html_content):
+        missing_spec = replace(ANIMALS_TABLE_SPEC, span_id="Missing_section")
+        parser = AnimalsHTMLParser.create(html_content=mock_html_content, resource_url="https://test")
+        with pytest.raises(ValueError):
+            list(parser.parse_tables([missing_spec]))
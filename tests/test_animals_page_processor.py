@@ -6,26 +6,26 @@ import pytest
 from src.handlers.image_downloader import ImageDownloader
 from src.processors.animal_page_processor import AnimalPageProcessor
 from src.processors.html_parsers.animals_html_parser import AnimalsHTMLParser
-from src.processors.html_parsers.schemas import ParsedAnimalData
+from src.processors.html_parsers.schemas import AnimalRecord
 from src.processors.animals_page_processor import AnimalsPageProcessor
 from src.common.schemas import PageQueueItem
 
 @pytest.fixture
 def mock_parsed_animals():
     return [
-        ParsedAnimalData(
+        AnimalRecord(
             name="Animal1",
-            collateral_adjectives=["Test1"],
+            collateral_adjectives=("Test1",),
             page_url="https://test/wiki/Animal1",
         ),
-        ParsedAnimalData(
+        AnimalRecord(
             name="Animal2",
-            collateral_adjectives=["Test2"],
+            collateral_adjectives=("Test2",),
             page_url="https://test/wiki/Animal2",
         ),
-        ParsedAnimalData(
+        AnimalRecord(
             name="Animal3",
-            collateral_adjectives=["Test2"],
+            collateral_adjectives=("Test2",),
             page_url="https://test/wiki/Animal3",
         ),
     ]
@@ -87,3 +87,45 @@ class TestAnimalsPageProcessor:
             excepted_collateral_adjectives_groups
             == mock_animals_processor.collateral_adjectives_groups
         )
+
+    @pytest.mark.asyncio
+    async def test_process_wiki_page_dedups_page_urls(
+        self, mock_animals_processor, mock_parsed_animals
+    ):
+        synonym = AnimalRecord(
+            name="Animal1 synonym",
+            collateral_adjectives=("Test1",),
+            page_url="https://test/wiki/Animal1",
+        )
+        mock_animals_processor.content_parser.parse_animal_table.return_value = iter(
+            [*mock_parsed_animals, synonym]
+        )
+
+        # run method
+        await mock_animals_processor._process_animals_wiki_page()
+
+        assert mock_animals_processor.page_queue.qsize() == len(mock_parsed_animals)
+        assert mock_animals_processor.page_deduplicator.page_fetches_saved == 1
+        assert mock_animals_processor.collateral_adjectives_groups["Test1"] == ["Animal1", "Animal1 synonym"]
+        # The synonym gets the image of Animal1 once its page is resolved
+        assert mock_animals_processor.page_deduplicator.resolve_page(
+            "https://test/wiki/Animal1", "https://test/Animal1.jpg"
+        ) == ["Animal1 synonym"]
+
+    @pytest.mark.asyncio
+    async def test_late_duplicate_of_a_failed_page_is_dead_lettered(
+        self, mock_animals_processor, mock_parsed_animals
+    ):
+        await mock_animals_processor._process_animals_wiki_page()
+        mock_animals_processor.page_deduplicator.resolve_page("https://test/wiki/Animal1", None, "ValueError()")
+
+        synonym = AnimalRecord(
+            name="Animal1 synonym",
+            collateral_adjectives=("Test1",),
+            page_url="https://test/wiki/Animal1",
+        )
+        await mock_animals_processor._queue_animal(synonym)
+
+        assert mock_animals_processor.image_queue.empty()
+        [dead_letter] = mock_animals_processor.queue_dead_letters
+        assert (dead_letter.item_name, dead_letter.error) == ("Animal1 synonym", "ValueError()")
@@ -0,0 +1,109 @@
+from asyncio import gather, sleep
+
+import httpx
+import pytest
+
+from src.handlers.async_http_client import HTTPXClient
+from src.handlers.circuit_breaker import CircuitState, HostCircuitBreaker
+from src.handlers.retry_policy import RetryPolicy
+from src.handlers.transport_profile import TransportProfile
+
+
+@pytest.fixture
+def requests_log():
+    return []
+
+
+@pytest.fixture
+def mock_transport(requests_log):
+    async def handler(request: httpx.Request) -> httpx.Response:
+        requests_log.append(request)
+        await sleep(0.01)
+        return httpx.Response(200, content=request.url.path.encode())
+
+    return httpx.MockTransport(handler)
+
+
+class TestHTTPXClient:
+    @pytest.mark.asyncio
+    async def test_concurrent_gets_are_coalesced(self, mock_transport, requests_log):
+        async with HTTPXClient(transport=mock_transport) as client:
+            responses = await gather(
+                *(client.get("https://test/wiki/Animal1") for _ in range(3)), client.get("https://test/wiki/Animal2")
+            )
+
+        assert [response.content for response in responses] == [b"/wiki/Animal1"] * 3 + [b"/wiki/Animal2"]
+        assert len(requests_log) == 2
+        assert client.coalesced_requests == 2
+
+    @pytest.mark.asyncio
+    async def test_sequential_gets_are_not_coalesced(self, mock_transport, requests_log):
+        async with HTTPXClient(transport=mock_transport) as client:
+            await client.get("https://test/wiki/Animal1")
+            await client.get("https://test/wiki/Animal1")
+
+        assert len(requests_log) == 2
+
+    @pytest.mark.asyncio
+    async def test_transport_profile(self, tmp_path, mock_transport, requests_log):
+        config_path = tmp_path / "transport.json"
+        config_path.write_text('{"accept_encoding": "deflate", "connect_timeout": 2.5, "read_timeout": 20}')
+        transport_profile = TransportProfile.load(
+            config_path, environ={"TRANSPORT_ACCEPT_ENCODING": "gzip"}, max_connections=20, read_timeout=5,
+        )
+        assert (transport_profile.max_connections, transport_profile.read_timeout) == (20, 20.0)
+
+        async with HTTPXClient(transport_profile=transport_profile, transport=mock_transport) as client:
+            await client.get("https://test/wiki/Animal1")
+
+        assert requests_log[0].headers["Accept-Encoding"] == "gzip"
+        assert requests_log[0].extensions["timeout"] == {"connect": 2.5, "read": 20.0, "write": 10.0, "pool": 10.0}
+
+    @pytest.mark.asyncio
+    async def test_throttling_does_not_open_the_circuit(self):
+        def handler(request: httpx.Request) -> httpx.Response:
+            status_code = int(request.url.path.removeprefix("/status/"))
+            return httpx.Response(status_code, headers={"Retry-After": "1"} if status_code == 503 else {})
+
+        circuit_breaker = HostCircuitBreaker(failure_threshold=2)
+        async with HTTPXClient(circuit_breaker=circuit_breaker, retry_policy=RetryPolicy(max_attempts=1),
+                               transport=httpx.MockTransport(handler)) as client:
+            for status_code in [500, 503, 429, 503]:
+                with pytest.raises(ConnectionError):
+                    await client.get(f"https://test/status/{status_code}")
+            assert circuit_breaker.states() == {"test": CircuitState.CLOSED}
+
+            with pytest.raises(ConnectionError):
+                await client.get("https://test/status/500")
+            assert circuit_breaker.states() == {"test": CircuitState.OPEN}
+
+    @pytest.mark.asyncio
+    async def test_unavailable_host_without_retry_after_opens_the_circuit(self):
+        circuit_breaker = HostCircuitBreaker(failure_threshold=2)
+        async with HTTPXClient(circuit_breaker=circuit_breaker, retry_policy=RetryPolicy(max_attempts=1),
+                               transport=httpx.MockTransport(lambda request: httpx.Response(503))) as client:
+            for _ in range(2):
+                with pytest.raises(ConnectionError):
+                    await client.get("https://test/page")
+            assert circuit_breaker.states() == {"test": CircuitState.OPEN}
+
+    @pytest.mark.asyncio
+    async def test_throttled_trial_request_lets_the_next_one_through(self):
+        statuses = [500, 429, 200]
+
+        def handler(request: httpx.Request) -> httpx.Response:
+            return httpx.Response(statuses.pop(0))
+
+        circuit_breaker = HostCircuitBreaker(failure_threshold=1, recovery_timeout=0.01)
+        async with HTTPXClient(circuit_breaker=circuit_breaker, retry_policy=RetryPolicy(max_attempts=1),
+                               transport=httpx.MockTransport(handler)) as client:
+            with pytest.raises(ConnectionError):
+                await client.get("https://test/page")
+            await sleep(0.02)
+            with pytest.raises(ConnectionError):
+                await client.get("https://test/page")
+            assert circuit_breaker.states() == {"test": CircuitState.HALF_OPEN}
+
+            # The throttled trial does not hold the circuit half open until its trial times out.
+            await client.get("https://test/page")
+            assert circuit_breaker.states() == {"test": CircuitState.CLOSED}
@@ -0,0 +1,47 @@
+from asyncio import create_task, sleep
+
+import pytest
+
+from src.handlers.byte_budget import ByteBudget
+
+
+class TestByteBudget:
+    @pytest.mark.asyncio
+    async def test_reservations_wait_for_released_bytes(self):
+        byte_budget = ByteBudget(100)
+        first_size = await byte_budget.reserve(60)
+        second_reservation = create_task(byte_budget.reserve(50))
+        third_reservation = create_task(byte_budget.reserve(10))
+        await sleep(0)
+        # Reservations are granted in FIFO order, the third one waits behind the second one though it fits.
+        assert not second_reservation.done() and not third_reservation.done()
+
+        byte_budget.release(first_size)
+        assert await second_reservation == 50 and await third_reservation == 10
+        stats = byte_budget.stats()
+        assert (stats.used_bytes, stats.peak_bytes, stats.waited_reservations) == (60, 60, 2)
+
+    @pytest.mark.asyncio
+    async def test_oversized_and_resized_reservations(self):
+        byte_budget = ByteBudget(100)
+        async with byte_budget.reserved(500):
+            # A reservation larger than the budget is granted once the budget is unused.
+            assert byte_budget.used_bytes == 500
+        async with byte_budget.reserved(10) as reservation:
+            reservation.resize(30)
+            assert byte_budget.used_bytes == 30
+        assert byte_budget.used_bytes == 0
+
+    @pytest.mark.asyncio
+    async def test_cancelled_reservation_is_dropped(self):
+        byte_budget = ByteBudget(100)
+        await byte_budget.reserve(100)
+        cancelled_reservation = create_task(byte_budget.reserve(50))
+        next_reservation = create_task(byte_budget.reserve(50))
+        await sleep(0)
+        cancelled_reservation.cancel()
+        await sleep(0)
+
+        byte_budget.release(50)
+        assert await next_reservation == 50
+        assert byte_budget.used_bytes == 100
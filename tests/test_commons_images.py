@@ -0,0 +1,24 @@
+import pytest
+
+from src.handlers.commons_images import commons_thumbnail_url, detect_image_format
+
+COMMONS_URL = "https://upload.wikimedia.org/wikipedia/commons"
+
+
+class TestCommonsImages:
+    @pytest.mark.parametrize("image_url, thumbnail_url", [
+        (f"{COMMONS_URL}/a/ab/Wolf.jpg", f"{COMMONS_URL}/thumb/a/ab/Wolf.jpg/320px-Wolf.jpg"),
+        (f"{COMMONS_URL}/thumb/a/ab/Wolf.jpg/1200px-Wolf.jpg", f"{COMMONS_URL}/thumb/a/ab/Wolf.jpg/320px-Wolf.jpg"),
+        (f"{COMMONS_URL}/thumb/a/ab/Wolf.jpg/250px-Wolf.jpg", f"{COMMONS_URL}/thumb/a/ab/Wolf.jpg/250px-Wolf.jpg"),
+        (f"{COMMONS_URL}/c/cd/Bee.svg", f"{COMMONS_URL}/thumb/c/cd/Bee.svg/320px-Bee.svg.png"),
+        (f"{COMMONS_URL}/c/cd/Bee.tif", None),
+        ("https://test/images/Wolf.jpg", None),
+    ])
+    def test_thumbnail_url(self, image_url, thumbnail_url):
+        assert commons_thumbnail_url(image_url, 320) == thumbnail_url
+
+    def test_format_is_detected_from_content_type_then_magic_bytes(self):
+        assert detect_image_format("image/png; charset=binary", b"\xff\xd8\xff", "https://test/Wolf.jpg") == "png"
+        assert detect_image_format("application/octet-stream", b"\xff\xd8\xff", "https://test/Wolf.png") == "jpg"
+        assert detect_image_format(None, b"RIFF\x00\x00\x00\x00WEBPVP8", "https://test/Wolf") == "webp"
+        assert detect_image_format(None, b"", "https://test/Wolf.JPG") == "jpg"
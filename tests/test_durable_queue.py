@@ -0,0 +1,188 @@
+import socket
+import subprocess
+import sys
+from asyncio import create_task
+
+import httpx
+import pytest
+
+from src.common.schemas import PageQueueItem
+from src.handlers.async_http_client import HTTPXClient
+from src.handlers.durable_queue import DurableQueue, ItemState, SQLiteQueueBackend, SQLiteQueueStore, item_payload
+from src.handlers.image_downloader import ImageDownloader
+from src.handlers.metrics import PipelineMetrics
+from src.handlers.output_sinks import IMAGES_TABLE
+from src.processors.animals_page_processor import AnimalsPageProcessor
+from src.processors.html_parsers.schemas import AnimalRecord
+from src.processors.sharded_crawl import CollectedRows
+
+
+@pytest.fixture
+def gone_owner():
+    """The lease owner of a process of this host that is no longer running."""
+    process = subprocess.Popen([sys.executable, "-c", "pass"])
+    process.wait()
+    return f"{socket.gethostname()}:{process.pid}:gone"
+
+
+@pytest.fixture
+def page_items():
+    return [PageQueueItem(page_url=f"https://test/wiki/Animal{index}", page_name=f"Animal{index}")
+            for index in range(3)]
+
+
+class TestDurableQueue:
+    @pytest.mark.asyncio
+    async def test_interrupted_run_is_resumed(self, tmp_path, page_items):
+        # A run that is interrupted after finishing the first item, while the second one is in flight.
+        store = SQLiteQueueStore(tmp_path / "queues.sqlite", lease_seconds=0)
+        queue = DurableQueue(store, "page", PageQueueItem)
+        for page_item in page_items:
+            await queue.put(page_item)
+        first_id, first_item = await queue.get()
+        assert first_item == page_items[0]
+        queue.task_done(first_id)
+        assert (await queue.get()).item == page_items[1]
+        store.close()
+
+        store = SQLiteQueueStore(tmp_path / "queues.sqlite")
+        queue = DurableQueue(store, "page", PageQueueItem)
+        assert store.counts("page") == {
+            ItemState.DONE.value: 1, ItemState.IN_FLIGHT.value: 1, ItemState.PENDING.value: 1,
+        }
+        assert await queue.resume() == 2
+        # Items of the previous run are not queued again.
+        for page_item in page_items:
+            await queue.put(page_item)
+        assert queue.qsize() == 2
+
+        queued_items = [await queue.get(), await queue.get()]
+        assert [queued_item.item for queued_item in queued_items] == page_items[1:]
+        for item_id, _ in queued_items:
+            queue.task_done(item_id)
+        await queue.join()
+        assert store.counts("page") == {ItemState.DONE.value: 3}
+        store.close()
+
+    @pytest.mark.asyncio
+    async def test_task_done_completes_the_item_of_its_id(self, tmp_path, page_items):
+        store = SQLiteQueueStore(tmp_path / "queues.sqlite")
+        queue = DurableQueue(store, "page", PageQueueItem)
+        for page_item in page_items[:2]:
+            await queue.put(page_item)
+        first_id, _ = await queue.get()
+        second_id, _ = await create_task(queue.get())
+
+        # The second item is completed by another task than the one that took it.
+        queue.task_done(second_id)
+        store.commit()
+        assert store.state("page", item_payload(page_items[0])) == ItemState.IN_FLIGHT
+        assert store.state("page", item_payload(page_items[1])) == ItemState.DONE
+        with pytest.raises(ValueError):
+            queue.task_done()
+        store.close()
+
+    @pytest.mark.asyncio
+    async def test_item_fails_after_max_attempts(self, tmp_path, page_items):
+        for _ in range(2):
+            store = SQLiteQueueStore(tmp_path / "queues.sqlite", lease_seconds=0, max_attempts=2)
+            queue = DurableQueue(store, "page", PageQueueItem)
+            await queue.resume()
+            await queue.put(page_items[0])
+            await queue.get()
+            store.close()
+
+        store = SQLiteQueueStore(tmp_path / "queues.sqlite", max_attempts=2)
+        assert await DurableQueue(store, "page", PageQueueItem).resume() == 0
+        assert store.counts("page") == {ItemState.FAILED.value: 1}
+        store.close()
+
+    @pytest.mark.asyncio
+    async def test_results_of_a_gone_process_are_replayed(self, tmp_path, page_items, gone_owner):
+        store = SQLiteQueueStore(tmp_path / "queues.sqlite", max_attempts=1)
+        store.owner = gone_owner
+        queue = DurableQueue(store, "page", PageQueueItem)
+        await queue.put(page_items[0])
+        await queue.put(page_items[1])
+        item_id, page_item = await queue.get()
+        queue.task_done(item_id, {"name": page_item.page_name})
+        # The second item is taken max_attempts times and never done.
+        await queue.get()
+        store.close()
+
+        store = SQLiteQueueStore(tmp_path / "queues.sqlite", max_attempts=1)
+        queue = DurableQueue(store, "page", PageQueueItem)
+        assert await queue.resume() == 0
+        for page_item in page_items:
+            await queue.put(page_item)
+        # The done item is not processed again, its result is replayed once.
+        assert [queue.get_nowait().item for _ in range(queue.qsize())] == [page_items[2]]
+        assert queue.pop_exhausted_items() == [page_items[1]]
+        assert queue.finished_results() == [{"name": "Animal0"}]
+        assert queue.finished_results() == []
+        store.close()
+
+    @pytest.mark.asyncio
+    async def test_clear_keeps_the_items_of_other_processes(self, tmp_path, page_items):
+        other_store = SQLiteQueueStore(tmp_path / "queues.sqlite")
+        await DurableQueue(other_store, "page", PageQueueItem).put(page_items[0])
+        other_store.commit()
+
+        store = SQLiteQueueStore(tmp_path / "queues.sqlite")
+        queue = DurableQueue(store, "page", PageQueueItem)
+        await queue.put(page_items[1])
+        queue.task_done((await queue.get()).item_id)
+        store.clear()
+        assert store.counts("page") == {ItemState.PENDING.value: 1}
+
+        other_store.close()
+        store.close()
+
+    @pytest.mark.asyncio
+    async def test_durable_queues_are_metered(self, tmp_path, page_items):
+        metrics = PipelineMetrics()
+        queue_backend = SQLiteQueueBackend(tmp_path / "queues.sqlite", metrics=metrics)
+        queue = queue_backend.queue("page", PageQueueItem, 0)
+        for page_item in page_items:
+            await queue.put(page_item)
+        assert (await queue.get()).item == page_items[0]
+        queue_backend.close()
+
+        assert metrics.gauges["queue_depth"] == {(("queue", "page"),): 2}
+        assert metrics.histograms["queue_wait_seconds"][(("queue", "page"),)].count == 1
+
+    @pytest.mark.asyncio
+    async def test_restarted_run_outputs_the_saved_images_without_fetching_them(self, tmp_path, gone_owner):
+        requested_paths = []
+
+        def handler(request: httpx.Request) -> httpx.Response:
+            requested_paths.append(request.url.path)
+            if request.url.path.startswith("/wiki/"):
+                image_url = f"https://test/images{request.url.path.removeprefix('/wiki')}.jpg"
+                return httpx.Response(200, text=f'<html><head><meta property="og:image" content="{image_url}">')
+            return httpx.Response(200, content=b"jpeg")
+
+        rows = [
+            AnimalRecord(name=f"Animal{index}", collateral_adjectives=(), page_url=f"https://test/wiki/Animal{index}")
+            for index in range(3)
+        ]
+        image_rows = []
+        for run_index in range(2):
+            queue_backend = SQLiteQueueBackend(tmp_path / "queues.sqlite")
+            if run_index == 0:
+                # The first run is interrupted before it clears its queues, its process is gone.
+                queue_backend.store.owner = gone_owner
+            output_sink = CollectedRows()
+            async with HTTPXClient(transport=httpx.MockTransport(handler)) as client:
+                image_downloader = ImageDownloader(client, tmp_path, output_sink=output_sink)
+                animals_processor = await AnimalsPageProcessor.create(
+                    client=client, concurrency=2, image_downloader=image_downloader, output_sink=output_sink,
+                    queue_backend=queue_backend, parsed_rows=rows,
+                )
+                await animals_processor.run()
+            queue_backend.close()
+            image_rows.append(sorted(output_sink.rows[IMAGES_TABLE], key=lambda image_row: image_row["name"]))
+
+        assert len(requested_paths) == 2 * len(rows)
+        assert image_rows[1] == image_rows[0]
+        assert [image_row["name"] for image_row in image_rows[1]] == [row.name for row in rows]
@@ -0,0 +1,104 @@
+import gzip
+
+import httpx
+import pytest
+
+from src.handlers.async_http_client import HTTPXClient
+from src.handlers.http_archive import ArchiveMode, HTTPArchive, HTTPArchiveReader
+from src.handlers.http_cache import HTTPCache
+
+
+@pytest.fixture
+def requests_log():
+    return []
+
+
+@pytest.fixture
+def mock_transport(requests_log):
+    def handler(request: httpx.Request) -> httpx.Response:
+        requests_log.append(request)
+        if request.url.path == "/missing":
+            return httpx.Response(500)
+        if request.headers.get("If-None-Match") == '"v1"':
+            return httpx.Response(304, headers={"ETag": '"v1"'})
+        body = gzip.compress(request.url.path.encode() * 1000)
+        return httpx.Response(200, headers={"Content-Encoding": "gzip", "ETag": '"v1"'}, content=body)
+
+    return httpx.MockTransport(handler)
+
+
+async def record(archive_path, transport, urls):
+    http_archive = HTTPArchive(path=archive_path, mode=ArchiveMode.RECORD)
+    async with HTTPXClient(http_archive=http_archive, transport=transport) as client:
+        for url in urls:
+            await client.get(url)
+
+
+class TestHTTPArchive:
+    @pytest.mark.asyncio
+    async def test_replay_of_recorded_responses(self, tmp_path, mock_transport, requests_log):
+        archive_path = tmp_path / "archive.bin"
+        await record(archive_path, mock_transport, ["https://test/wiki/Wolf"])
+        await record(archive_path, mock_transport, ["https://test/wiki/Bee"])
+        assert len(requests_log) == 2
+
+        http_archive = HTTPArchive(path=archive_path, mode=ArchiveMode.REPLAY, latency=0.001)
+        async with HTTPXClient(http_archive=http_archive, transport=mock_transport) as client:
+            wolf_response = await client.get("https://test/wiki/Wolf")
+            async with client.stream("https://test/wiki/Bee") as streamed_response:
+                bee_body = b"".join([chunk async for chunk in streamed_response.aiter_bytes()])
+            with pytest.raises(ConnectionError):
+                await client.get("https://test/wiki/Cat")
+
+        assert len(requests_log) == 2
+        assert wolf_response.content == b"/wiki/Wolf" * 1000
+        assert wolf_response.headers["ETag"] == '"v1"'
+        assert bee_body == b"/wiki/Bee" * 1000
+
+    @pytest.mark.asyncio
+    async def test_partially_read_and_failed_responses(self, tmp_path, mock_transport):
+        archive_path = tmp_path / "archive.bin"
+        http_archive = HTTPArchive(path=archive_path, mode=ArchiveMode.RECORD)
+        async with HTTPXClient(http_archive=http_archive, transport=mock_transport) as client:
+            await client.stream_until("https://test/wiki/Wolf", lambda chunk: True)
+            with pytest.raises(ConnectionError):
+                await client.get("https://test/missing")
+
+        with HTTPArchiveReader(archive_path) as reader:
+            entry = reader.find("GET", "https://test/wiki/Wolf")
+            assert "content-length" not in dict(entry.headers)
+            assert reader.find("GET", "https://test/missing").status_code == 500
+
+    @pytest.mark.asyncio
+    async def test_interrupted_and_invalid_archives(self, tmp_path, mock_transport):
+        archive_path = tmp_path / "archive.bin"
+        await record(archive_path, mock_transport, ["https://test/wiki/Wolf", "https://test/wiki/Bee"])
+        with HTTPArchiveReader(archive_path) as reader:
+            records_end = reader.records_end
+        # An interrupted recording has no index, and its last record may be cut short.
+        with archive_path.open("r+b") as archive_file:
+            archive_file.truncate(records_end - 10)
+
+        with HTTPArchiveReader(archive_path) as reader:
+            assert list(reader.index) == ["GET https://test/wiki/Wolf"]
+
+        archive_path.write_bytes(b"not an archive")
+        with pytest.raises(ValueError):
+            HTTPArchiveReader(archive_path)
+
+    @pytest.mark.asyncio
+    async def test_recording_with_a_primed_cache(self, tmp_path, mock_transport, requests_log):
+        http_cache = HTTPCache(cache_dir=tmp_path / "cache")
+        async with HTTPXClient(cache=http_cache, transport=mock_transport) as client:
+            await client.get("https://test/wiki/Wolf")
+
+        http_archive = HTTPArchive(path=tmp_path / "archive.bin", mode=ArchiveMode.RECORD)
+        async with HTTPXClient(cache=http_cache, http_archive=http_archive, transport=mock_transport) as client:
+            await client.get("https://test/wiki/Wolf")
+        # The full response is recorded, not the 304 revalidation of the cached one.
+        assert "If-None-Match" not in requests_log[-1].headers
+
+        http_archive = HTTPArchive(path=tmp_path / "archive.bin", mode=ArchiveMode.REPLAY)
+        async with HTTPXClient(http_archive=http_archive) as client:
+            response = await client.get("https://test/wiki/Wolf")
+        assert response.content == b"/wiki/Wolf" * 1000
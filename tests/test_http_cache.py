@@ -0,0 +1,118 @@
+import httpx
+import pytest
+
+from src.handlers.async_http_client import HTTPXClient
+from src.handlers.http_cache import CacheEntry, CacheWriter, HTTPCache
+
+ETAG = '"v1"'
+
+
+@pytest.fixture
+def requests_log():
+    return []
+
+
+@pytest.fixture
+def mock_transport(requests_log):
+    def handler(request: httpx.Request) -> httpx.Response:
+        requests_log.append(request)
+        if request.headers.get("If-None-Match") == ETAG:
+            return httpx.Response(304, headers={"ETag": ETAG})
+        return httpx.Response(200, headers={"ETag": ETAG}, content=b"<html>animal</html>")
+
+    return httpx.MockTransport(handler)
+
+
+class TestHTTPCache:
+    @pytest.mark.asyncio
+    async def test_warm_run_served_from_disk(self, tmp_path, mock_transport, requests_log):
+        url = "https://test/wiki/Animal1"
+        async with HTTPXClient(cache=HTTPCache(tmp_path), transport=mock_transport) as client:
+            cold_response = await client.get(url)
+
+        # A new cache instance simulates the next scheduled run.
+        async with HTTPXClient(cache=HTTPCache(tmp_path), transport=mock_transport) as client:
+            warm_response = await client.get(url)
+
+        assert "If-None-Match" not in requests_log[0].headers
+        assert requests_log[1].headers["If-None-Match"] == ETAG
+        assert warm_response.status_code == 200
+        assert warm_response.content == cold_response.content
+
+    @pytest.mark.asyncio
+    @pytest.mark.parametrize("stream", [False, True])
+    async def test_not_modified_response_updates_the_entry(self, tmp_path, stream):
+        url = "https://test/wiki/Animal1"
+        validators = [
+            {"ETag": ETAG, "Last-Modified": "Mon, 01 Jan 2024 00:00:00 GMT"},
+            {"ETag": '"v2"', "Date": "Tue, 02 Jan 2024 00:00:00 GMT"},
+        ]
+
+        def handler(request: httpx.Request) -> httpx.Response:
+            if "If-None-Match" in request.headers:
+                return httpx.Response(304, headers=validators[1])
+            return httpx.Response(200, headers=validators[0], content=b"<html>animal</html>")
+
+        cache = HTTPCache(tmp_path)
+        async with HTTPXClient(cache=cache, transport=httpx.MockTransport(handler)) as client:
+            await client.get(url)
+            if stream:
+                async with client.stream(url) as streamed_response:
+                    content = b"".join([chunk async for chunk in streamed_response.aiter_bytes()])
+            else:
+                content = (await client.get(url)).content
+            assert content == b"<html>animal</html>"
+
+        entry = await HTTPCache(tmp_path).load(url)
+        assert entry.conditional_headers() == {
+            "If-None-Match": '"v2"', "If-Modified-Since": "Mon, 01 Jan 2024 00:00:00 GMT",
+        }
+        assert entry.headers["date"] == "Tue, 02 Jan 2024 00:00:00 GMT"
+
+    @pytest.mark.asyncio
+    async def test_no_store_responses_are_not_cached(self, tmp_path, requests_log):
+        url = "https://test/wiki/Animal1"
+        cache_control = ["max-age=60", "private, no-store"]
+
+        def handler(request: httpx.Request) -> httpx.Response:
+            requests_log.append(request)
+            headers = {"ETag": ETAG, "Cache-Control": cache_control[min(len(requests_log), 2) - 1]}
+            return httpx.Response(200, headers=headers, content=b"<html>animal</html>")
+
+        cache = HTTPCache(tmp_path)
+        async with HTTPXClient(cache=cache, transport=httpx.MockTransport(handler)) as client:
+            await client.get(url)
+            assert await cache.load(url) is not None
+            await client.get(url)
+            async with client.stream(url) as streamed_response:
+                assert b"".join([chunk async for chunk in streamed_response.aiter_bytes()]) == b"<html>animal</html>"
+
+        assert await cache.load(url) is None
+        assert list(tmp_path.iterdir()) == []
+
+    @pytest.mark.asyncio
+    async def test_size_budget_evicts_least_recently_used(self, tmp_path, mock_transport):
+        cache = HTTPCache(tmp_path, max_size_bytes=400)
+        async with HTTPXClient(cache=cache, transport=mock_transport) as client:
+            for animal_index in range(5):
+                await client.get(f"https://test/wiki/Animal{animal_index}")
+
+        assert cache.total_size <= 400
+        assert await cache.load("https://test/wiki/Animal0") is None
+        assert await cache.load("https://test/wiki/Animal4") is not None
+
+    @pytest.mark.asyncio
+    async def test_concurrent_writers_of_a_url(self, tmp_path):
+        # Two cache instances sharing the directory stand for two processes.
+        entry = CacheEntry(url="https://test/wiki/Animal1", headers={}, etag=ETAG)
+        writers = [CacheWriter(HTTPCache(tmp_path), entry), CacheWriter(HTTPCache(tmp_path), entry)]
+        for body in [b"<html>ani", b"mal</html>"]:
+            for writer in writers:
+                await writer.write(body)
+        for writer in writers:
+            await writer.commit()
+
+        cache = HTTPCache(tmp_path)
+        assert await cache.load(entry.url) == entry
+        assert cache._body_path(cache._key(entry.url)).read_bytes() == b"<html>animal</html>"
+        assert list(tmp_path.glob("*.part")) == []
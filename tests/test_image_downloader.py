@@ -0,0 +1,156 @@
+from asyncio import gather, sleep
+
+import httpx
+import pytest
+
+from src.handlers.async_http_client import HTTPXClient
+from src.handlers.http_cache import HTTPCache
+from src.handlers.image_downloader import FsyncPolicy, ImageDownloader, ImageSizeError
+from src.handlers.image_store import ContentAddressedImageStore
+from src.handlers.retry_policy import RetryPolicy
+
+IMAGE_CONTENT = bytes(range(256)) * 1024
+
+
+@pytest.fixture
+def requests_log():
+    return []
+
+
+@pytest.fixture
+def mock_transport(requests_log):
+    async def image_chunks():
+        for start in range(0, len(IMAGE_CONTENT), 4096):
+            yield IMAGE_CONTENT[start:start + 4096]
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        requests_log.append(request)
+        if request.headers.get("If-None-Match") == '"v1"':
+            return httpx.Response(304)
+        headers = {"ETag": '"v1"', "Content-Length": str(len(IMAGE_CONTENT))}
+        return httpx.Response(200, headers=headers, content=image_chunks())
+
+    return httpx.MockTransport(handler)
+
+
+class TestImageDownloader:
+    @pytest.mark.asyncio
+    async def test_download_image(self, tmp_path, mock_transport):
+        async with HTTPXClient(transport=mock_transport) as client:
+            image_downloader = ImageDownloader(client, tmp_path, fsync_policy=FsyncPolicy.FILE_AND_DIRECTORY)
+            await image_downloader.download_image("https://test/Animal1.JPG", "Animal1")
+
+        assert [path.name for path in tmp_path.iterdir()] == ["Animal1.jpg"]
+        assert (tmp_path / "Animal1.jpg").read_bytes() == IMAGE_CONTENT
+
+    @pytest.mark.asyncio
+    async def test_oversized_image_is_aborted(self, tmp_path, mock_transport):
+        async with HTTPXClient(transport=mock_transport) as client:
+            image_downloader = ImageDownloader(client, tmp_path, max_image_size=len(IMAGE_CONTENT) - 1)
+            with pytest.raises(ImageSizeError):
+                await image_downloader.download_image("https://test/Animal1.jpg", "Animal1")
+
+        assert list(tmp_path.iterdir()) == []
+        # The failed download is not kept for the rest of the run.
+        assert image_downloader._downloads == {}
+
+    @pytest.mark.asyncio
+    async def test_concurrent_saves_of_an_image(self, tmp_path, mock_transport):
+        async def image_chunks(content: bytes):
+            for start in range(0, len(content), 4096):
+                yield content[start:start + 4096]
+                await sleep(0)
+
+        other_content = bytes(reversed(IMAGE_CONTENT))
+        async with HTTPXClient(transport=mock_transport) as client:
+            image_downloader = ImageDownloader(client, tmp_path)
+            await gather(
+                image_downloader.save_image(tmp_path / "Animal1.jpg", image_chunks(IMAGE_CONTENT)),
+                image_downloader.save_image(tmp_path / "Animal1.jpg", image_chunks(other_content)),
+            )
+
+        assert [path.name for path in tmp_path.iterdir()] == ["Animal1.jpg"]
+        assert (tmp_path / "Animal1.jpg").read_bytes() in (IMAGE_CONTENT, other_content)
+
+    @pytest.mark.asyncio
+    async def test_cached_image_is_streamed_from_disk(self, tmp_path, mock_transport, requests_log):
+        images_dir, cache_dir = tmp_path / "images", tmp_path / "cache"
+        images_dir.mkdir()
+        async with HTTPXClient(cache=HTTPCache(cache_dir), transport=mock_transport) as client:
+            await ImageDownloader(client, images_dir).download_image("https://test/Animal1.jpg", "Animal1")
+            # A new downloader simulates the next run.
+            await ImageDownloader(client, images_dir).download_image("https://test/Animal1.jpg", "Animal2")
+
+        assert requests_log[1].headers["If-None-Match"] == '"v1"'
+        assert (images_dir / "Animal2.jpg").read_bytes() == IMAGE_CONTENT
+
+    @pytest.mark.asyncio
+    async def test_image_store_dedups_shared_and_stored_images(self, tmp_path, mock_transport, requests_log):
+        images_dir, store_dir = tmp_path / "images", tmp_path / "store"
+        images_dir.mkdir()
+        async with HTTPXClient(transport=mock_transport) as client:
+            image_downloader = ImageDownloader(client, images_dir, image_store=ContentAddressedImageStore(store_dir))
+            await image_downloader.download_image("https://test/Animal1.jpg", "Animal1")
+            await image_downloader.download_image("https://test/Animal1.jpg", "Animal2")
+            image_downloader.image_store.save_index()
+
+            # A new downloader and store simulate the next run.
+            image_downloader = ImageDownloader(client, images_dir, image_store=ContentAddressedImageStore(store_dir))
+            await image_downloader.download_image("https://test/Animal1.jpg", "Animal3")
+
+        assert len(requests_log) == 1
+        assert len(list((store_dir / "blobs").rglob("*.jpg"))) == 1
+        for animal_name in ["Animal1", "Animal2", "Animal3"]:
+            assert (images_dir / f"{animal_name}.jpg").read_bytes() == IMAGE_CONTENT
+
+    @pytest.mark.asyncio
+    async def test_shared_image_downloaded_once_per_run(self, tmp_path, mock_transport, requests_log):
+        async with HTTPXClient(transport=mock_transport) as client:
+            image_downloader = ImageDownloader(client, tmp_path)
+            await gather(*(image_downloader.download_image("https://test/Animal.jpg", f"Animal{index}")
+                           for index in range(3)))
+
+        assert len(requests_log) == 1
+        assert image_downloader.image_fetches_saved == 2
+        assert sorted(path.name for path in tmp_path.iterdir()) == ["Animal0.jpg", "Animal1.jpg", "Animal2.jpg"]
+
+    @pytest.mark.asyncio
+    async def test_thumbnail_falls_back_to_original(self, tmp_path):
+        commons_url = "https://upload.wikimedia.org/wikipedia/commons"
+        requested_urls = []
+
+        def handler(request: httpx.Request) -> httpx.Response:
+            requested_urls.append(str(request.url))
+            if request.url.path.endswith("320px-Bee.png"):
+                return httpx.Response(404)
+            return httpx.Response(200, headers={"Content-Type": "image/webp"}, content=b"RIFF\x00\x00\x00\x00WEBP")
+
+        async with HTTPXClient(transport=httpx.MockTransport(handler)) as client:
+            image_downloader = ImageDownloader(client, tmp_path, thumbnail_width=320)
+            await image_downloader.download_image(f"{commons_url}/a/ab/Wolf.jpg", "Wolf")
+            await image_downloader.download_image(f"{commons_url}/c/cd/Bee.png", "Bee")
+
+        assert requested_urls == [
+            f"{commons_url}/thumb/a/ab/Wolf.jpg/320px-Wolf.jpg",
+            f"{commons_url}/thumb/c/cd/Bee.png/320px-Bee.png",
+            f"{commons_url}/c/cd/Bee.png",
+        ]
+        # The file extension follows the served format.
+        assert sorted(path.name for path in tmp_path.iterdir()) == ["Bee.webp", "Wolf.webp"]
+
+    @pytest.mark.asyncio
+    async def test_throttled_thumbnail_does_not_fall_back_to_original(self, tmp_path):
+        requested_urls = []
+
+        def handler(request: httpx.Request) -> httpx.Response:
+            requested_urls.append(str(request.url))
+            return httpx.Response(429)
+
+        transport = httpx.MockTransport(handler)
+        async with HTTPXClient(retry_policy=RetryPolicy(max_attempts=1), transport=transport) as client:
+            image_downloader = ImageDownloader(client, tmp_path, thumbnail_width=320)
+            with pytest.raises(ConnectionError):
+                await image_downloader.download_image("https://upload.wikimedia.org/wikipedia/commons/a/ab/Wolf.jpg",
+                                                      "Wolf")
+
+        assert requested_urls == ["https://upload.wikimedia.org/wikipedia/commons/thumb/a/ab/Wolf.jpg/320px-Wolf.jpg"]
@@ -0,0 +1,86 @@
+import json
+from urllib.parse import parse_qs
+
+import httpx
+import pytest
+
+from src.handlers.async_http_client import HTTPXClient
+from src.handlers.output_sinks import ANIMALS_TABLE, IMAGES_TABLE
+from src.processors.html_parsers.schemas import AnimalRecord
+from src.processors.incremental_snapshot import IncrementalSnapshot
+
+API_URL = "https://test/w/api.php"
+
+
+@pytest.fixture
+def revisions():
+    return {"Wolf": 10, "Bee": 20}
+
+
+@pytest.fixture
+def mock_transport(revisions):
+    def handler(request: httpx.Request) -> httpx.Response:
+        titles = parse_qs(request.url.query.decode())["titles"][0].split("|")
+        pages = [{"title": title, "lastrevid": revisions[title]} for title in titles]
+        return httpx.Response(200, content=json.dumps({"query": {"pages": pages}}).encode())
+
+    return httpx.MockTransport(handler)
+
+
+async def run_snapshot(client, tmp_path, rows):
+    """Record a run whose animals that changed get a new image file, returns the reused animals."""
+    reused_animals = []
+    async with IncrementalSnapshot(client, tmp_path, API_URL) as incremental_snapshot:
+        await incremental_snapshot.check_revisions(rows)
+        for row in rows:
+            await incremental_snapshot.add(ANIMALS_TABLE, {
+                "name": row.name, "page_url": row.page_url, "collateral_adjectives": list(row.collateral_adjectives),
+            })
+            image_row = incremental_snapshot.reused_image_row(row)
+            if image_row:
+                reused_animals.append(row.name)
+            else:
+                image_path = tmp_path / f"{row.name}.jpg"
+                image_path.write_bytes(b"image")
+                image_row = {
+                    "name": row.name, "image_url": f"https://test/{row.name}.jpg", "file_path": str(image_path),
+                }
+            await incremental_snapshot.add(IMAGES_TABLE, image_row)
+    return reused_animals
+
+
+class TestIncrementalSnapshot:
+    @pytest.mark.asyncio
+    async def test_only_changed_animals_are_fetched(self, tmp_path, mock_transport, revisions):
+        rows = [
+            AnimalRecord(name="Wolf", collateral_adjectives=("lupine",), page_url="https://test/wiki/Wolf"),
+            AnimalRecord(name="Bee", collateral_adjectives=("apian",), page_url="https://test/wiki/Bee"),
+        ]
+        async with HTTPXClient(transport=mock_transport) as client:
+            assert await run_snapshot(client, tmp_path, rows) == []
+            assert await run_snapshot(client, tmp_path, rows) == ["Wolf", "Bee"]
+
+            revisions["Bee"] = 21
+            rows[0] = AnimalRecord(name="Wolf", collateral_adjectives=("canine",), page_url="https://test/wiki/Wolf")
+            rows.append(AnimalRecord(name="Dog", collateral_adjectives=("canine",), page_url="https://test/wiki/Wolf"))
+            assert await run_snapshot(client, tmp_path, rows) == []
+            assert await run_snapshot(client, tmp_path, rows) == ["Wolf", "Bee", "Dog"]
+
+    @pytest.mark.asyncio
+    async def test_failed_run_keeps_the_snapshot_of_the_last_run(self, tmp_path, mock_transport, revisions):
+        rows = [
+            AnimalRecord(name="Wolf", collateral_adjectives=("lupine",), page_url="https://test/wiki/Wolf"),
+            AnimalRecord(name="Bee", collateral_adjectives=("apian",), page_url="https://test/wiki/Bee"),
+        ]
+        async with HTTPXClient(transport=mock_transport) as client:
+            assert await run_snapshot(client, tmp_path, rows) == []
+            snapshot = (tmp_path / IncrementalSnapshot.SNAPSHOT_FILE_NAME).read_text()
+
+            revisions["Bee"] = 21
+            with pytest.raises(RuntimeError):
+                async with IncrementalSnapshot(client, tmp_path, API_URL) as incremental_snapshot:
+                    await incremental_snapshot.check_revisions(rows[1:])
+                    raise RuntimeError("The run failed")
+
+            assert (tmp_path / IncrementalSnapshot.SNAPSHOT_FILE_NAME).read_text() == snapshot
+            assert await run_snapshot(client, tmp_path, rows) == ["Wolf"]
@@ -0,0 +1,74 @@
+import httpx
+import pytest
+
+from src.handlers.async_http_client import HTTPXClient
+from src.handlers.metrics import MeteredQueue, PipelineMetrics
+from src.handlers.retry_policy import RetryPolicy
+
+
+@pytest.fixture
+def mock_transport():
+    statuses = iter([503, 200])
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        return httpx.Response(next(statuses), content=b"animal page")
+
+    return httpx.MockTransport(handler)
+
+
+class TestPipelineMetrics:
+    @pytest.mark.asyncio
+    async def test_client_records_requests_by_host(self, mock_transport):
+        metrics = PipelineMetrics()
+        retry_policy = RetryPolicy(base_delay=0)
+        async with HTTPXClient(retry_policy=retry_policy, metrics=metrics, transport=mock_transport) as client:
+            await client.get("https://test/wiki/Animal1")
+
+        summary = metrics.summary()
+        assert summary["counters"]["http_requests_total"] == {
+            '{host="test",status="503"}': 1,
+            '{host="test",status="200"}': 1,
+        }
+        assert summary["counters"]["http_response_bytes_total"] == {'{host="test"}': len(b"animal page")}
+        assert summary["histograms"]["http_request_seconds"]['{host="test"}']["count"] == 2
+        assert summary["host_requests_per_second"]["test"] > 0
+
+    @pytest.mark.asyncio
+    async def test_metered_queue(self):
+        metrics = PipelineMetrics()
+        queue = MeteredQueue(2, "page", metrics)
+        await queue.put("Animal1")
+        await queue.put("Animal2")
+        assert metrics.gauges["queue_depth"] == {(("queue", "page"),): 2}
+
+        assert await queue.get() == "Animal1"
+        assert metrics.gauges["queue_depth"] == {(("queue", "page"),): 1}
+        assert metrics.histograms["queue_wait_seconds"][(("queue", "page"),)].count == 1
+
+    def test_prometheus_text(self):
+        metrics = PipelineMetrics(buckets=(0.1, 1.0))
+        metrics.record_error("image", ValueError("Image too large"))
+        metrics.observe("stage_seconds", 0.5, stage="image")
+
+        assert metrics.to_prometheus().splitlines() == [
+            "# TYPE stage_errors_total counter",
+            'stage_errors_total{error="ValueError",stage="image"} 1',
+            "# TYPE stage_seconds histogram",
+            'stage_seconds_bucket{stage="image",le="0.1"} 0',
+            'stage_seconds_bucket{stage="image",le="1.0"} 1',
+            'stage_seconds_bucket{stage="image",le="+Inf"} 1',
+            'stage_seconds_sum{stage="image"} 0.5',
+            'stage_seconds_count{stage="image"} 1',
+        ]
+
+    def test_merge_adds_metrics_of_another_process(self):
+        metrics, shard_metrics = PipelineMetrics(buckets=(0.1, 1.0)), PipelineMetrics(buckets=(0.1, 1.0))
+        for pipeline_metrics in (metrics, shard_metrics):
+            pipeline_metrics.increment("http_requests_total", host="test", status="200")
+            pipeline_metrics.observe("stage_seconds", 0.05, stage="page")
+        shard_metrics.observe("stage_seconds", 0.5, stage="page")
+
+        metrics.merge(shard_metrics)
+        assert metrics.counters["http_requests_total"] == {(("host", "test"), ("status", "200")): 2}
+        histogram = metrics.histograms["stage_seconds"][(("stage", "page"),)]
+        assert (histogram.count, histogram.bucket_counts) == (3, [2, 1, 0])
@@ -0,0 +1,93 @@
+import csv
+import json
+import sqlite3
+
+import pytest
+
+from src.handlers.output_sinks import (
+    ANIMALS_TABLE,
+    AdjectiveGroupsCSVSink,
+    CompositeOutputSink,
+    CSVOutputSink,
+    JSONLOutputSink,
+    SQLiteOutputSink,
+)
+from src.processors.adjective_query_index import AdjectiveQueryIndex
+
+
+@pytest.fixture
+def animal_rows():
+    return [
+        {"name": "Wolf", "page_url": "https://test/wiki/Wolf", "collateral_adjectives": ["lupine", "canine"]},
+        {"name": 'Dog "Canis"', "page_url": "https://test/wiki/Dog", "collateral_adjectives": ["canine"]},
+        {"name": "Bee, honey", "page_url": "https://test/wiki/Bee", "collateral_adjectives": ["apian"]},
+    ]
+
+
+class TestOutputSinks:
+    @pytest.mark.asyncio
+    async def test_rows_are_streamed_to_every_sink(self, tmp_path, animal_rows):
+        async with CompositeOutputSink([
+            CSVOutputSink(tmp_path, batch_size=2),
+            JSONLOutputSink(tmp_path, batch_size=2),
+            SQLiteOutputSink(tmp_path / "animals.sqlite", batch_size=2),
+        ]) as output_sink:
+            for row in animal_rows:
+                await output_sink.add(ANIMALS_TABLE, row)
+            # The first batch is written before the sinks are closed.
+            assert len((tmp_path / "animals.jsonl").read_text().splitlines()) == 2
+
+        with open(tmp_path / "animals.csv", newline="") as file:
+            assert list(csv.reader(file)) == [
+                ["name", "page_url", "collateral_adjectives"],
+                *([row["name"], row["page_url"], ",".join(row["collateral_adjectives"])] for row in animal_rows),
+            ]
+        jsonl_rows = [json.loads(line) for line in (tmp_path / "animals.jsonl").read_text().splitlines()]
+        assert jsonl_rows == animal_rows
+        with sqlite3.connect(tmp_path / "animals.sqlite") as connection:
+            assert connection.execute("SELECT name FROM animals").fetchall() == [
+                (row["name"],) for row in animal_rows
+            ]
+
+    @pytest.mark.asyncio
+    async def test_adjective_groups_csv_is_derived_from_rows(self, tmp_path, animal_rows):
+        async with AdjectiveGroupsCSVSink(tmp_path) as output_sink:
+            for row in animal_rows:
+                await output_sink.add(ANIMALS_TABLE, row)
+
+        assert (tmp_path / "collateral_adjectives_animals_groups.csv").read_text() == (
+            "Collateral Adjective,Animals\n"
+            '"Lupine","Wolf"\n'
+            '"Canine","Wolf,Dog ""Canis"""\n'
+            '"Apian","Bee, honey"\n'
+        )
+
+    @pytest.mark.asyncio
+    async def test_adjective_query_index_is_derived_from_rows(self, tmp_path, animal_rows):
+        index_path = tmp_path / "adjectives.idx"
+        async with AdjectiveGroupsCSVSink(tmp_path, index_path=index_path) as output_sink:
+            for row in animal_rows:
+                await output_sink.add(ANIMALS_TABLE, row)
+
+        with AdjectiveQueryIndex.load(index_path) as index:
+            assert index.animals("CANINE") == ['Dog "Canis"', "Wolf"]
+            assert index.adjectives("wolf") == ["canine", "lupine"]
+
+    @pytest.mark.asyncio
+    async def test_every_sink_is_closed_after_a_failed_run(self, tmp_path, animal_rows):
+        class FailingSink(CSVOutputSink):
+            async def _close(self):
+                raise OSError("disk full")
+
+        groups_path = tmp_path / "collateral_adjectives_animals_groups.csv"
+        groups_path.write_text("last run")
+        jsonl_sink = JSONLOutputSink(tmp_path, batch_size=10)
+        with pytest.raises(OSError):
+            async with CompositeOutputSink([FailingSink(tmp_path), jsonl_sink, AdjectiveGroupsCSVSink(tmp_path)]) \
+                    as output_sink:
+                await output_sink.add(ANIMALS_TABLE, animal_rows[0])
+                output_sink.fail()
+
+        # The sinks after the failing one are closed, but the groups of a failed run are not written.
+        assert len((tmp_path / "animals.jsonl").read_text().splitlines()) == 1
+        assert groups_path.read_text() == "last run"
@@ -0,0 +1,83 @@
+import json
+from asyncio import create_task
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from threading import Thread
+from urllib.parse import parse_qs, urlsplit
+
+import pytest
+
+from src.common.schemas import ImageQueueItem, PageQueueItem
+from src.handlers.async_http_client import HTTPXClient
+from src.handlers.durable_queue import PipelineQueue
+from src.processors.page_image_batch_resolver import PageImageBatchResolver
+
+PAGE_IMAGES = {
+    "Animal1": "https://upload.test/Animal1.jpg",
+    "Animal2": "https://upload.test/Animal2.jpg",
+}
+REDIRECTS = {"Animal two": "Animal2"}
+
+
+class StubAPIHandler(BaseHTTPRequestHandler):
+    """A stub of the MediaWiki API "prop=pageimages" query."""
+    queries = []
+
+    def do_GET(self):
+        query = parse_qs(urlsplit(self.path).query)
+        self.queries.append(query)
+        titles = query["titles"][0].split("|")
+        redirects = [{"from": title, "to": REDIRECTS[title]} for title in titles if title in REDIRECTS]
+        pages = []
+        for title in {REDIRECTS.get(title, title) for title in titles}:
+            page = {"title": title}
+            if title in PAGE_IMAGES:
+                page["original"] = {"source": PAGE_IMAGES[title]}
+            else:
+                page["missing"] = True
+            pages.append(page)
+        body = json.dumps({"query": {"redirects": redirects, "pages": pages}}).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+@pytest.fixture
+def stub_api_url():
+    StubAPIHandler.queries = []
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StubAPIHandler)
+    Thread(target=server.serve_forever, daemon=True).start()
+    yield f"http://127.0.0.1:{server.server_port}/w/api.php"
+    server.shutdown()
+    server.server_close()
+
+
+class TestPageImageBatchResolver:
+    @pytest.mark.asyncio
+    async def test_window_resolved_with_single_query(self, stub_api_url):
+        page_queue, image_queue = PipelineQueue(0, "page", None), PipelineQueue(0, "image", None)
+        for page_name, page_url in [
+            ("Animal1", "https://test/wiki/Animal1"),
+            ("Animal2", "https://test/wiki/Animal_two"),
+            ("Animal3", "https://test/wiki/Animal3"),
+        ]:
+            page_queue.put_nowait(PageQueueItem(page_url=page_url, page_name=page_name))
+
+        async with HTTPXClient() as client:
+            resolver = PageImageBatchResolver(client, api_url=stub_api_url, max_wait=0.05)
+            consumer = create_task(resolver.extract_animal_page_data(page_queue, image_queue))
+            await page_queue.join()
+            consumer.cancel()
+
+        image_items = [image_queue.get_nowait().item for _ in range(image_queue.qsize())]
+        assert image_items == [
+            ImageQueueItem(image_url=PAGE_IMAGES["Animal1"], image_name="Animal1"),
+            ImageQueueItem(image_url=PAGE_IMAGES["Animal2"], image_name="Animal2"),
+        ]
+        assert [dead_letter.item_name for dead_letter in resolver.dead_letters] == ["Animal3"]
+        assert len(StubAPIHandler.queries) == 1
+        assert StubAPIHandler.queries[0]["prop"] == ["pageimages"]
@@ -0,0 +1,47 @@
+from asyncio import gather, get_running_loop
+
+import httpx
+import pytest
+
+from src.handlers.async_http_client import HTTPXClient
+from src.handlers.rate_limiter import HostRateLimiter, RateLimit
+
+
+@pytest.fixture
+def rate_limiter():
+    return HostRateLimiter(
+        default_limit=RateLimit(requests_per_second=1000, burst=100),
+        host_limits={"pages.test": RateLimit(requests_per_second=50, burst=2)},
+    )
+
+
+class TestHostRateLimiter:
+    @pytest.mark.asyncio
+    async def test_rate_is_applied_per_host(self, rate_limiter):
+        loop = get_running_loop()
+        started_at = loop.time()
+        await gather(*(rate_limiter.acquire("https://images.test/Animal.jpg") for _ in range(10)))
+        images_elapsed = loop.time() - started_at
+
+        started_at = loop.time()
+        await gather(*(rate_limiter.acquire("https://pages.test/wiki/Animal") for _ in range(7)))
+        pages_elapsed = loop.time() - started_at
+
+        # A burst of 2 then 5 requests at 50 requests per second.
+        assert images_elapsed < 0.05
+        assert pages_elapsed >= 0.09
+        assert rate_limiter.stats()["pages.test"].requests == 7
+
+    @pytest.mark.asyncio
+    async def test_throttled_request_is_resent_after_retry_after(self, rate_limiter):
+        responses = iter([httpx.Response(429, headers={"Retry-After": "0.1"}), httpx.Response(200, content=b"ok")])
+        transport = httpx.MockTransport(lambda request: next(responses))
+        loop = get_running_loop()
+
+        async with HTTPXClient(rate_limiter=rate_limiter, transport=transport) as client:
+            started_at = loop.time()
+            response = await client.get("https://pages.test/wiki/Animal")
+
+        assert response.content == b"ok"
+        assert loop.time() - started_at >= 0.1
+        assert rate_limiter.stats()["pages.test"].throttled_responses == 1
@@ -0,0 +1,56 @@
+import httpx
+import pytest
+
+from src.handlers.async_http_client import HTTPXClient
+from src.handlers.circuit_breaker import CircuitOpenError, CircuitState, HostCircuitBreaker
+from src.handlers.retry_policy import RetryPolicy
+
+
+@pytest.fixture
+def retry_policy():
+    return RetryPolicy(max_attempts=3, base_delay=0.001, max_delay=0.01)
+
+
+def failing_transport(failures: int, requests_log: list):
+    def handler(request: httpx.Request) -> httpx.Response:
+        requests_log.append(request)
+        if len(requests_log) <= failures:
+            raise httpx.ConnectError("Connection refused", request=request)
+        return httpx.Response(200, content=b"ok")
+
+    return httpx.MockTransport(handler)
+
+
+class TestRetryPolicy:
+    @pytest.mark.asyncio
+    async def test_transient_errors_are_retried(self, retry_policy):
+        requests_log = []
+        async with HTTPXClient(retry_policy=retry_policy, transport=failing_transport(2, requests_log)) as client:
+            response = await client.get("https://test/wiki/Animal1")
+
+        assert response.content == b"ok"
+        assert len(requests_log) == 3
+
+    @pytest.mark.asyncio
+    async def test_error_raised_after_last_attempt(self, retry_policy):
+        requests_log = []
+        async with HTTPXClient(retry_policy=retry_policy, transport=failing_transport(5, requests_log)) as client:
+            with pytest.raises(ConnectionError):
+                await client.get("https://test/wiki/Animal1")
+
+        assert len(requests_log) == retry_policy.max_attempts
+
+    @pytest.mark.asyncio
+    async def test_open_circuit_fails_fast(self, retry_policy):
+        requests_log = []
+        circuit_breaker = HostCircuitBreaker(failure_threshold=3, recovery_timeout=60)
+        async with HTTPXClient(
+            retry_policy=retry_policy, circuit_breaker=circuit_breaker, transport=failing_transport(10, requests_log)
+        ) as client:
+            with pytest.raises(ConnectionError):
+                await client.get("https://test/wiki/Animal1")
+            with pytest.raises(CircuitOpenError):
+                await client.get("https://test/wiki/Animal2")
+
+        assert circuit_breaker.states() == {"test": CircuitState.OPEN}
+        assert len(requests_log) == 3
@@ -0,0 +1,116 @@
+from httpx import MockTransport, Request, Response
+import pytest
+
+from src.handlers.async_http_client import HTTPXClient
+from src.handlers.metrics import PipelineMetrics
+from src.handlers.output_sinks import IMAGES_TABLE
+from src.handlers.retry_policy import RetryPolicy
+from src.processors.animals_page_processor import AnimalsPageProcessor
+from src.processors.html_parsers.schemas import AnimalRecord
+from src.processors.parse_executor import ParseExecutor
+from src.processors.sharded_crawl import ShardedCrawl, ShardSettings, partition_rows
+
+LIST_PAGE_URL = "https://test/wiki/List_of_animal_names"
+ANIMALS = [f"Animal{index}" for index in range(8)]
+
+
+def _wikipedia(request: Request) -> Response:
+    """A Wikipedia of the ANIMALS, it is module level so that the shards' settings can be pickled with it."""
+    path = request.url.path
+    if path == "/wiki/List_of_animal_names":
+        rows = "".join(
+            f'<tr><td><a href="/wiki/{name}" title="{name}">{name}</a></td><td>{"lupine" if index % 2 else "ursine"}'
+            "</td></tr>"
+            for index, name in enumerate(ANIMALS)
+        )
+        return Response(200, text=(
+            '<html><body><h2><span id="Terms_by_species_or_taxon">Terms</span></h2><table class="wikitable sortable">'
+            f"<tr><th>Animal</th><th>Collateral adjective</th></tr>{rows}</table></body></html>"
+        ))
+    if path.startswith("/wiki/"):
+        name = path.removeprefix("/wiki/")
+        return Response(200, text=(
+            f'<html><head><meta property="og:image" content="https://test/images/{name}.jpg"></head>'
+            f"<body><h1>{name}</h1></body></html>"
+        ))
+    if path.startswith("/images/"):
+        return Response(200, content=b"jpeg", headers={"Content-Type": "image/jpeg"})
+    return Response(404)
+
+
+class RecordedRows:
+    def __init__(self):
+        self.rows: dict[str, list[dict]] = {}
+
+    async def add(self, table: str, row: dict):
+        self.rows.setdefault(table, []).append(row)
+
+    async def flush(self):
+        pass
+
+
+async def _crash_shard_of_animal0(self):
+    """AnimalsPageProcessor.run of the shard that crawls Animal0 fails, the workers inherit it by forking."""
+    if any(row.name == "Animal0" for row in self.content_parser.rows):
+        raise RuntimeError("Shard crashed")
+    await _original_run(self)
+
+
+_original_run = AnimalsPageProcessor.run
+
+
+@pytest.fixture
+def settings(tmp_path):
+    return ShardSettings(concurrency=2, destination_dir=tmp_path, retry_policy=RetryPolicy(max_attempts=1),
+                         client_kwargs={"transport": MockTransport(_wikipedia)})
+
+
+async def _crawl(settings: ShardSettings, shards: int) -> tuple[ShardedCrawl, PipelineMetrics, RecordedRows]:
+    metrics = PipelineMetrics()
+    output_sink = RecordedRows()
+    sharded_crawl = ShardedCrawl(settings, shards, metrics=metrics, output_sink=output_sink)
+    async with HTTPXClient(transport=MockTransport(_wikipedia)) as client:
+        await sharded_crawl.run(client, ParseExecutor(), LIST_PAGE_URL)
+    return sharded_crawl, metrics, output_sink
+
+
+class TestShardedCrawl:
+    def test_rows_of_a_page_land_in_the_same_shard(self):
+        rows = [
+            AnimalRecord(name=f"Animal{index}", collateral_adjectives=(),
+                         page_url=f"https://test/wiki/Animal{index % 7}")
+            for index in range(50)
+        ]
+        partitions = partition_rows(rows, 3)
+
+        assert sorted(row.name for partition in partitions for row in partition) == sorted(row.name for row in rows)
+        page_shards = {}
+        for shard_index, partition in enumerate(partitions):
+            for row in partition:
+                assert page_shards.setdefault(row.page_url, shard_index) == shard_index
+            # The rows keep their table order within each shard.
+            assert partition == sorted(partition, key=rows.index)
+
+    @pytest.mark.asyncio
+    async def test_results_of_the_shards_are_merged(self, settings, tmp_path):
+        sharded_crawl, metrics, output_sink = await _crawl(settings, shards=2)
+
+        assert sharded_crawl.dead_letters == []
+        assert sorted(row["name"] for row in output_sink.rows[IMAGES_TABLE]) == sorted(ANIMALS)
+        assert sorted(path.name for path in tmp_path.iterdir()) == sorted(f"{name}.jpg" for name in ANIMALS)
+        adjective_groups = sharded_crawl.collateral_adjectives_groups
+        assert (adjective_groups["lupine"], adjective_groups["ursine"]) == (ANIMALS[1::2], ANIMALS[0::2])
+        # A page and an image request of each animal were made in the shards.
+        assert sum(metrics.counters["http_requests_total"].values()) == 2 * len(ANIMALS)
+
+    @pytest.mark.asyncio
+    async def test_a_failed_shard_keeps_the_results_of_the_others(self, settings, monkeypatch):
+        monkeypatch.setattr(AnimalsPageProcessor, "run", _crash_shard_of_animal0)
+        sharded_crawl, metrics, output_sink = await _crawl(settings, shards=2)
+
+        dead_names = sorted(item.item_name for item in sharded_crawl.dead_letters)
+        image_names = sorted(row["name"] for row in output_sink.rows[IMAGES_TABLE])
+        assert "Animal0" in dead_names
+        assert image_names and sorted(dead_names + image_names) == sorted(ANIMALS)
+        assert {item.stage for item in sharded_crawl.dead_letters} == {ShardedCrawl.SHARD_STAGE}
+        assert sum(metrics.counters["http_requests_total"].values()) == 2 * len(image_names)
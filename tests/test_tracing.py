@@ -0,0 +1,65 @@
+import json
+import time
+from asyncio import sleep, start_server
+
+import pytest
+
+from src.handlers.async_http_client import HTTPXClient
+from src.handlers.image_downloader import ImageDownloader
+from src.handlers.tracing import EventLoopBlockMonitor, Tracer
+
+
+async def _chunks(*chunks: bytes):
+    for chunk in chunks:
+        yield chunk
+
+
+def _blocking_parse():
+    time.sleep(0.2)
+
+
+class TestTracing:
+    @pytest.mark.asyncio
+    async def test_request_phases_and_image_writes(self, tmp_path):
+        async def handle(reader, writer):
+            await reader.readuntil(b"\r\n\r\n")
+            writer.write(b"HTTP/1.1 200 OK\r\nContent-Length: 4\r\n\r\nwolf")
+            await writer.drain()
+            writer.close()
+
+        server = await start_server(handle, "127.0.0.1", 0)
+        url = f"http://127.0.0.1:{server.sockets[0].getsockname()[1]}/wiki/Wolf"
+        tracer = Tracer()
+        async with server, HTTPXClient(tracer=tracer) as client:
+            response = await client.get(url)
+            image_downloader = ImageDownloader(client, tmp_path, tracer=tracer)
+            await image_downloader.save_image(tmp_path / "Wolf.jpg", _chunks(b"jp", b"eg"))
+        assert response.content == b"wolf"
+
+        tracer.export(tmp_path / "trace.json")
+        events = json.loads((tmp_path / "trace.json").read_text())["traceEvents"]
+        request_events = [(event["ph"], event["name"]) for event in events if event.get("cat") == "http"]
+        assert request_events[0] == ("b", f"GET {url}")
+        assert request_events[-1] == ("e", f"GET {url}")
+        assert {name for phase, name in request_events if phase == "b"} >= {"dns+connect", "ttfb", "body"}
+        [request_end] = [event for event in events if event["ph"] == "e" and event["name"] == f"GET {url}"]
+        assert request_end["args"] == {"status": 200}
+        [write_span] = [event for event in events if event["name"] == "save_image"]
+        assert write_span["args"] == {"path": str(tmp_path / "Wolf.jpg"), "bytes": 4}
+
+    @pytest.mark.asyncio
+    async def test_blocking_callback_stack(self):
+        tracer = Tracer()
+        async with EventLoopBlockMonitor(tracer, threshold=0.1, interval=0.01) as block_monitor:
+            await sleep(0.05)
+            _blocking_parse()
+            await sleep(0.05)
+
+        [(lag, stack)] = block_monitor.blocks
+        assert lag >= 0.1
+        assert "_blocking_parse" in stack
+        [blocked_span] = [event for event in tracer.events if event["name"] == "blocked"]
+        assert blocked_span["args"]["stack"] == stack
+        track_names = {event["tid"]: event["args"]["name"] for event in tracer.to_chrome_trace()["traceEvents"]
+                       if event["ph"] == "M"}
+        assert track_names[blocked_span["tid"]] == "event loop"